@@ -0,0 +1,172 @@
+"""
+This module contains the entity cache used by crud.read_item. Every
+table model gets a bounded LRU cache of its validated Read objects,
+keyed by id and limited by an estimated byte budget, plus a short lived
+negative cache of ids that don't exist. The crud write functions keep
+the cache current by writing through it. Writes made by the other worker
+processes aren't seen, so cached objects also expire after a ttl.
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+# estimated bytes each model's cache may hold
+DEFAULT_BYTE_BUDGET = 4 * 1024 * 1024
+# rough per entry overhead on top of the serialized size of the object
+ENTRY_OVERHEAD = 256
+# seconds a cached object is served before it's read again, this bounds
+# how long a write made by another worker process can go unseen
+POSITIVE_TTL = 10.0
+# seconds an id that wasn't found is remembered
+NEGATIVE_TTL = 5.0
+MAX_NEGATIVE_ENTRIES = 10_000
+
+
+class EntityCache:
+    """
+    LRU cache of the validated Read objects of one table model
+    """
+
+    def __init__(
+        self,
+        read_class: Type[BaseModel],
+        byte_budget: int = DEFAULT_BYTE_BUDGET,
+        positive_ttl: float = POSITIVE_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+    ):
+        self.read_class = read_class
+        self.byte_budget = byte_budget
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[int, Tuple[BaseModel, int, float]]" = OrderedDict()
+        self._missing: "OrderedDict[int, float]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, id: int) -> Optional[BaseModel]:
+        """Returns the cached object for the id, or None on a miss"""
+        entry = self._entries.get(id)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            self.invalidate(id)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(id)
+        self.hits += 1
+        return entry[0]
+
+    def is_missing(self, id: int) -> bool:
+        """Returns True if the id was recently looked up and not found"""
+        expires_at = self._missing.get(id)
+        if expires_at is None:
+            self.misses += 1
+            return False
+        if expires_at < time.monotonic():
+            del self._missing[id]
+            self.misses += 1
+            return False
+        self.negative_hits += 1
+        return True
+
+    def put(self, db_item) -> BaseModel:
+        """
+        Validate the database item into its Read object and cache it
+
+        :params db_item: the table model instance to cache
+        :returns: the validated Read object
+        """
+        item = self.read_class.model_validate(db_item)
+        self.invalidate(item.id)
+        item_size = len(item.model_dump_json()) + ENTRY_OVERHEAD
+        if item_size > self.byte_budget:
+            return item
+        self._entries[item.id] = (
+            item,
+            item_size,
+            time.monotonic() + self.positive_ttl,
+        )
+        self.size += item_size
+        while self.size > self.byte_budget:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+        return item
+
+    def put_missing(self, id: int) -> None:
+        """Remember an id that wasn't found for the negative cache ttl"""
+        self._missing[id] = time.monotonic() + self.negative_ttl
+        self._missing.move_to_end(id)
+        while len(self._missing) > MAX_NEGATIVE_ENTRIES:
+            self._missing.popitem(last=False)
+
+    def invalidate(self, id: int) -> None:
+        """Forget anything cached for the id"""
+        self._missing.pop(id, None)
+        entry = self._entries.pop(id, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self) -> None:
+        """Forget everything cached, the counters are kept"""
+        self._entries.clear()
+        self._missing.clear()
+        self.size = 0
+
+    def stats(self) -> Dict:
+        """Returns the cache counters and the hit ratio"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "negative_entries": len(self._missing),
+            "bytes": self.size,
+            "byte_budget": self.byte_budget,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+_entity_caches: Dict[Type, EntityCache] = {}
+
+
+def get_entity_cache(model_class: Type) -> EntityCache:
+    """
+    Returns the entity cache of the table model class, creating it on
+    first use. The Read class is found by the naming convention of the
+    model modules (Album -> AlbumRead)
+
+    :params model_class: the table model class
+    :returns: EntityCache
+    """
+    entity_cache = _entity_caches.get(model_class)
+    if entity_cache is None:
+        module = sys.modules[model_class.__module__]
+        read_class = getattr(module, f"{model_class.__name__}Read")
+        entity_cache = _entity_caches[model_class] = EntityCache(read_class)
+    return entity_cache
+
+
+def get_entity_cache_stats() -> Dict[str, Dict]:
+    """Returns the stats of every entity cache keyed by table name"""
+    return {
+        model_class.__tablename__: entity_cache.stats()
+        for model_class, entity_cache in _entity_caches.items()
+    }
+
+
+def clear_entity_caches() -> None:
+    """Forget everything cached by every entity cache"""
+    for entity_cache in _entity_caches.values():
+        entity_cache.clear()
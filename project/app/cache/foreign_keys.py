@@ -0,0 +1,190 @@
+"""
+This module validates the foreign keys of the values written by the
+crud functions. The foreign keys of a model are derived from the
+ForeignKey metadata of its SQLModel columns, and every referenced table
+gets a compact in-memory id set (a bitmap) that is loaded once and kept
+current by the create functions, so checking a reference that exists
+never costs a database round trip. The other worker processes create
+rows this one doesn't see, so an id missing from a set is looked up in
+the database before the write is rejected, and added if it's found.
+"""
+
+import asyncio
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Type
+
+from fastapi import HTTPException
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+# ids at or above this are kept in a plain set instead of the bitmap (16 MiB)
+MAX_BITMAP_ID = 2**27
+
+
+class IdSet:
+    """
+    A set of integer ids stored as a bitmap, one bit per id
+    """
+
+    __slots__ = ("_bits", "_overflow", "_count")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._bits = bytearray()
+        self._overflow = set()
+        self._count = 0
+        for id in ids:
+            self.add(id)
+
+    def add(self, id: int) -> None:
+        if id < 0 or id >= MAX_BITMAP_ID:
+            if id not in self._overflow:
+                self._overflow.add(id)
+                self._count += 1
+            return
+        index, mask = id >> 3, 1 << (id & 7)
+        if index >= len(self._bits):
+            # grow geometrically so adding ascending ids stays cheap
+            self._bits.extend(bytes(max(index + 1 - len(self._bits), len(self._bits))))
+        if not self._bits[index] & mask:
+            self._bits[index] |= mask
+            self._count += 1
+
+    def __contains__(self, id: int) -> bool:
+        if id < 0 or id >= MAX_BITMAP_ID:
+            return id in self._overflow
+        index = id >> 3
+        return index < len(self._bits) and bool(self._bits[index] & (1 << (id & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class ForeignKeyRef(NamedTuple):
+    """A foreign key of a model: the attribute and the model it references"""
+
+    attribute: str
+    referenced_class: Type
+
+
+@lru_cache(maxsize=None)
+def get_foreign_keys(model_class: Type) -> Tuple[ForeignKeyRef, ...]:
+    """
+    Returns the foreign keys of the table model class
+
+    :params model_class: the table model class
+    :returns: Tuple of ForeignKeyRef, one per foreign key column
+    """
+    models_by_table = {
+        mapper.local_table.name: mapper.class_
+        for mapper in SQLModel._sa_registry.mappers
+    }
+    mapper = sa_inspect(model_class)
+    foreign_keys = []
+    for column in model_class.__table__.columns:
+        for foreign_key in column.foreign_keys:
+            foreign_keys.append(
+                ForeignKeyRef(
+                    attribute=mapper.get_property_by_column(column).key,
+                    referenced_class=models_by_table[foreign_key.column.table.name],
+                )
+            )
+    return tuple(foreign_keys)
+
+
+_id_sets: Dict[str, IdSet] = {}
+_load_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def load_id_set(session: AsyncSession, model_class: Type) -> IdSet:
+    """
+    Returns the id set of the table model class, loading it from the
+    database the first time it's needed
+    """
+    name = model_class.__tablename__
+    id_set = _id_sets.get(name)
+    if id_set is not None:
+        return id_set
+    async with _load_locks.setdefault(name, asyncio.Lock()):
+        if name not in _id_sets:
+            result = await session.execute(select(model_class.id))
+            _id_sets[name] = IdSet(result.scalars().all())
+    return _id_sets[name]
+
+
+async def load_referenced_id_sets(session: AsyncSession, model_class: Type) -> None:
+    """Make sure the id sets of every table the model class references are loaded"""
+    for foreign_key in get_foreign_keys(model_class):
+        await load_id_set(session, foreign_key.referenced_class)
+
+
+async def find_missing_ids(
+    session: AsyncSession, model_class: Type, ids: Iterable[int]
+) -> List[int]:
+    """
+    Returns the ids that don't exist in the table of the model class. Ids
+    missing from the id set are looked up with one query, those created
+    since the set was loaded (e.g. by another worker) are added to it
+
+    :params session: the database session to look the ids up with
+    :params model_class: the table model class the ids belong to
+    :params ids: the ids to check
+    :returns: List of the ids that don't exist, in the order given
+    """
+    id_set = await load_id_set(session, model_class)
+    unknown = [id for id in ids if id not in id_set]
+    if not unknown:
+        return []
+    result = await session.execute(
+        select(model_class.id).where(model_class.id.in_(set(unknown)))
+    )
+    for id in result.scalars().all():
+        id_set.add(id)
+    return [id for id in unknown if id not in id_set]
+
+
+async def check_foreign_keys(
+    session: AsyncSession, model_class: Type, values: Dict
+) -> List[str]:
+    """
+    Check the foreign key values against the id sets, values that
+    aren't present or are None aren't checked
+
+    :params session: the database session to look up unknown ids with
+    :params model_class: the table model class being written
+    :params values: the attribute values being written
+    :returns: List of error messages, empty if every reference exists
+    """
+    errors = []
+    for foreign_key in get_foreign_keys(model_class):
+        value = values.get(foreign_key.attribute)
+        if value is None:
+            continue
+        if await find_missing_ids(session, foreign_key.referenced_class, [value]):
+            errors.append(f"{foreign_key.referenced_class.__name__} not found")
+    return errors
+
+
+async def validate_foreign_keys(
+    session: AsyncSession, model_class: Type, values: Dict
+) -> None:
+    """
+    Validate the foreign key values of a single write, raises a 400
+    HTTPException if any of them references a row that doesn't exist
+    """
+    errors = await check_foreign_keys(session, model_class, values)
+    if errors:
+        raise HTTPException(status_code=400, detail=", ".join(errors))
+
+
+def record_ids(model_class: Type, ids: Iterable[int]) -> None:
+    """Add newly created ids to the id set of the model class if it's loaded"""
+    id_set = _id_sets.get(model_class.__tablename__)
+    if id_set is not None:
+        for id in ids:
+            id_set.add(id)
+
+
+def clear_id_sets() -> None:
+    """Forget every loaded id set, they are loaded again when next needed"""
+    _id_sets.clear()
@@ -0,0 +1,94 @@
+"""
+This module contains the reference tables. These are small, effectively
+static tables (genres, media types) that are loaded into immutable
+in-memory structures when the application starts, so reading them never
+touches the database. A reference table is only reloaded when one of its
+own write routes changes it.
+"""
+
+import asyncio
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class ReferenceTable:
+    """
+    The in-memory copy of a reference table, holding the validated Read
+    model of every row, both in id order and keyed by id
+    """
+
+    def __init__(self, model_class: Type, read_class: Type[BaseModel]):
+        self.model_class = model_class
+        self.read_class = read_class
+        self.loaded = False
+        self._items: Tuple[BaseModel, ...] = ()
+        self._by_id: Mapping[int, BaseModel] = MappingProxyType({})
+        self._lock = asyncio.Lock()
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)load every row of the table from the database"""
+        async with self._lock:
+            query = select(self.model_class).order_by(self.model_class.id)
+            result = await session.execute(query)
+            items = tuple(
+                self.read_class.model_validate(db_item)
+                for db_item in result.scalars().all()
+            )
+            # swap in the new structures in one go so readers never see a partial table
+            self._items = items
+            self._by_id = MappingProxyType({item.id: item for item in items})
+            self.loaded = True
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """Load the table if the application didn't at startup"""
+        if not self.loaded:
+            await self.load(session)
+
+    def get(self, id: int) -> Optional[BaseModel]:
+        """Returns the row with the id, or None if there isn't one"""
+        return self._by_id.get(id)
+
+    def page(self, offset: int, limit: int) -> Tuple[List[BaseModel], int]:
+        """Returns a page of rows and the total number of rows"""
+        return list(self._items[offset : offset + limit]), len(self._items)
+
+    def clear(self) -> None:
+        """Forget the loaded rows, the next read loads them again"""
+        self._items = ()
+        self._by_id = MappingProxyType({})
+        self.loaded = False
+
+
+_reference_tables: Dict[str, ReferenceTable] = {}
+
+
+def register_reference_table(
+    model_class: Type, read_class: Type[BaseModel]
+) -> ReferenceTable:
+    """
+    Returns the reference table for the model class, creating it on first use
+
+    :params model_class: the table model class
+    :params read_class: the Read model the rows are served as
+    :returns: ReferenceTable
+    """
+    name = model_class.__tablename__
+    if name not in _reference_tables:
+        _reference_tables[name] = ReferenceTable(model_class, read_class)
+    return _reference_tables[name]
+
+
+async def load_reference_tables(session: AsyncSession) -> None:
+    """Load every registered reference table, used at application startup"""
+    for reference_table in _reference_tables.values():
+        await reference_table.load(session)
+
+
+def clear_reference_tables() -> None:
+    """Forget the rows of every registered reference table"""
+    for reference_table in _reference_tables.values():
+        reference_table.clear()
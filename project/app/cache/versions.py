@@ -0,0 +1,103 @@
+"""
+This module lets the in-memory structures of one worker process notice
+the writes committed by the others. Every write bumps a version per
+table in the data_versions table, inside its own transaction. A
+structure records the versions of the tables it was built from, and the
+writes of its own process advance them as they're applied. A version
+that moved any other way was bumped by another process, so the
+structure is stale and is built again on its next read. The versions
+are read at most once a check interval, which bounds how long a write
+made by another worker can go unseen.
+"""
+
+import time
+from typing import Dict, Optional, Tuple, Type
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.schema import DataVersion
+
+# seconds between reads of the versions by one structure
+VERSION_CHECK_INTERVAL = 1.0
+
+BUMP_QUERY = text(
+    """
+    INSERT INTO data_versions (Name, Version) VALUES (:name, 1)
+    ON CONFLICT (Name) DO UPDATE SET Version = Version + 1
+    RETURNING Version
+    """
+)
+
+
+async def bump_data_version(session: AsyncSession, model_class: Type) -> int:
+    """Count a write to the table of the model class, in the session's transaction"""
+    return await session.scalar(BUMP_QUERY, {"name": model_class.__tablename__})
+
+
+async def read_data_versions(
+    session: AsyncSession, names: Tuple[str, ...]
+) -> Dict[str, int]:
+    """Returns the versions of the tables, 0 for a table never written to"""
+    result = await session.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names))
+    )
+    versions = dict.fromkeys(names, 0)
+    versions.update(result.all())
+    return versions
+
+
+class TableVersions:
+    """
+    The versions of the tables a structure was built from, or None when
+    they aren't known and the structure has to be built again
+    """
+
+    __slots__ = ("names", "versions", "checked_at")
+
+    def __init__(self, *model_classes: Type):
+        self.names = tuple(model_class.__tablename__ for model_class in model_classes)
+        self.versions: Optional[Dict[str, int]] = None
+        self.checked_at = 0.0
+
+    async def read(self, session: AsyncSession) -> Dict[str, int]:
+        """Returns the current versions, read before the structure is built"""
+        return await read_data_versions(session, self.names)
+
+    async def record(self, session: AsyncSession, before: Dict[str, int]) -> None:
+        """
+        Record the versions the structure was built from, once it's built.
+        Versions that moved while it was built leave them unknown
+        """
+        after = await read_data_versions(session, self.names)
+        self.versions = after if after == before else None
+        self.checked_at = time.monotonic()
+
+    async def stale(self, session: AsyncSession) -> bool:
+        """Returns whether another process wrote to the tables since they were recorded"""
+        if self.versions is None:
+            return True
+        if time.monotonic() - self.checked_at < VERSION_CHECK_INTERVAL:
+            return False
+        self.checked_at = time.monotonic()
+        return await read_data_versions(session, self.names) != self.versions
+
+    def follow(self, model_class: Type, version: Optional[int]) -> bool:
+        """
+        Advance the version of the table to that of a write of this
+        process. Returns False, and forgets the versions, if the structure
+        missed a write in between, in which case it must not apply this one
+        """
+        if self.versions is None:
+            return False
+        name = model_class.__tablename__
+        if name not in self.versions:
+            return True
+        if version is None or self.versions[name] != version - 1:
+            self.versions = None
+            return False
+        self.versions[name] = version
+        return True
+
+    def clear(self) -> None:
+        self.versions = None
@@ -0,0 +1,369 @@
+"""
+This module contains the response compression: the encoders available
+(brotli and zstd only when their packages are installed), the choice of
+encoding from a request's Accept-Encoding header, and a pure ASGI
+middleware compressing the responses. Complete bodies of at least a
+minimum size are compressed whole, through a cache keyed by a digest
+of the body so a hot page is compressed once, and streamed bodies are
+compressed chunk by chunk as they're sent. The compression level is
+chosen per route class: streamed exports favour speed, pages balance
+speed and size, and precomputed documents take the smallest encoding.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import OrderedDict
+from enum import Enum
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+
+class CompressionLevel(str, Enum):
+    """The compression levels of the route classes"""
+
+    FAST = "fast"
+    DEFAULT = "default"
+    MAX = "max"
+
+
+# the level of every encoding for each compression level
+LEVELS: Dict[CompressionLevel, Dict[str, int]] = {
+    CompressionLevel.FAST: {"gzip": 1, "br": 1, "zstd": 1},
+    CompressionLevel.DEFAULT: {"gzip": 6, "br": 4, "zstd": 3},
+    CompressionLevel.MAX: {"gzip": 9, "br": 11, "zstd": 19},
+}
+
+# the available encodings, in the order preferred when the client
+# accepts several equally: zstd compresses fastest for a similar size
+ENCODINGS: List[str] = (
+    (["zstd"] if zstandard is not None else [])
+    + (["br"] if brotli is not None else [])
+    + ["gzip"]
+)
+
+# bodies smaller than this gain too little to be worth compressing
+MINIMUM_SIZE = 1024
+
+# the content types worth compressing, anything else is passed as is
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# the route classes by path, the first match wins. Other streamed
+# bodies are compressed FAST and other complete bodies DEFAULT
+ROUTE_LEVELS: Tuple[Tuple[Pattern, CompressionLevel], ...] = (
+    (re.compile(r"/export$"), CompressionLevel.FAST),
+)
+
+# the total size of the compressed bodies cached, and of a single one
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+
+class Compressor:
+    """Compresses a body in chunks, each flushed so it can be sent as it's made"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """Returns the whole body compressed with the encoding at the level"""
+    if encoding == "gzip":
+        return zlib.compress(body, level, wbits=31)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+# the encoders of precomputed bodies, compressed once so at the MAX
+# level, best compression first
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    encoding: partial(
+        compress, encoding=encoding, level=LEVELS[CompressionLevel.MAX][encoding]
+    )
+    for encoding in ("br", "zstd", "gzip")
+    if encoding in ENCODINGS
+}
+
+
+class CompressedCache:
+    """
+    The compressed bodies by encoding, level and digest of the body,
+    least recently used evicted first once they pass the size limit
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._bodies: OrderedDict[Tuple[str, int, bytes], bytes] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+
+    def compress(self, body: bytes, encoding: str, level: int) -> bytes:
+        """Returns the body compressed, from the cache if it was compressed before"""
+        if len(body) > CACHE_MAX_ENTRY_BYTES:
+            return compress(body, encoding, level)
+        key = (encoding, level, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self._bodies.get(key)
+        if compressed is not None:
+            self._bodies.move_to_end(key)
+            self._hits += 1
+            return compressed
+        self._misses += 1
+        compressed = self._bodies[key] = compress(body, encoding, level)
+        self._size += len(compressed)
+        while self._size > self.max_bytes:
+            _, evicted = self._bodies.popitem(last=False)
+            self._size -= len(evicted)
+        return compressed
+
+    def stats(self) -> Dict:
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._bodies),
+            "bytes": self._size,
+        }
+
+    def clear(self) -> None:
+        self.__init__(self.max_bytes)
+
+
+compressed_cache = CompressedCache()
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Returns the quality of every encoding in an Accept-Encoding header"""
+    qualities = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities
+
+
+def negotiate(header: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Returns the encoding of those available the client accepts with the
+    highest quality, preferring the earlier on a tie, or None for identity
+    """
+    if not header:
+        return None
+    qualities = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def route_level(path: str, streamed: bool) -> CompressionLevel:
+    """Returns the compression level of the route class of the path"""
+    for pattern, level in ROUTE_LEVELS:
+        if pattern.search(path):
+            return level
+    return CompressionLevel.FAST if streamed else CompressionLevel.DEFAULT
+
+
+def compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    """Returns whether the response has a compressible type and no encoding yet"""
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+
+def encoded_headers(
+    headers: List[Tuple[bytes, bytes]], encoding: str, length: Optional[int]
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Returns the response headers for the encoded body: its encoding and
+    length (none when it's streamed), varying by Accept-Encoding, and a
+    strong ETag made weak as the encoded bytes differ from those it names
+    """
+    updated = []
+    vary = None
+    for name, value in headers:
+        if name == b"content-length":
+            continue
+        if name == b"vary":
+            vary = value
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        updated.append((name, value))
+    if vary is None:
+        vary = b"accept-encoding"
+    elif b"accept-encoding" not in vary.lower():
+        vary += b", accept-encoding"
+    updated.append((b"vary", vary))
+    updated.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        updated.append((b"content-length", str(length).encode()))
+    return updated
+
+
+class CompressionMiddleware:
+    """
+    Compresses the responses of clients accepting an available encoding.
+    A complete body is compressed whole if it's at least minimum_size
+    bytes, a streamed one chunk by chunk
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = MINIMUM_SIZE,
+        cache: Optional[CompressedCache] = compressed_cache,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, ENCODINGS)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(
+            send, scope["path"], encoding, self.minimum_size, self.cache
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """The send of one response, compressing its body on the way out"""
+
+    def __init__(
+        self,
+        send: Send,
+        path: str,
+        encoding: str,
+        minimum_size: int,
+        cache: Optional[CompressedCache],
+    ):
+        self._send = send
+        self.path = path
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.start: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+        if message["type"] == "http.response.start":
+            if message["status"] in (204, 304) or not compressible(message["headers"]):
+                self.passthrough = True
+                await self._send(message)
+            else:
+                # held until the first body message shows whether it's streamed
+                self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None and not more_body:
+            await self.send_whole(body)
+            return
+        if self.compressor is None:
+            level = LEVELS[route_level(self.path, streamed=True)][self.encoding]
+            self.compressor = Compressor(self.encoding, level)
+            await self._send(
+                {
+                    **self.start,
+                    "headers": encoded_headers(
+                        self.start["headers"], self.encoding, None
+                    ),
+                }
+            )
+        data = self.compressor.compress(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self._send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+
+    async def send_whole(self, body: bytes) -> None:
+        """Send a complete body, compressed if it's large enough"""
+        if len(body) < self.minimum_size:
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        level = LEVELS[route_level(self.path, streamed=False)][self.encoding]
+        if self.cache is not None:
+            compressed = self.cache.compress(body, self.encoding, level)
+        else:
+            compressed = compress(body, self.encoding, level)
+        headers = encoded_headers(self.start["headers"], self.encoding, len(compressed))
+        await self._send({**self.start, "headers": headers})
+        await self._send({"type": "http.response.body", "body": compressed})
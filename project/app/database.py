@@ -1,35 +1,258 @@
+import asyncio
+import os
+import time
 from pathlib import Path
 
 from typing import AsyncGenerator
+from fastapi import HTTPException, Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from sqlmodel import SQLModel
-from sqlalchemy.pool import StaticPool
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 
-DB_PATH = Path(__file__).parent / "db" / "active" / "chinook.db"
+from app.schema.fingerprint import ensure_schema
+from app.schema.index_advisor import record_query_shapes
+
+# the database path can be pointed elsewhere, e.g. at a scratch copy for benchmarks
+DB_PATH = Path(
+    os.environ.get(
+        "CHINOOK_DB_PATH", Path(__file__).parent / "db" / "active" / "chinook.db"
+    )
+)
 DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 POOL_SIZE = 5
 
-# create the async engine with connection pooling
+# per request deadline defaults, the header lets a client ask for a
+# shorter (or longer, up to the maximum) deadline for its request
+DEFAULT_REQUEST_TIMEOUT = 30.0
+MAX_REQUEST_TIMEOUT = 300.0
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+
+# number of SQLite virtual machine instructions between deadline checks
+PROGRESS_HANDLER_INTERVAL = 1000
+# seconds between checks for a client that has gone away
+DISCONNECT_POLL_INTERVAL = 0.1
+# the request state key set once the request body has been received
+BODY_RECEIVED = "body_received"
+
+
+class QueryDeadline:
+    """
+    The deadline of a single request. It is shared between the request
+    and the SQLite progress handler of the connection running its
+    statements, which aborts the statement once the deadline has
+    passed or the request has been cancelled
+    """
+
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Cancel the request, e.g. because the client disconnected"""
+        self.cancelled = True
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+
+def register_query_guard(async_engine: AsyncEngine) -> None:
+    """
+    Install a progress handler on every connection the engine opens
+    that interrupts the running statement when the deadline of the
+    session using the connection has expired
+
+    :params async_engine: the engine to guard
+    """
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def install_progress_handler(dbapi_connection, connection_record):
+        info = connection_record.info
+
+        def progress_handler() -> int:
+            # runs in the aiosqlite thread, a non-zero value aborts the statement
+            deadline = info.get("deadline")
+            return 1 if deadline is not None and deadline.expired else 0
+
+        dbapi_connection.await_(
+            dbapi_connection.driver_connection.set_progress_handler(
+                progress_handler, PROGRESS_HANDLER_INTERVAL
+            )
+        )
+
+    @event.listens_for(sync_engine, "checkin")
+    def clear_deadline(dbapi_connection, connection_record):
+        connection_record.info.pop("deadline", None)
+
+
+@event.listens_for(Session, "after_begin")
+def bind_deadline(session, transaction, connection):
+    """
+    Hand the deadline of the session to the connection it just checked
+    out, and run the session's first use callback if it has one
+    """
+    deadline = session.info.get("deadline")
+    if deadline is not None:
+        connection.info["deadline"] = deadline
+    on_begin = session.info.pop("on_begin", None)
+    if on_begin is not None:
+        on_begin()
+
+
+# create the async engine with connection pooling, each session gets
+# its own connection so one slow statement doesn't block every other request
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=POOL_SIZE,
 )
+register_query_guard(engine)
+record_query_shapes(engine)
 
 
 async def init_db():
-    """Initialize the database and create tables if they don't exist."""
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
-
-
-@asynccontextmanager
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Provide a transactional scope for the database session."""
-    async with AsyncSession(engine) as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    """
+    Initialize the database and create tables if they don't exist. The
+    check is skipped when the models haven't changed since the last start
+    """
+    await ensure_schema(engine, SQLModel.metadata)
+
+
+def get_request_timeout(request: Request) -> float:
+    """
+    Returns the deadline in seconds for the request, taken from the
+    request timeout header if it's present and valid
+
+    :params request: the request to get the timeout for
+    :returns: float the timeout in seconds
+    """
+    header = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    if header is None:
+        return DEFAULT_REQUEST_TIMEOUT
+    try:
+        timeout = float(header)
+    except ValueError:
+        return DEFAULT_REQUEST_TIMEOUT
+    if timeout <= 0:
+        return DEFAULT_REQUEST_TIMEOUT
+    return min(timeout, MAX_REQUEST_TIMEOUT)
+
+
+def expects_body(headers: Headers) -> bool:
+    """Returns whether the headers announce a request body"""
+    return headers.get("content-length", "0") != "0" or "transfer-encoding" in headers
+
+
+def track_body(scope: Scope, receive: Receive) -> Receive:
+    """
+    Returns the receive callable of the request, noting in the request
+    state once the body has been received in full
+
+    :params scope: the scope of the request
+    :params receive: the receive callable of the request
+    :returns: the receive callable the application should read from
+    """
+    state = scope.setdefault("state", {})
+    state[BODY_RECEIVED] = not expects_body(Headers(scope=scope))
+
+    async def tracked() -> Message:
+        message = await receive()
+        if message["type"] == "http.request" and not message.get("more_body", False):
+            state[BODY_RECEIVED] = True
+        return message
+
+    return tracked
+
+
+class BodyTrackingMiddleware:
+    """Notes in the state of every request once its body has been received"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            receive = track_body(scope, receive)
+        await self.app(scope, receive, send)
+
+
+def body_received(request: Request) -> bool:
+    """
+    Returns whether the request body has been read in full. Until then
+    polling for a disconnect would take (and drop) the body messages the
+    route is still reading, e.g. a streamed CSV import. Without the
+    BodyTrackingMiddleware only a request without a body counts as read
+
+    :params request: the request to check
+    :returns: bool True once there is no more body to read
+    """
+    received = request.scope.get("state", {}).get(BODY_RECEIVED)
+    if received is None:
+        return not expects_body(request.headers)
+    return received
+
+
+async def watch_disconnect(request: Request, deadline: QueryDeadline) -> None:
+    """
+    Cancel the deadline if the client disconnects before it expires. The
+    check waits until the request body has been received
+    """
+    while not deadline.expired:
+        if body_received(request) and await request.is_disconnected():
+            deadline.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provide the request scoped database session. The session is shared
+    by every dependency and endpoint of the request (FastAPI caches the
+    dependency per request), and by sub-requests that run with a session
+    already attached to the request state. It doesn't check out a
+    connection, or start watching for a client disconnect, until its
+    first statement. Statements are interrupted when the request deadline
+    passes or the client disconnects, which is reported as a 504 (a
+    disconnected client never sees it)
+    """
+    session = getattr(request.state, "db_session", None)
+    if session is not None:
+        yield session
+        return
+
+    deadline = QueryDeadline(get_request_timeout(request))
+    watchers = []
+    session = AsyncSession(
+        engine,
+        info={
+            "deadline": deadline,
+            "on_begin": lambda: watchers.append(
+                asyncio.create_task(watch_disconnect(request, deadline))
+            ),
+        },
+    )
+    request.state.db_session = session
+    try:
+        yield session
+    except OperationalError as e:
+        if not deadline.expired:
+            raise
+        raise HTTPException(
+            status_code=504,
+            detail="Request deadline exceeded",
+        ) from e
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        request.state.db_session = None
+        await session.close()
@@ -0,0 +1,209 @@
+"""
+This module contains the batch route, which runs many GET sub-requests
+in one round trip, e.g. the customer, invoices, invoice items and
+support rep a screen is rendered from. The sub-requests are dispatched
+straight to the matching routes of the application, without going
+through the middleware again, a few at a time. They share the batch
+request's database session through a proxy that lets one statement run
+at a time, as a session can't run two at once
+"""
+
+import asyncio
+import json
+from logging import getLogger
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.routing import BaseRoute, Match
+from starlette.types import Message, Scope
+
+from app.database import get_db
+from app.middleware import build_response_data
+from app.models.batch import BatchItem, BatchItemResult, BatchRequest
+from app.models.combined import CombinedResponseRead
+
+logger = getLogger()
+
+# the number of sub-requests of a batch run at the same time
+MAX_CONCURRENCY = 4
+
+# the session methods that run a statement, the others don't need the lock
+LOCKED_METHODS = frozenset(
+    (
+        "execute",
+        "scalar",
+        "scalars",
+        "get",
+        "refresh",
+        "flush",
+        "commit",
+        "rollback",
+        "run_sync",
+    )
+)
+
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["Batch"],
+)
+
+
+class LockedSession:
+    """
+    The session of a batch as its sub-requests see it: the statements of
+    the sub-requests take turns through the lock, everything else is the
+    session's own
+    """
+
+    def __init__(self, session: AsyncSession, lock: asyncio.Lock):
+        self._session = session
+        self._lock = lock
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._session, name)
+        if name not in LOCKED_METHODS:
+            return attribute
+
+        async def locked(*args, **kwargs):
+            async with self._lock:
+                return await attribute(*args, **kwargs)
+
+        return locked
+
+
+def returns_json(route: BaseRoute) -> bool:
+    """Returns whether the route is an API route responding with JSON, not e.g. an export"""
+    if not isinstance(route, APIRoute):
+        return False
+    # a DefaultPlaceholder unless the route sets its own
+    response_class = getattr(route.response_class, "value", route.response_class)
+    return issubclass(response_class, JSONResponse)
+
+
+def match_route(
+    routes: List[BaseRoute], scope: Scope
+) -> Tuple[Match, Optional[BaseRoute], Scope]:
+    """
+    Returns how well the best route matches the sub-request, the route
+    and its scope. A path without its trailing slash (or with one it
+    shouldn't have) matches as the application would redirect it
+    """
+    partial = (Match.NONE, None, {})
+    path = scope["path"]
+    for candidate in (path, path[:-1] if path.endswith("/") else f"{path}/"):
+        scope = {**scope, "path": candidate, "raw_path": candidate.encode()}
+        for route in routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return match, route, {**scope, **child_scope}
+            if match == Match.PARTIAL and partial[0] == Match.NONE:
+                partial = (match, route, {**scope, **child_scope})
+    return partial
+
+
+async def run_item(
+    request: Request, item: BatchItem, session: LockedSession
+) -> BatchItemResult:
+    """Returns the result of running the sub-request against its route"""
+    path, _, query_string = item.path.partition("?")
+    scope = {
+        **request.scope,
+        "method": item.method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        # the sub-request has no body
+        "headers": [
+            (name, value)
+            for name, value in request.scope["headers"]
+            if name not in (b"content-length", b"content-type")
+        ],
+        # get_db hands the sub-request the batch's session
+        "state": {**request.scope.get("state", {}), "db_session": session},
+    }
+    match, route, scope = match_route(request.app.router.routes, scope)
+    if match == Match.NONE:
+        return BatchItemResult(
+            path=item.path, status_code=404, body={"detail": "Not Found"}
+        )
+    if match == Match.PARTIAL:
+        return BatchItemResult(
+            path=item.path, status_code=405, body={"detail": "Method Not Allowed"}
+        )
+    if not returns_json(route):
+        return BatchItemResult(
+            path=item.path,
+            status_code=406,
+            body={"detail": "Only routes returning JSON can be batched"},
+        )
+
+    start: Message = {}
+    chunks: List[bytes] = []
+    finished = asyncio.Event()
+    received = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # the client stays connected until the sub-request has finished
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal start
+        if message["type"] == "http.response.start":
+            start = message
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await route.handle(scope, receive, send)
+    except Exception:
+        logger.exception(f"Batch sub-request {item.path} failed")
+        return BatchItemResult(
+            path=item.path, status_code=500, body={"detail": "Internal Server Error"}
+        )
+    finally:
+        finished.set()
+
+    status_code = start["status"]
+    body = json.loads(b"".join(chunks) or b"null")
+    # the metadata the middleware adds to a response it's given whole,
+    # a streamed page has its own already
+    if isinstance(body, dict) and b"content-length" in dict(start["headers"]):
+        body = (
+            build_response_data(Request(scope), Response(status_code=status_code), body)
+            or body
+        )
+    return BatchItemResult(path=item.path, status_code=status_code, body=body)
+
+
+@router.post(
+    "",
+    response_model=CombinedResponseRead[List[BatchItemResult]],
+)
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Runs GET sub-requests against the application's routes and returns
+    the status code and body of each, in the order they were given. A
+    sub-request failing doesn't fail the batch
+    """
+    locked_session = LockedSession(session, asyncio.Lock())
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def run(item: BatchItem) -> BatchItemResult:
+        async with semaphore:
+            return await run_item(request, item, locked_session)
+
+    results = await asyncio.gather(*(run(item) for item in batch.requests))
+    return CombinedResponseRead(response=results)
@@ -0,0 +1,200 @@
+"""
+This module contains the streamed bulk import of a table. The request
+body (NDJSON or CSV) is parsed incrementally as it arrives, validated in
+batches against the Create model, and inserted in one transaction per
+batch, so the memory used doesn't depend on the size of the upload.
+"""
+
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.cache.entities import get_entity_cache
+from app.cache.foreign_keys import (
+    load_referenced_id_sets,
+    check_foreign_keys,
+    record_ids,
+)
+from app.endpoints.streaming import ExportFormat
+from app.events import Phase, WriteEvent, count_write, publish
+from app.models.imports import ImportResult, ImportRowError
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 50_000
+DEFAULT_MAX_ERRORS = 20
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into decoded lines, without their line endings"""
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode()
+    if pending:
+        yield pending.rstrip(b"\r").decode()
+
+
+async def iter_ndjson_records(
+    stream: AsyncIterator[bytes],
+) -> AsyncIterator[Tuple[int, Union[Dict, ValueError]]]:
+    """
+    Yield the line number and decoded object of every non blank NDJSON
+    line, or the error for a line that isn't a JSON object
+    """
+    line_number = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"invalid JSON: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("expected a JSON object")
+            continue
+        yield line_number, record
+
+
+async def iter_csv_records(
+    stream: AsyncIterator[bytes],
+) -> AsyncIterator[Tuple[int, Union[Dict, ValueError]]]:
+    """
+    Yield the starting line number and the values of every CSV record,
+    keyed by the names in the header row, or the error for a malformed
+    record. Empty values become None.
+    Quoted values may span lines, so lines are joined until their quotes balance
+    """
+    header = None
+    record_lines: List[str] = []
+    line_number = start_line = 0
+    async for line in iter_lines(stream):
+        line_number += 1
+        if not record_lines:
+            start_line = line_number
+        record_lines.append(line)
+        if sum(part.count('"') for part in record_lines) % 2:
+            continue
+        text, record_lines = "\n".join(record_lines), []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield (
+                start_line,
+                ValueError(f"expected {len(header)} values, found {len(values)}"),
+            )
+            continue
+        yield (
+            start_line,
+            {
+                name: value if value != "" else None
+                for name, value in zip(header, values)
+            },
+        )
+
+
+RECORD_READERS = {
+    ExportFormat.NDJSON: iter_ndjson_records,
+    ExportFormat.CSV: iter_csv_records,
+}
+
+
+async def import_items(
+    stream: AsyncIterator[bytes],
+    format: ExportFormat,
+    model_class: Type,
+    create_class: Type[BaseModel],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_errors: int = DEFAULT_MAX_ERRORS,
+) -> ImportResult:
+    """
+    Import the records of the stream into the table of the model class
+
+    :params stream: the request body chunks
+    :params format: the format of the body
+    :params model_class: the table model class to insert into
+    :params create_class: the Create model every record is validated against
+    :params batch_size: the number of rows inserted per transaction
+    :params max_errors: the number of errors to report
+    :returns: ImportResult with the accepted and rejected counts and the first errors
+    """
+    result = ImportResult()
+
+    def reject(line: int, detail: str) -> None:
+        result.rejected += 1
+        if len(result.errors) < max_errors:
+            result.errors.append(ImportRowError(line=line, detail=detail))
+
+    # imports outlive the request deadline, so they get their own session
+    async with AsyncSession(engine) as session:
+        await load_referenced_id_sets(session, model_class)
+
+        async def insert_batch(batch: List[Tuple[int, Dict]]) -> None:
+            try:
+                inserted = await session.execute(
+                    insert(model_class).returning(
+                        model_class.id, sort_by_parameter_order=True
+                    ),
+                    [values for _, values in batch],
+                )
+                ids = inserted.scalars().all()
+                event = WriteEvent(
+                    model_class,
+                    rows=[{**values, "id": id} for (_, values), id in zip(batch, ids)],
+                    previous=[None] * len(ids),
+                )
+                await count_write(session, event)
+                await publish(session, event, Phase.BEFORE_COMMIT)
+                await session.commit()
+            except SQLAlchemyError as e:
+                await session.rollback()
+                for line, _ in batch:
+                    reject(line, f"insert failed: {e.__class__.__name__}")
+                return
+            result.accepted += len(batch)
+            record_ids(model_class, ids)
+            entity_cache = get_entity_cache(model_class)
+            for id in ids:
+                entity_cache.invalidate(id)
+            await publish(session, event, Phase.AFTER_COMMIT)
+
+        batch: List[Tuple[int, Dict]] = []
+        async for line, record in RECORD_READERS[format](stream):
+            if isinstance(record, Exception):
+                reject(line, str(record))
+                continue
+            try:
+                values = create_class.model_validate(record).model_dump()
+            except ValidationError as e:
+                reject(
+                    line,
+                    "; ".join(
+                        f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                        for error in e.errors()
+                    ),
+                )
+                continue
+            errors = await check_foreign_keys(session, model_class, values)
+            if errors:
+                reject(line, ", ".join(errors))
+                continue
+            batch.append((line, values))
+            if len(batch) >= batch_size:
+                await insert_batch(batch)
+                batch = []
+        if batch:
+            await insert_batch(batch)
+    return result
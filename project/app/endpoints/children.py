@@ -1,11 +1,12 @@
 from typing import List, Tuple
 from types import ModuleType
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.endpoints.pagination import oversized, stream_page
 from app.models.combined import CombinedResponseReadAll
 from app.models.albums import Album, AlbumRead
 from app.models.tracks import Track, TrackRead
@@ -65,37 +66,41 @@ def _child_album_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[AlbumRead], int],
     )
     async def read_artist_albums(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[AlbumRead], int]:
         """
         Retrieve an Artist the database with a paginated
         list of associated albums
         """
-        async with db as session:
-            query = (
-                select(Album)
-                .where(Album.artist_id == id)
-                .order_by(Album.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_albums = result.scalars().all()
+        query = (
+            select(Album)
+            .where(Album.artist_id == id)
+            .order_by(Album.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of albums
+        count_query = select(func.count(Album.id)).where(Album.artist_id == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, AlbumRead)
 
-            # Query for total count of albums
-            count_query = select(func.count(Album.id)).where(Album.artist_id == id)
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_albums = result.scalars().all()
 
-            albums = [AlbumRead.model_validate(db_album) for db_album in db_albums]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=albums,
-                total_count=total_count,
-            )
+        albums = [AlbumRead.model_validate(db_album) for db_album in db_albums]
+
+        return CombinedResponseReadAll(
+            response=albums,
+            total_count=total_count,
+        )
 
 
 def _child_track_handler(router: APIRouter):
@@ -104,37 +109,41 @@ def _child_track_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[TrackRead], int],
     )
     async def read_album_tracks(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[TrackRead], int]:
         """
         Retrieve an Album the database with a paginated
         list of associated albums
         """
-        async with db as session:
-            query = (
-                select(Track)
-                .where(Track.album_id == id)
-                .order_by(Track.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_tracks = result.scalars().all()
+        query = (
+            select(Track)
+            .where(Track.album_id == id)
+            .order_by(Track.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of tracks
+        count_query = select(func.count(Track.id)).where(Track.album_id == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, TrackRead)
 
-            # Query for total count of tracks
-            count_query = select(func.count(Track.id)).where(Track.album_id == id)
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_tracks = result.scalars().all()
 
-            tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=tracks,
-                total_count=total_count,
-            )
+        tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+
+        return CombinedResponseReadAll(
+            response=tracks,
+            total_count=total_count,
+        )
 
 
 def _child_invoice_item_handler(router: APIRouter):
@@ -143,42 +152,48 @@ def _child_invoice_item_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[InvoiceItemRead], int],
     )
     async def read_track_invoice_items(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[InvoiceItemRead], int]:
         """
         Retrieve a Track from the database with a paginated
         list of associated invoice items
         """
-        async with db as session:
-            query = (
-                select(InvoiceItem)
-                .where(InvoiceItem.track_id == id)
-                .order_by(InvoiceItem.id)
-                .offset(offset)
-                .limit(limit)
+        query = (
+            select(InvoiceItem)
+            .where(InvoiceItem.track_id == id)
+            .order_by(InvoiceItem.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of invoice items
+        count_query = select(func.count(InvoiceItem.id)).where(
+            InvoiceItem.track_id == id
+        )
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(
+                request, session, query, count_query, InvoiceItemRead
             )
-            # Execute the query
-            result = await session.execute(query)
-            db_invoice_items = result.scalars().all()
 
-            # Query for total count of invoice items
-            count_query = select(func.count(InvoiceItem.id)).where(
-                InvoiceItem.track_id == id
-            )
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_invoice_items = result.scalars().all()
 
-            invoice_items = [
-                InvoiceItemRead.model_validate(db_invoice_item)
-                for db_invoice_item in db_invoice_items
-            ]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=invoice_items,
-                total_count=total_count,
-            )
+        invoice_items = [
+            InvoiceItemRead.model_validate(db_invoice_item)
+            for db_invoice_item in db_invoice_items
+        ]
+
+        return CombinedResponseReadAll(
+            response=invoice_items,
+            total_count=total_count,
+        )
 
 
 def _child_track_playlist_handler(router: APIRouter):
@@ -187,54 +202,58 @@ def _child_track_playlist_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[PlaylistRead], int],
     )
     async def read_track_playlists(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[PlaylistRead], int]:
         """
         Retrieve a Track from the database with a paginated
         list of associated playlists
         """
-        async with db as session:
-            query = (
-                select(Playlist)
-                .join(
-                    PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id
-                )  # Join Playlist to playlist_track
-                .join(
-                    Track, PlaylistTrack.track_id == Track.id
-                )  # Join playlist_track to Track
-                .where(Track.id == id)  # Filter by the track ID
-                .order_by(Playlist.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_playlists = result.scalars().all()
-
-            # Query for total count of playlists
-            count_query = (
-                select(func.count(Playlist.id))
-                .join(
-                    PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id
-                )  # Join Playlist to playlist_track
-                .join(
-                    Track, PlaylistTrack.track_id == Track.id
-                )  # Join playlist_track to Track
-                .where(Track.id == id)
-            )
-            total_count = await session.scalar(count_query)
+        query = (
+            select(Playlist)
+            .join(
+                PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id
+            )  # Join Playlist to playlist_track
+            .join(
+                Track, PlaylistTrack.track_id == Track.id
+            )  # Join playlist_track to Track
+            .where(Track.id == id)  # Filter by the track ID
+            .order_by(Playlist.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of playlists
+        count_query = (
+            select(func.count(Playlist.id))
+            .join(
+                PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id
+            )  # Join Playlist to playlist_track
+            .join(
+                Track, PlaylistTrack.track_id == Track.id
+            )  # Join playlist_track to Track
+            .where(Track.id == id)
+        )
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, PlaylistRead)
 
-            playlists = [
-                PlaylistRead.model_validate(db_playlist) for db_playlist in db_playlists
-            ]
+        # Execute the query
+        result = await session.execute(query)
+        db_playlists = result.scalars().all()
 
-            return CombinedResponseReadAll(
-                response=playlists,
-                total_count=total_count,
-            )
+        total_count = await session.scalar(count_query)
+
+        playlists = [
+            PlaylistRead.model_validate(db_playlist) for db_playlist in db_playlists
+        ]
+
+        return CombinedResponseReadAll(
+            response=playlists,
+            total_count=total_count,
+        )
 
 
 def _child_genre_track_handler(router: APIRouter):
@@ -243,37 +262,41 @@ def _child_genre_track_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[TrackRead], int],
     )
     async def read_tracks(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[TrackRead], int]:
         """
         Retrieve a Genre the database with a paginated
         list of associated tracks
         """
-        async with db as session:
-            query = (
-                select(Track)
-                .where(Track.genre_id == id)
-                .order_by(Track.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_tracks = result.scalars().all()
+        query = (
+            select(Track)
+            .where(Track.genre_id == id)
+            .order_by(Track.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of media types
+        count_query = select(func.count(Track.id)).where(Track.genre_id == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, TrackRead)
 
-            # Query for total count of media types
-            count_query = select(func.count(Track.id)).where(Track.genre_id == id)
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_tracks = result.scalars().all()
 
-            tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=tracks,
-                total_count=total_count,
-            )
+        tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+
+        return CombinedResponseReadAll(
+            response=tracks,
+            total_count=total_count,
+        )
 
 
 def _child_media_type_track_handler(router: APIRouter):
@@ -282,37 +305,41 @@ def _child_media_type_track_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[TrackRead], int],
     )
     async def read_tracks(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[TrackRead], int]:
         """
         Retrieve a MediaType the database with a paginated
         list of associated tracks
         """
-        async with db as session:
-            query = (
-                select(Track)
-                .where(Track.media_type_id == id)
-                .order_by(Track.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_tracks = result.scalars().all()
+        query = (
+            select(Track)
+            .where(Track.media_type_id == id)
+            .order_by(Track.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of media types
+        count_query = select(func.count(Track.id)).where(Track.media_type_id == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, TrackRead)
 
-            # Query for total count of media types
-            count_query = select(func.count(Track.id)).where(Track.media_type_id == id)
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_tracks = result.scalars().all()
 
-            tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=tracks,
-                total_count=total_count,
-            )
+        tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+
+        return CombinedResponseReadAll(
+            response=tracks,
+            total_count=total_count,
+        )
 
 
 def _child_playlist_track_handler(router: APIRouter):
@@ -321,44 +348,48 @@ def _child_playlist_track_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[TrackRead], int],
     )
     async def read_playlists_track(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[TrackRead], int]:
         """
         Retrieve a Track from the database with a paginated
         list of associated playlists
         """
-        async with db as session:
-            query = (
-                select(Track)
-                .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
-                .join(Playlist, PlaylistTrack.playlist_id == Playlist.id)
-                .where(Playlist.id == id)
-                .order_by(Track.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_tracks = result.scalars().all()
-
-            # Query for total count of playlists
-            count_query = (
-                select(func.count(Track.id))
-                .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
-                .join(Playlist, PlaylistTrack.playlist_id == Playlist.id)
-                .where(Playlist.id == id)
-            )
-            total_count = await session.scalar(count_query)
+        query = (
+            select(Track)
+            .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
+            .join(Playlist, PlaylistTrack.playlist_id == Playlist.id)
+            .where(Playlist.id == id)
+            .order_by(Track.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of playlists
+        count_query = (
+            select(func.count(Track.id))
+            .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
+            .join(Playlist, PlaylistTrack.playlist_id == Playlist.id)
+            .where(Playlist.id == id)
+        )
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, TrackRead)
 
-            tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+        # Execute the query
+        result = await session.execute(query)
+        db_tracks = result.scalars().all()
 
-            return CombinedResponseReadAll(
-                response=tracks,
-                total_count=total_count,
-            )
+        total_count = await session.scalar(count_query)
+
+        tracks = [TrackRead.model_validate(db_track) for db_track in db_tracks]
+
+        return CombinedResponseReadAll(
+            response=tracks,
+            total_count=total_count,
+        )
 
 
 def _child_invoice_invoice_item_handler(router: APIRouter):
@@ -367,42 +398,48 @@ def _child_invoice_invoice_item_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[InvoiceItemRead], int],
     )
     async def read_invoice_items(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[InvoiceItemRead], int]:
         """
         Retrieve a Invoice the database with a paginated
         list of associated invoice items
         """
-        async with db as session:
-            query = (
-                select(InvoiceItem)
-                .where(InvoiceItem.invoice_id == id)
-                .order_by(InvoiceItem.id)
-                .offset(offset)
-                .limit(limit)
+        query = (
+            select(InvoiceItem)
+            .where(InvoiceItem.invoice_id == id)
+            .order_by(InvoiceItem.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of invoice items
+        count_query = select(func.count(InvoiceItem.id)).where(
+            InvoiceItem.invoice_id == id
+        )
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(
+                request, session, query, count_query, InvoiceItemRead
             )
-            # Execute the query
-            result = await session.execute(query)
-            db_invoice_items = result.scalars().all()
 
-            # Query for total count of invoice items
-            count_query = select(func.count(InvoiceItem.id)).where(
-                InvoiceItem.invoice_id == id
-            )
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_invoice_items = result.scalars().all()
 
-            invoice_items = [
-                InvoiceItemRead.model_validate(db_invoice_item)
-                for db_invoice_item in db_invoice_items
-            ]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=invoice_items,
-                total_count=total_count,
-            )
+        invoice_items = [
+            InvoiceItemRead.model_validate(db_invoice_item)
+            for db_invoice_item in db_invoice_items
+        ]
+
+        return CombinedResponseReadAll(
+            response=invoice_items,
+            total_count=total_count,
+        )
 
 
 def _child_customer_invoice_handler(router: APIRouter):
@@ -411,41 +448,43 @@ def _child_customer_invoice_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[InvoiceRead], int],
     )
     async def read_invoices(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[InvoiceItemRead], int]:
         """
         Retrieve a Invoice the database with a paginated
         list of associated invoice items
         """
-        async with db as session:
-            query = (
-                select(Invoice)
-                .where(Invoice.customer_id == id)
-                .order_by(Invoice.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_invoices = result.scalars().all()
+        query = (
+            select(Invoice)
+            .where(Invoice.customer_id == id)
+            .order_by(Invoice.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of invoice items
+        count_query = select(func.count(Invoice.id)).where(Invoice.customer_id == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, InvoiceRead)
 
-            # Query for total count of invoice items
-            count_query = select(func.count(Invoice.id)).where(
-                Invoice.customer_id == id
-            )
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_invoices = result.scalars().all()
 
-            invoices = [
-                InvoiceRead.model_validate(db_invoice) for db_invoice in db_invoices
-            ]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=invoices,
-                total_count=total_count,
-            )
+        invoices = [
+            InvoiceRead.model_validate(db_invoice) for db_invoice in db_invoices
+        ]
+
+        return CombinedResponseReadAll(
+            response=invoices,
+            total_count=total_count,
+        )
 
 
 def _child_employee_customer_handler(router: APIRouter):
@@ -454,41 +493,45 @@ def _child_employee_customer_handler(router: APIRouter):
         response_model=CombinedResponseReadAll[List[CustomerRead], int],
     )
     async def read_customers(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[CustomerRead], int]:
         """
         Retrieve an Employee the database with a paginated
         list of associated customers
         """
-        async with db as session:
-            query = (
-                select(Customer)
-                .where(Customer.support_rep_id == id)
-                .order_by(Customer.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_customers = result.scalars().all()
+        query = (
+            select(Customer)
+            .where(Customer.support_rep_id == id)
+            .order_by(Customer.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of invoice items
+        count_query = select(func.count(Customer.id)).where(
+            Customer.support_rep_id == id
+        )
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, CustomerRead)
 
-            # Query for total count of invoice items
-            count_query = select(func.count(Customer.id)).where(
-                Customer.support_rep_id == id
-            )
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_customers = result.scalars().all()
 
-            customers = [
-                CustomerRead.model_validate(db_customer) for db_customer in db_customers
-            ]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=customers,
-                total_count=total_count,
-            )
+        customers = [
+            CustomerRead.model_validate(db_customer) for db_customer in db_customers
+        ]
+
+        return CombinedResponseReadAll(
+            response=customers,
+            total_count=total_count,
+        )
 
 
 def _child_employee_employee_hander(router: APIRouter):
@@ -497,41 +540,43 @@ def _child_employee_employee_hander(router: APIRouter):
         response_model=CombinedResponseReadAll[List[EmployeeRead], int],
     )
     async def read_employee_reports(
+        request: Request,
         id: int,
         offset: int = 0,
         limit: int = 10,
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ) -> [List[EmployeeRead], int]:
         """
         Retrieve an Employee the database with a paginated
         list of associated employees (reports)
         """
-        async with db as session:
-            query = (
-                select(Employee)
-                .where(Employee.reports_to == id)
-                .order_by(Employee.id)
-                .offset(offset)
-                .limit(limit)
-            )
-            # Execute the query
-            result = await session.execute(query)
-            db_employees = result.scalars().all()
+        query = (
+            select(Employee)
+            .where(Employee.reports_to == id)
+            .order_by(Employee.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        # Query for total count of invoice items
+        count_query = select(func.count(Employee.id)).where(Employee.reports_to == id)
+        # a page above the maximum size is streamed rather than built
+        if oversized(limit):
+            return await stream_page(request, session, query, count_query, EmployeeRead)
 
-            # Query for total count of invoice items
-            count_query = select(func.count(Employee.id)).where(
-                Employee.reports_to == id
-            )
-            total_count = await session.scalar(count_query)
+        # Execute the query
+        result = await session.execute(query)
+        db_employees = result.scalars().all()
 
-            employees = [
-                EmployeeRead.model_validate(db_employee) for db_employee in db_employees
-            ]
+        total_count = await session.scalar(count_query)
 
-            return CombinedResponseReadAll(
-                response=employees,
-                total_count=total_count,
-            )
+        employees = [
+            EmployeeRead.model_validate(db_employee) for db_employee in db_employees
+        ]
+
+        return CombinedResponseReadAll(
+            response=employees,
+            total_count=total_count,
+        )
 
 
 def get_model_class_name(model: ModuleType) -> Tuple[str]:
@@ -5,18 +5,29 @@ to support multiple response classes and multiple
 input classes
 """
 
-from typing import List, Type, TypeVar
+from typing import Any, Dict, List, Tuple, Type, TypeVar
 import inspect
 
 from fastapi import HTTPException
-from sqlalchemy import select, func
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache.entities import get_entity_cache
+from app.cache.foreign_keys import validate_foreign_keys, record_ids
+from app.endpoints.streaming import get_table_columns, json_default
+from app.events import WriteEvent, commit_write, row_values
+from app.models.updates import BulkPatchResult
+
 
 ParentType = TypeVar("ParentType")
 InputType = TypeVar("InputType")
 OutputType = TypeVar("OutputType")
 
+# the number of rows a patch by filter updates unless it allows more
+DEFAULT_MAX_PATCH_ROWS = 1000
+
 
 async def create_item(
     session: AsyncSession,
@@ -30,23 +41,21 @@ async def create_item(
     if not inspect.isclass(model_class):
         raise ValueError("model_class must be class object")
 
-    # Check if this is an Album being created
-    if model_class.__name__ == "Album":
-        # Verify artist exists
-        from app.models.artists import Artist
-        artist_query = select(Artist).where(Artist.id == data.artist_id)
-        artist_result = await session.execute(artist_query)
-        artist = artist_result.scalar_one_or_none()
-        if artist is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Artist not found"
-            )
+    # Verify the rows the foreign keys reference exist
+    values = data.model_dump()
+    await validate_foreign_keys(session, model_class, values)
 
-    db_item = model_class(**data.model_dump())
+    db_item = model_class(**values)
     session.add(db_item)
-    await session.commit()
+    # flush to assign the id the write event reports
+    await session.flush()
+    await commit_write(
+        session,
+        WriteEvent(model_class, rows=[row_values(db_item)], previous=[None]),
+    )
     await session.refresh(db_item)
+    get_entity_cache(model_class).put(db_item)
+    record_ids(model_class, [db_item.id])
     return db_item
 
 
@@ -74,24 +83,77 @@ async def read_items(
     return [(db_item) for db_item in db_items], total_count
 
 
+async def read_items_columnar(
+    session: AsyncSession,
+    offset: int = 0,
+    limit: int = 10,
+    model_class: Type[InputType] = None,
+) -> Tuple[List[str], Dict[str, List[Any]], int]:
+    """
+    Retrieve a paginated list of items from the database in columnar form.
+    The page is built straight from the result rows, without creating an
+    ORM or Read object per row.
+    Returns the column names, a dict of the values of each column and the total count.
+    """
+    if not inspect.isclass(model_class):
+        raise ValueError("model_class must be a class object")
+
+    columns = get_table_columns(model_class)
+    names = [name for name, _ in columns]
+    query = select(*[column for _, column in columns]).offset(offset).limit(limit)
+    result = await session.execute(query)
+    rows = result.all()
+
+    # Query for total count
+    count_query = select(func.count()).select_from(model_class)
+    total_count = await session.scalar(count_query)
+
+    return names, build_columns(names, rows), total_count
+
+
+def build_columns(names: List[str], rows: List[Tuple]) -> Dict[str, List[Any]]:
+    """
+    Transpose rows into a dict of column values, encoding the values
+    JSON doesn't handle (Decimal, datetime) the same way the Read models do
+    """
+    data = {}
+    for index, name in enumerate(names):
+        values = [row[index] for row in rows]
+        sample = next((value for value in values if value is not None), None)
+        if sample is not None and not isinstance(sample, (int, float, str, bool)):
+            values = [
+                None if value is None else json_default(value) for value in values
+            ]
+        data[name] = values
+    return data
+
+
 async def read_item(
     session: AsyncSession,
     id: int,
     model_class: Type[InputType],
 ) -> OutputType:
     """
-    Retrieve an item from the database by ID.
-    Returns the item as the same class if found, None otherwise.
+    Retrieve an item by ID, reading through the entity cache of the model class.
+    Returns the item as the Read class of the model if found, raises a 404 otherwise.
     """
     if not inspect.isclass(model_class):
         raise ValueError("model_class must be class object")
 
+    entity_cache = get_entity_cache(model_class)
+    item = entity_cache.get(id)
+    if item is not None:
+        return item
+    if entity_cache.is_missing(id):
+        raise HTTPException(status_code=404, detail=f"{model_class} not found")
+
     query = select(model_class).where(model_class.id == id)
     result = await session.execute(query)
     db_item = result.scalar_one_or_none()
     if db_item is None:
+        entity_cache.put_missing(id)
         raise HTTPException(status_code=404, detail=f"{model_class} not found")
-    return db_item
+    return entity_cache.put(db_item)
 
 
 async def update_item(
@@ -113,12 +175,19 @@ async def update_item(
     if db_item is None:
         return None
 
-    for key, value in data.model_dump(exclude_unset=True).items():
+    values = data.model_dump(exclude_unset=True)
+    await validate_foreign_keys(session, model_class, values)
+    previous = row_values(db_item)
+    for key, value in values.items():
         setattr(db_item, key, value)
 
     session.add(db_item)
-    await session.commit()
+    await commit_write(
+        session,
+        WriteEvent(model_class, rows=[row_values(db_item)], previous=[previous]),
+    )
     await session.refresh(db_item)
+    get_entity_cache(model_class).put(db_item)
     return db_item
 
 
@@ -141,11 +210,99 @@ async def patch_item(
     if db_item is None:
         return None
 
-    for key, value in data.model_dump(exclude_unset=True).items():
+    values = data.model_dump(exclude_unset=True)
+    await validate_foreign_keys(session, model_class, values)
+    previous = row_values(db_item)
+    for key, value in values.items():
         if value is not None:
             setattr(db_item, key, value)
 
     session.add(db_item)
-    await session.commit()
+    await commit_write(
+        session,
+        WriteEvent(model_class, rows=[row_values(db_item)], previous=[previous]),
+    )
     await session.refresh(db_item)
+    get_entity_cache(model_class).put(db_item)
     return db_item
+
+
+def validate_fields(
+    model: Type[BaseModel], data: Dict[str, Any], location: str
+) -> Dict[str, Any]:
+    """
+    Validate some of the fields of the model class one at a time, with
+    the constraints each has on the class, e.g. a partial Patch body.
+    Raises a RequestValidationError (422) listing every invalid value.
+    Returns the validated values
+    """
+    item = model.model_construct()
+    errors = []
+    for name, value in data.items():
+        try:
+            model.__pydantic_validator__.validate_assignment(item, name, value)
+        except ValidationError as e:
+            errors.extend(
+                {**error, "loc": (location, *error["loc"])} for error in e.errors()
+            )
+    if errors:
+        raise RequestValidationError(errors)
+    return {name: getattr(item, name) for name in data}
+
+
+async def patch_items(
+    session: AsyncSession,
+    filters: Dict[str, List[Any]],
+    values: Dict[str, Any],
+    model_class: Type[InputType],
+    dry_run: bool = False,
+    max_rows: int = DEFAULT_MAX_PATCH_ROWS,
+) -> BulkPatchResult:
+    """
+    Update every row matching the filters with the values in one UPDATE ... WHERE.
+    The filters hold the values each attribute may equal, at least one is
+    required so a missing query string can't update the whole table. With
+    dry_run the matching rows are only counted, otherwise raises a 400 if
+    more rows than max_rows match.
+    """
+    if not inspect.isclass(model_class):
+        raise ValueError("model_class must be class object")
+
+    if not filters:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+
+    # as with patch_item, None leaves the value as it is
+    values = {key: value for key, value in values.items() if value is not None}
+    if not values:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    await validate_foreign_keys(session, model_class, values)
+
+    columns = dict(get_table_columns(model_class))
+    conditions = [
+        columns[name] == allowed[0] if len(allowed) == 1 else columns[name].in_(allowed)
+        for name, allowed in filters.items()
+    ]
+    matched = await session.scalar(
+        select(func.count()).select_from(model_class).where(*conditions)
+    )
+    if dry_run or not matched:
+        return BulkPatchResult(matched=matched, updated=0, dry_run=dry_run)
+    if matched > max_rows:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{matched} rows match, more than max_rows ({max_rows})",
+        )
+
+    result = await session.execute(
+        update(model_class)
+        .where(*conditions)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    # the rows weren't read, the listeners refresh what they derive from the
+    # columns set
+    await commit_write(
+        session, WriteEvent(model_class, bulk=True, columns=tuple(values))
+    )
+    get_entity_cache(model_class).clear()
+    return BulkPatchResult(matched=matched, updated=result.rowcount, dry_run=False)
@@ -0,0 +1,138 @@
+"""
+This module contains the invoice routes beyond those every table gets:
+the document of an invoice with its customer and lines, and the
+creation of an invoice with its lines in one transaction
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.entities import get_entity_cache
+from app.cache.foreign_keys import (
+    check_foreign_keys,
+    record_ids,
+    validate_foreign_keys,
+)
+from app.database import get_db
+from app.events import WriteEvent, commit_write
+from app.models.combined import CombinedResponseCreate, CombinedResponseRead
+from app.models.documents import InvoiceDocument, InvoiceWithItemsCreate
+from app.models.invoice_items import InvoiceItem
+from app.models.invoices import Invoice
+from app.models.metadata import MetaDataCreate
+from app.reports.invoice_documents import read_invoice_document
+
+
+router = APIRouter(
+    prefix="/invoices",
+    tags=["Invoices"],
+)
+
+
+@router.get(
+    "/{id}/document",
+    response_model=CombinedResponseRead[InvoiceDocument],
+)
+async def read_document(
+    id: int = Path(..., title="The ID of the invoice"),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the invoice with its customer and its lines, each with the
+    names of its track, album and artist
+    """
+    document = await read_invoice_document(session, id)
+    return CombinedResponseRead(response=document)
+
+
+async def create_invoice_with_items(
+    session: AsyncSession, data: InvoiceWithItemsCreate
+) -> int:
+    """
+    Insert the invoice and its lines in one transaction, the lines with
+    a single bulk insert, and set the total of the invoice to the sum of
+    its lines in SQL. Returns the id of the invoice
+    """
+    values = data.model_dump(exclude={"items"})
+    await validate_foreign_keys(session, Invoice, values)
+    errors = sorted(
+        {
+            error
+            for item in data.items
+            for error in await check_foreign_keys(
+                session, InvoiceItem, item.model_dump()
+            )
+        }
+    )
+    if errors:
+        raise HTTPException(status_code=400, detail=", ".join(errors))
+
+    db_invoice = Invoice(**values, total=0)
+    session.add(db_invoice)
+    # flush to assign the id the lines reference
+    await session.flush()
+    invoice_id = db_invoice.id
+    lines = [{**item.model_dump(), "invoice_id": invoice_id} for item in data.items]
+    inserted = await session.execute(
+        insert(InvoiceItem).returning(InvoiceItem.id, sort_by_parameter_order=True),
+        lines,
+    )
+    line_ids = inserted.scalars().all()
+    # the total is summed by the database from the lines it holds
+    updated = await session.execute(
+        update(Invoice)
+        .where(Invoice.id == invoice_id)
+        .values(
+            total=select(
+                func.round(
+                    func.coalesce(
+                        func.sum(InvoiceItem.unit_price * InvoiceItem.quantity), 0
+                    ),
+                    2,
+                )
+            )
+            .where(InvoiceItem.invoice_id == invoice_id)
+            .scalar_subquery()
+        )
+        .returning(Invoice.total)
+    )
+    total = updated.scalar_one()
+    await commit_write(
+        session,
+        WriteEvent(
+            Invoice,
+            rows=[{**values, "id": invoice_id, "total": total}],
+            previous=[None],
+        ),
+        WriteEvent(
+            InvoiceItem,
+            rows=[{**line, "id": id} for line, id in zip(lines, line_ids)],
+            previous=[None] * len(line_ids),
+        ),
+    )
+    record_ids(Invoice, [invoice_id])
+    record_ids(InvoiceItem, line_ids)
+    get_entity_cache(Invoice).invalidate(invoice_id)
+    line_cache = get_entity_cache(InvoiceItem)
+    for id in line_ids:
+        line_cache.invalidate(id)
+    return invoice_id
+
+
+@router.post(
+    "/with_items",
+    response_model=CombinedResponseCreate[InvoiceDocument],
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_with_items(
+    data: InvoiceWithItemsCreate,
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Creates the invoice and its lines in one transaction, with the total
+    computed from the lines, and returns the invoice's document
+    """
+    id = await create_invoice_with_items(session, data)
+    document = await read_invoice_document(session, id)
+    return CombinedResponseCreate(meta_data=MetaDataCreate(), response=document)
@@ -0,0 +1,116 @@
+"""
+This module contains the page size limit of the collection routes. A
+page of up to MAX_PAGE_SIZE rows is built in memory as usual. A larger
+one is either rejected, or streamed as a JSON array encoded a chunk of
+rows at a time inside the same meta_data envelope, so the memory a
+request uses doesn't depend on the limit it asks for.
+"""
+
+import json
+import os
+from enum import Enum
+from typing import AsyncGenerator, List, Type
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.sql.selectable import Select
+
+from app.endpoints.streaming import STREAM_CHUNK_SIZE, get_table_columns
+from app.middleware import build_response_data
+
+
+class OversizedPages(str, Enum):
+    """What the collection routes do with a limit above the maximum page size"""
+
+    REJECT = "reject"
+    STREAM = "stream"
+
+
+MAX_PAGE_SIZE = int(os.environ.get("CHINOOK_MAX_PAGE_SIZE", 1000))
+OVERSIZED_PAGES = OversizedPages(os.environ.get("CHINOOK_OVERSIZED_PAGES", "stream"))
+
+
+def oversized(limit: int, streamable: bool = True) -> bool:
+    """
+    Returns whether the page has to be streamed. Raises a 422 when the
+    limit is below 1, or above the maximum and oversized pages are
+    rejected or the page can't be streamed
+
+    :params limit: the limit of the request
+    :params streamable: whether the route can stream the page
+    :returns: bool True if the page has to be streamed
+    """
+    if 1 <= limit <= MAX_PAGE_SIZE:
+        return False
+    # a negative limit is no limit to SQLite, and a page of zero rows
+    # can't be numbered
+    if limit < 1 or OVERSIZED_PAGES == OversizedPages.REJECT or not streamable:
+        raise HTTPException(
+            status_code=422,
+            detail=f"limit must be between 1 and {MAX_PAGE_SIZE}",
+        )
+    return True
+
+
+async def encode_page(
+    engine: AsyncEngine,
+    query: Select,
+    read_model: Type,
+    meta_data: dict,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Stream the rows of the query as the response array of the envelope.
+    The rows are read and encoded STREAM_CHUNK_SIZE at a time by a
+    session of its own, the generator outlives the request's session
+    """
+    adapter = TypeAdapter(List[read_model])
+    # the columns of the rows rather than ORM objects, which cost more to
+    # load than to encode
+    columns = get_table_columns(query.column_descriptions[0]["entity"])
+    names = [name for name, _ in columns]
+    query = query.with_only_columns(*[column for _, column in columns])
+    envelope = json.dumps({"meta_data": meta_data}, separators=(",", ":"))
+    # the envelope without its closing brace, the rows follow
+    yield envelope[:-1].encode() + b',"response":['
+    separator = b""
+    async with AsyncSession(engine) as session:
+        result = await session.stream(
+            query.execution_options(yield_per=STREAM_CHUNK_SIZE)
+        )
+        async for rows in result.partitions(STREAM_CHUNK_SIZE):
+            items = adapter.dump_json(
+                adapter.validate_python([dict(zip(names, row)) for row in rows])
+            )
+            yield separator + items[1:-1]
+            separator = b","
+    yield b"]}"
+
+
+async def stream_page(
+    request: Request,
+    session: AsyncSession,
+    query: Select,
+    count_query: Select,
+    read_model: Type,
+) -> StreamingResponse:
+    """
+    Returns the page of the query as a streamed response with the
+    pagination metadata the metadata middleware adds to a built page
+
+    :params request: the request of the page
+    :params session: the request's session, the total is counted with it
+    :params query: the query of the page's rows, with its offset and limit
+    :params count_query: the query of the total count
+    :params read_model: the Read model the rows are encoded with
+    :returns: StreamingResponse the page
+    """
+    total_count = await session.scalar(count_query)
+    meta_data = build_response_data(
+        request, Response(), {"response": [], "total_count": total_count}
+    )["meta_data"]
+    return StreamingResponse(
+        encode_page(session.bind, query, read_model, meta_data),
+        media_type="application/json",
+    )
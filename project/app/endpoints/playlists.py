@@ -0,0 +1,129 @@
+"""
+This module contains the playlist routes beyond those every table gets:
+adding tracks to and removing tracks from a playlist, many at a time,
+each change one set-based statement in one transaction
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.foreign_keys import find_missing_ids
+from app.database import get_db
+from app.endpoints import crud
+from app.events import WriteEvent, commit_write
+from app.models.combined import CombinedResponseUpdate
+from app.models.metadata import MetaDataUpdate
+from app.models.playlist_track import PlaylistTrack
+from app.models.playlists import (
+    Playlist,
+    PlaylistTracksChange,
+    PlaylistTracksChanged,
+)
+from app.models.tracks import Track
+
+# the number of missing track ids reported
+MAX_REPORTED_IDS = 10
+
+
+router = APIRouter(
+    prefix="/playlists",
+    tags=["Playlists"],
+)
+
+
+async def validate_change(
+    session: AsyncSession, id: int, change: PlaylistTracksChange
+) -> List[int]:
+    """
+    Returns the distinct track ids of the change in the order given.
+    Raises a 404 if there is no such playlist, and a 400 if any of the
+    tracks doesn't exist
+    """
+    await crud.read_item(session, id, Playlist)
+    track_ids = list(dict.fromkeys(change.track_ids))
+    missing = await find_missing_ids(session, Track, track_ids)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{Track.__name__} not found: "
+            + ", ".join(str(track_id) for track_id in missing[:MAX_REPORTED_IDS]),
+        )
+    return track_ids
+
+
+@router.post(
+    "/{id}/tracks",
+    response_model=CombinedResponseUpdate[PlaylistTracksChanged],
+)
+async def add_playlist_tracks(
+    change: PlaylistTracksChange,
+    id: int = Path(..., title="The ID of the playlist"),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Adds the tracks to the playlist with one INSERT OR IGNORE, tracks
+    already in the playlist are skipped
+    """
+    track_ids = await validate_change(session, id, change)
+    result = await session.execute(
+        insert(PlaylistTrack)
+        .prefix_with("OR IGNORE")
+        .returning(PlaylistTrack.track_id),
+        [{"playlist_id": id, "track_id": track_id} for track_id in track_ids],
+    )
+    added = result.scalars().all()
+    await commit_write(
+        session,
+        WriteEvent(
+            PlaylistTrack,
+            rows=[{"playlist_id": id, "track_id": track_id} for track_id in added],
+            previous=[None] * len(added),
+        ),
+    )
+    return CombinedResponseUpdate(
+        meta_data=MetaDataUpdate(),
+        response=PlaylistTracksChanged(
+            playlist_id=id, requested=len(track_ids), changed=len(added)
+        ),
+    )
+
+
+@router.delete(
+    "/{id}/tracks",
+    response_model=CombinedResponseUpdate[PlaylistTracksChanged],
+)
+async def remove_playlist_tracks(
+    change: PlaylistTracksChange,
+    id: int = Path(..., title="The ID of the playlist"),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Removes the tracks from the playlist with one DELETE ... IN, tracks
+    not in the playlist are skipped
+    """
+    track_ids = await validate_change(session, id, change)
+    result = await session.execute(
+        delete(PlaylistTrack)
+        .where(
+            PlaylistTrack.playlist_id == id,
+            PlaylistTrack.track_id.in_(track_ids),
+        )
+        .returning(PlaylistTrack.track_id)
+    )
+    removed = result.scalars().all()
+    await commit_write(
+        session,
+        WriteEvent(
+            PlaylistTrack,
+            deleted=[{"playlist_id": id, "track_id": track_id} for track_id in removed],
+        ),
+    )
+    return CombinedResponseUpdate(
+        meta_data=MetaDataUpdate(),
+        response=PlaylistTracksChanged(
+            playlist_id=id, requested=len(track_ids), changed=len(removed)
+        ),
+    )
@@ -0,0 +1,71 @@
+"""
+This module contains the "customers who bought this also bought" routes
+of the tracks and albums, and the similar tracks route
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.endpoints import crud
+from app.models.albums import Album
+from app.models.combined import CombinedResponseReadAll
+from app.models.reports import AlsoBoughtEntry, SimilarTrack
+from app.models.tracks import Track
+from app.reports.also_bought import read_also_bought
+from app.reports.similar import read_similar_tracks
+
+
+router = APIRouter(
+    tags=["Recommendations"],
+)
+
+
+@router.get(
+    "/tracks/{id}/also_bought",
+    response_model=CombinedResponseReadAll[List[AlsoBoughtEntry], int],
+)
+async def read_track_also_bought(
+    id: int = Path(..., title="The ID of the track"),
+    k: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+):
+    """Returns the tracks most often bought on the same invoice as the track"""
+    await crud.read_item(session, id, Track)
+    items = await read_also_bought(session, Track, id, k)
+    return CombinedResponseReadAll(response=items, total_count=len(items))
+
+
+@router.get(
+    "/albums/{id}/also_bought",
+    response_model=CombinedResponseReadAll[List[AlsoBoughtEntry], int],
+)
+async def read_album_also_bought(
+    id: int = Path(..., title="The ID of the album"),
+    k: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+):
+    """Returns the albums most often bought on the same invoice as the album"""
+    await crud.read_item(session, id, Album)
+    items = await read_also_bought(session, Album, id, k)
+    return CombinedResponseReadAll(response=items, total_count=len(items))
+
+
+@router.get(
+    "/tracks/{id}/similar",
+    response_model=CombinedResponseReadAll[List[SimilarTrack], int],
+)
+async def read_track_similar(
+    id: int = Path(..., title="The ID of the track"),
+    k: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the tracks with the length, size, price, genre and media type
+    nearest to those of the track
+    """
+    await crud.read_item(session, id, Track)
+    items = await read_similar_tracks(session, id, k)
+    return CombinedResponseReadAll(response=items, total_count=len(items))
@@ -0,0 +1,122 @@
+"""
+This module contains the report routes, which are served from summary
+tables kept current by the write routes rather than aggregated per request
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.endpoints.pagination import MAX_PAGE_SIZE
+from app.models.combined import CombinedResponseRead, CombinedResponseReadAll
+from app.models.reports import (
+    CustomerRfmRead,
+    LeaderboardEntry,
+    RfmSegment,
+    SalesGroupBy,
+    SalesRollupCheck,
+    SalesRollupRead,
+    TopKind,
+    TopMetric,
+)
+from app.reports.customers import read_customer_rfm
+from app.reports.leaderboards import ALL_TIME, read_top
+from app.reports.sales import check_sales_rollups, read_sales_rollups
+
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"],
+)
+
+
+@router.get(
+    "/sales",
+    response_model=CombinedResponseReadAll[List[SalesRollupRead], int],
+)
+async def read_sales(
+    group_by: SalesGroupBy = Query(SalesGroupBy.GENRE),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the revenue, units sold and invoice line count by genre,
+    artist, billing country or invoice month
+    """
+    items, total_count = await read_sales_rollups(session, group_by, offset, limit)
+    return CombinedResponseReadAll(response=items, total_count=total_count)
+
+
+@router.get(
+    "/sales/check",
+    response_model=CombinedResponseRead[SalesRollupCheck],
+)
+async def check_sales(
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Compares the sales summary table with a full recompute from the
+    invoice lines
+    """
+    return CombinedResponseRead(response=await check_sales_rollups(session))
+
+
+@router.post(
+    "/sales/repair",
+    response_model=CombinedResponseRead[SalesRollupCheck],
+)
+async def repair_sales(
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Compares the sales summary table with a full recompute from the
+    invoice lines, and rebuilds it if they differ
+    """
+    return CombinedResponseRead(
+        response=await check_sales_rollups(session, repair=True)
+    )
+
+
+@router.get(
+    "/top/{kind}",
+    response_model=CombinedResponseReadAll[List[LeaderboardEntry], int],
+)
+async def read_top_sellers(
+    kind: TopKind,
+    period: str = Query(
+        ALL_TIME,
+        pattern=r"^(all|\d{4}(-\d{2})?)$",
+        description="all, a year (2013) or a month (2013-06)",
+    ),
+    by: TopMetric = Query(TopMetric.QUANTITY),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=1000),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the best-selling tracks, albums or artists of all time,
+    a year or a month, ranked by units sold or revenue
+    """
+    items, total_count = await read_top(session, kind, period, by, offset, limit)
+    return CombinedResponseReadAll(response=items, total_count=total_count)
+
+
+@router.get(
+    "/customers/rfm",
+    response_model=CombinedResponseReadAll[List[CustomerRfmRead], int],
+)
+async def read_customers_rfm(
+    segment: Optional[RfmSegment] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=1000),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the customers by descending lifetime value with their
+    recency, frequency and monetary metrics, quintile scores and segment
+    """
+    items, total_count = await read_customer_rfm(session, segment, offset, limit)
+    return CombinedResponseReadAll(response=items, total_count=total_count)
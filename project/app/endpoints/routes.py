@@ -1,9 +1,21 @@
-from typing import List, Tuple, TypeVar
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
 from types import ModuleType
 
-from fastapi import APIRouter, Depends, Path, status, HTTPException
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    FastAPI,
+    Path,
+    Query,
+    Request,
+    status,
+    HTTPException,
+)
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.database import get_db
 from app.endpoints import crud
@@ -20,6 +32,17 @@ from app.models.combined import (
     CombinedResponsePatch,
 )
 from app.endpoints import children
+from app.endpoints import bulk_import
+from app.models.imports import ImportResult
+from app.models.updates import BulkPatchResult
+from app.endpoints.streaming import (
+    ExportFormat,
+    EXPORT_ENCODERS,
+    EXPORT_MEDIA_TYPES,
+    get_table_columns,
+)
+from app.endpoints.pagination import oversized, stream_page
+from app.cache.reference import ReferenceTable, register_reference_table
 
 
 # Create some generic types to use in the code that follows
@@ -27,9 +50,23 @@ InputType = TypeVar("InputType")
 OutputType = TypeVar("OutputType")
 
 
+class CollectionFormat(str, Enum):
+    """
+    The formats a collection can be returned in. The columnar format is
+    {"columns": [...], "data": {"column": [values...]}}, which doesn't
+    repeat the key names on every row
+    """
+
+    JSON = "json"
+    COLUMNAR = "columnar"
+
+
 def build_routes(
     model: ModuleType,
     child_models: List[ModuleType],
+    reference: bool = False,
+    path_prefix: str = "",
+    app: Optional[FastAPI] = None,
 ) -> APIRouter:
     """
     This function builds all the CRUD routes for the passed
@@ -39,39 +76,66 @@ def build_routes(
 
     :params ModuleType: the module containing the model definitions
     :params List[ModuleType]: the list of modules containing child model definitions
+    :params bool: serve the model as an in-memory reference table
+    :params str: the path the routes are mounted under, e.g. /api/v1
+    :params FastAPI: the application the routes are added to with include_routes
     :returns APIRouter: a populated router FastAPI will handle
     """
     # takes advantage of the plural/singular naming conventions
-    prefix, _, _ = get_model_names(model)
+    prefix, _, class_name = get_model_names(model)
     tags = prefix.title().replace("_", " ")
 
     # create a router for the model
     router = APIRouter(
-        prefix=f"/{prefix}",
+        prefix=f"{path_prefix}/{prefix}",
+        # the routes look up the application's dependency overrides
+        dependency_overrides_provider=app,
         tags=[f"{tags}"],
         responses={404: {"description": "Not found"}},
-        dependencies=[Depends(get_db)],
     )
     # create the endpoint routes
+    reference_table = None
+    if reference:
+        reference_table = register_reference_table(
+            getattr(model, f"{class_name}"),
+            getattr(model, f"{class_name}Read"),
+        )
     params = {
         "router": router,
         "model": model,
+        "reference_table": reference_table,
     }
     create_item_route(**params)
+    import_items_route(**params)
     get_items_route(**params)
+    # the export route has to come before the /{id} route that would match it
+    export_items_route(router=router, model=model)
     get_item_route(**params)
     update_item_route(**params)
     patch_item_route(**params)
+    patch_items_route(**params)
 
     # add the child modules for the specialized children routes
-    params.update({"child_models": child_models})
-    children.get_routes(**params)
+    children.get_routes(router=router, model=model, child_models=child_models)
     return router
 
 
+def include_routes(app: FastAPI, router: APIRouter) -> None:
+    """
+    Add the routes of a router built with its full path and the
+    application to the application as they are. include_router builds every route again to
+    prefix its path, which doubles the cost of the routes at startup
+
+    :params FastAPI: the application to add the routes to
+    :params APIRouter: the router built by build_routes
+    """
+    app.router.routes.extend(router.routes)
+
+
 def create_item_route(
     router: APIRouter,
     model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
 ):
     """
     Create the generic create item route in the router parameter for
@@ -87,34 +151,88 @@ def create_item_route(
     )
     async def create_item(
         data: getattr(model, f"{class_name}Create"),
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ):
         """
         The generic create item (class_name) for the route
 
         :params data: the Create sqlmodel definition
-        :db AsyncSession: the asynchronous database session to use
+        :session AsyncSession: the request scoped database session to use
         """
-        async with db as session:
-            db_item = await crud.create_item(
-                session=session,
-                data=data,
-                model_class=getattr(model, f"{class_name}"),
-            )
-            if db_item is None:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"{class_name} creation failed",
-                )
-            return CombinedResponseCreate(
-                meta_data=MetaDataCreate(),
-                response=db_item,
+        db_item = await crud.create_item(
+            session=session,
+            data=data,
+            model_class=getattr(model, f"{class_name}"),
+        )
+        if db_item is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{class_name} creation failed",
             )
+        if reference_table is not None:
+            await reference_table.load(session)
+        return CombinedResponseCreate(
+            meta_data=MetaDataCreate(),
+            response=db_item,
+        )
+
+
+def import_items_route(
+    router: APIRouter,
+    model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
+):
+    """
+    Create the generic bulk import route, which inserts the rows of a
+    streamed NDJSON or CSV request body in batched transactions
+    """
+    prefix, prefix_singular, class_name = get_model_names(model)
+
+    @router.post(
+        "/import",
+        response_model=CombinedResponseRead[ImportResult],
+        openapi_extra={
+            "requestBody": {
+                "content": {
+                    media_type: {"schema": {"type": "string"}}
+                    for media_type in EXPORT_MEDIA_TYPES.values()
+                },
+                "required": True,
+            }
+        },
+    )
+    async def import_items(
+        request: Request,
+        format: ExportFormat = ExportFormat.NDJSON,
+        batch_size: int = Query(
+            bulk_import.DEFAULT_BATCH_SIZE, ge=1, le=bulk_import.MAX_BATCH_SIZE
+        ),
+        max_errors: int = Query(bulk_import.DEFAULT_MAX_ERRORS, ge=0, le=1000),
+        session: AsyncSession = Depends(get_db),
+    ):
+        """
+        Import rows from the request body, one object per line for
+        NDJSON, or a header row of field names followed by rows for CSV.
+        Every row is validated against the Create model, valid rows are
+        inserted batch_size at a time and invalid rows are reported
+        """
+        result = await bulk_import.import_items(
+            stream=request.stream(),
+            format=format,
+            model_class=getattr(model, f"{class_name}"),
+            create_class=getattr(model, f"{class_name}Create"),
+            batch_size=batch_size,
+            max_errors=max_errors,
+        )
+        if reference_table is not None and result.accepted:
+            await reference_table.load(session)
+        return CombinedResponseRead(response=result)
 
 
 def get_items_route(
     router: APIRouter,
     model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
 ):
     """
     Create the generic get item route
@@ -128,24 +246,97 @@ def get_items_route(
         ],
     )
     async def read_items(
-        offset: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)
+        request: Request,
+        offset: int = 0,
+        limit: int = 10,
+        format: CollectionFormat = CollectionFormat.JSON,
+        session: AsyncSession = Depends(get_db),
     ):
-        async with db as session:
-            items, total_count = await crud.read_items(
+        # a page above the maximum size is streamed, the columnar format can't be
+        streamed = oversized(limit, streamable=format == CollectionFormat.JSON)
+        # reference tables are served from memory without touching the database
+        if reference_table is not None and not streamed:
+            await reference_table.ensure_loaded(session)
+            items, total_count = reference_table.page(offset, limit)
+            if format == CollectionFormat.COLUMNAR:
+                columns = get_table_columns(reference_table.model_class)
+                names = [name for name, _ in columns]
+                rows = [tuple(getattr(item, name) for name in names) for item in items]
+                data = crud.build_columns(names, rows)
+                return columnar_response(names, data, total_count)
+            return CombinedResponseReadAll(
+                response=items,
+                total_count=total_count,
+            )
+
+        if streamed:
+            model_class = getattr(model, f"{class_name}")
+            return await stream_page(
+                request,
+                session,
+                select(model_class).offset(offset).limit(limit),
+                select(func.count()).select_from(model_class),
+                getattr(model, f"{class_name}Read"),
+            )
+
+        if format == CollectionFormat.COLUMNAR:
+            names, data, total_count = await crud.read_items_columnar(
                 session=session,
                 offset=offset,
                 limit=limit,
                 model_class=getattr(model, f"{class_name}"),
             )
-            return CombinedResponseReadAll(
-                response=items,
-                total_count=total_count,
-            )
+            return columnar_response(names, data, total_count)
+
+        items, total_count = await crud.read_items(
+            session=session,
+            offset=offset,
+            limit=limit,
+            model_class=getattr(model, f"{class_name}"),
+        )
+        return CombinedResponseReadAll(
+            response=items,
+            total_count=total_count,
+        )
+
+
+def export_items_route(
+    router: APIRouter,
+    model: ModuleType,
+):
+    """
+    Create the generic export route, which streams every row of
+    the table as newline delimited JSON or CSV
+    """
+    prefix, prefix_singular, class_name = get_model_names(model)
+
+    @router.get(
+        "/export",
+        response_class=StreamingResponse,
+        responses={
+            200: {
+                "content": {
+                    media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()
+                },
+                "description": f"Every {prefix_singular} in the requested format",
+            }
+        },
+    )
+    async def export_items(format: ExportFormat = ExportFormat.NDJSON):
+        encoder = EXPORT_ENCODERS[format]
+        return StreamingResponse(
+            encoder(getattr(model, f"{class_name}")),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{prefix}.{format.value}"'
+            },
+        )
 
 
 def get_item_route(
     router: APIRouter,
     model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
 ):
     """
     Create the generic get item route
@@ -158,27 +349,37 @@ def get_item_route(
     )
     async def read_item(
         id: int = Path(..., title=f"The ID of the {prefix} to get"),
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ):
-        async with db as session:
-            try:
-                db_item = await crud.read_item(
-                    session=session,
-                    id=id,
-                    model_class=getattr(model, f"{class_name}"),
-                )
-                item_read = getattr(model, f"{class_name}Read")
-                return CombinedResponseRead(response=item_read.model_validate(db_item))
-            except HTTPException as e:
+        # reference tables are served from memory without touching the database
+        if reference_table is not None:
+            await reference_table.ensure_loaded(session)
+            item = reference_table.get(id)
+            if item is None:
                 return JSONResponse(
-                    status_code=e.status_code,
-                    content={"detail": e.detail}
+                    status_code=404,
+                    content={"detail": f"{class_name} not found"},
                 )
+            return CombinedResponseRead(response=item)
+
+        try:
+            item = await crud.read_item(
+                session=session,
+                id=id,
+                model_class=getattr(model, f"{class_name}"),
+            )
+            return CombinedResponseRead(response=item)
+        except HTTPException as e:
+            return JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail}
+            )
 
 
 def update_item_route(
     router: APIRouter,
     model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
 ):
     prefix, prefix_singular, class_name = get_model_names(model)
 
@@ -189,31 +390,33 @@ def update_item_route(
     async def update_item(
         data: getattr(model, f"{class_name}Update"),
         id: int = Path(..., title=f"The ID of the {prefix} to update"),
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ):
-        async with db as session:
-            db_item = await crud.update_item(
-                session=session,
-                id=id,
-                data=data,
-                model_class=getattr(model, f"{class_name}"),
+        db_item = await crud.update_item(
+            session=session,
+            id=id,
+            data=data,
+            model_class=getattr(model, f"{class_name}"),
+        )
+        if db_item is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"{class_name} not found",
             )
-            if db_item is None:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"{class_name} not found",
-                )
+        if reference_table is not None:
+            await reference_table.load(session)
 
-            # construct the response in the expected format
-            return CombinedResponseUpdate(
-                meta_data=MetaDataUpdate(),
-                response=db_item,
-            )
+        # construct the response in the expected format
+        return CombinedResponseUpdate(
+            meta_data=MetaDataUpdate(),
+            response=db_item,
+        )
 
 
 def patch_item_route(
     router: APIRouter,
     model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
 ):
     prefix, prefix_singular, class_name = get_model_names(model)
 
@@ -224,26 +427,102 @@ def patch_item_route(
     async def patch_artist(
         data: getattr(model, f"{class_name}Patch"),
         id: int = Path(..., title=f"The ID of the {prefix} to patch"),
-        db: AsyncSession = Depends(get_db),
+        session: AsyncSession = Depends(get_db),
     ):
-        async with db as session:
-            db_item = await crud.patch_item(
-                session=session,
-                id=id,
-                data=data,
-                model_class=getattr(model, f"{class_name}"),
+        db_item = await crud.patch_item(
+            session=session,
+            id=id,
+            data=data,
+            model_class=getattr(model, f"{class_name}"),
+        )
+        if db_item is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"{class_name} not found",
             )
-            if db_item is None:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"{class_name} not found",
-                )
+        if reference_table is not None:
+            await reference_table.load(session)
 
-            # construct the response in the expected format
-            return CombinedResponsePatch(
-                meta_data=MetaDataPatch(),
-                response=db_item,
-            )
+        # construct the response in the expected format
+        return CombinedResponsePatch(
+            meta_data=MetaDataPatch(),
+            response=db_item,
+        )
+
+
+def patch_items_route(
+    router: APIRouter,
+    model: ModuleType,
+    reference_table: Optional[ReferenceTable] = None,
+):
+    """
+    Create the generic patch by filter route, which updates every row
+    matching the filters of the query string with one statement
+    """
+    prefix, prefix_singular, class_name = get_model_names(model)
+    # the query parameters of the route, every other one is a filter
+    options = {"dry_run", "max_rows"}
+
+    @router.patch(
+        "/",
+        response_model=CombinedResponsePatch[BulkPatchResult],
+    )
+    async def patch_items(
+        request: Request,
+        data: Dict[str, Any] = Body(
+            ..., description=f"Any of the fields of {class_name}Patch"
+        ),
+        dry_run: bool = False,
+        max_rows: int = Query(crud.DEFAULT_MAX_PATCH_ROWS, ge=1),
+        session: AsyncSession = Depends(get_db),
+    ):
+        """
+        Updates the rows matching every filter of the query string, e.g.
+        ?genre_id=1 (a filter repeated matches any of its values), with
+        the fields of the body in one UPDATE ... WHERE. At least one filter
+        is required. With dry_run the
+        matching rows are only counted, whatever max_rows is, otherwise more
+        than max_rows fail the update
+        """
+        filters = {}
+        for name, value in request.query_params.multi_items():
+            if name not in options:
+                filters.setdefault(name, []).append(value)
+        read_class = getattr(model, f"{class_name}Read")
+        filters = {
+            name: [
+                crud.validate_fields(read_class, {name: value}, "query")[name]
+                for value in allowed
+            ]
+            for name, allowed in filters.items()
+        }
+        values = crud.validate_fields(
+            getattr(model, f"{class_name}Patch"), data, "body"
+        )
+        result = await crud.patch_items(
+            session=session,
+            filters=filters,
+            values=values,
+            model_class=getattr(model, f"{class_name}"),
+            dry_run=dry_run,
+            max_rows=max_rows,
+        )
+        if reference_table is not None and result.updated:
+            await reference_table.load(session)
+        return CombinedResponsePatch(
+            meta_data=MetaDataPatch(),
+            response=result,
+        )
+
+
+def columnar_response(names: List[str], data: dict, total_count: int) -> JSONResponse:
+    """
+    Returns the columnar page as a JSON response, the metadata
+    middleware adds the same pagination block as the row format gets
+    """
+    return JSONResponse(
+        content={"columns": names, "data": data, "total_count": total_count}
+    )
 
 
 def get_model_names(model: ModuleType) -> Tuple[str, str, str]:
@@ -0,0 +1,46 @@
+"""
+This module contains the schema routes: the index advisor's view of the
+statements executed and the indexes it proposes, and the migrations
+applied to the database
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.combined import CombinedResponseRead, CombinedResponseReadAll
+from app.models.schema import IndexAdvice, MigrationRead
+from app.schema.index_advisor import advise
+from app.schema.migrations import read_migrations
+
+
+router = APIRouter(
+    prefix="/schema",
+    tags=["Schema"],
+)
+
+
+@router.get(
+    "/index_advice",
+    response_model=CombinedResponseRead[IndexAdvice],
+)
+async def read_index_advice(session: AsyncSession = Depends(get_db)):
+    """
+    Returns the shapes of the statements executed since startup, the
+    query plan of each and whether an index serves it, and the indexes
+    proposed for the shapes that scan their table. A proposal is applied
+    by adding its statement to the migrations
+    """
+    return CombinedResponseRead(response=await advise(session))
+
+
+@router.get(
+    "/migrations",
+    response_model=CombinedResponseReadAll[List[MigrationRead], int],
+)
+async def read_schema_migrations(session: AsyncSession = Depends(get_db)):
+    """Returns the migrations applied to the database"""
+    items = await read_migrations(session)
+    return CombinedResponseReadAll(response=items, total_count=len(items))
@@ -0,0 +1,71 @@
+"""
+This module contains the full text search and autocomplete routes
+across tracks, albums and artists
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.combined import CombinedResponseReadAll
+from app.models.search import AutocompleteResult, SearchResult, SearchType
+from app.search.autocomplete import complete
+from app.search.fulltext import search
+
+
+router = APIRouter(
+    tags=["Search"],
+)
+
+
+def parse_types(types: str) -> List[SearchType]:
+    """Returns the search types of a comma separated list, raising a 400 for unknown ones"""
+    try:
+        return [SearchType(name.strip()) for name in types.split(",") if name.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"types must be a comma separated list of "
+            f"{', '.join(kind.value for kind in SearchType)}",
+        )
+
+
+@router.get(
+    "/search",
+    response_model=CombinedResponseReadAll[List[SearchResult], int],
+)
+async def read_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: str = Query(",".join(kind.value for kind in SearchType)),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the tracks (by name or composer), albums (by title) and
+    artists (by name) matching every word of q, most relevant first
+    """
+    items, total_count = await search(session, q, parse_types(types), offset, limit)
+    return CombinedResponseReadAll(response=items, total_count=total_count)
+
+
+@router.get(
+    "/autocomplete",
+    response_model=CombinedResponseReadAll[List[AutocompleteResult], int],
+)
+async def read_autocomplete(
+    prefix: str = Query(..., min_length=1, max_length=120),
+    type: Optional[SearchType] = None,
+    limit: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the artist, album and track names (or only those of the
+    type) starting with the prefix, ignoring case and accents, in name
+    order. These are answered from memory without querying the database
+    """
+    kinds = [type] if type is not None else list(SearchType)
+    items = await complete(session, prefix, kinds, limit)
+    return CombinedResponseReadAll(response=items, total_count=len(items))
@@ -0,0 +1,35 @@
+"""
+This module contains the routes that expose the application's
+in-memory cache statistics
+"""
+
+from typing import Dict
+
+from fastapi import APIRouter
+
+from app.cache.entities import get_entity_cache_stats
+from app.compression import compressed_cache
+from app.reports.invoice_documents import invoice_documents
+
+
+router = APIRouter(
+    prefix="/cache",
+    tags=["Cache"],
+)
+
+
+@router.get("/stats")
+async def read_cache_stats() -> Dict:
+    """
+    Returns the hit ratio, eviction count and size of
+    the entity cache of every model that has been read,
+    and of the caches of compressed response bodies
+    and of invoice documents
+    """
+    return {
+        "response": {
+            "entities": get_entity_cache_stats(),
+            "compressed": compressed_cache.stats(),
+            "invoice_documents": invoice_documents.stats(),
+        }
+    }
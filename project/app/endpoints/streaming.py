@@ -0,0 +1,111 @@
+"""
+This module contains helpers to stream whole tables out of the
+database. Rows are read from a server side cursor in chunks and encoded
+as they arrive, so the memory used doesn't depend on the size of the table.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncGenerator, List, Tuple, Type
+
+from sqlalchemy import Column, inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+
+# number of rows fetched from the cursor and encoded at a time
+STREAM_CHUNK_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    """The formats a table can be exported in"""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def get_table_columns(model_class: Type) -> List[Tuple[str, Column]]:
+    """
+    Returns the attribute name and column of every column of the table
+    model class, in table order
+
+    :params model_class: the table model class
+    :returns: List of (attribute name, Column) tuples
+    """
+    mapper = sa_inspect(model_class)
+    return [
+        (mapper.get_property_by_column(column).key, column)
+        for column in model_class.__table__.columns
+    ]
+
+
+def json_default(value: Any) -> Any:
+    """Encode the column values json doesn't handle, the same way the Read models do"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def stream_table_rows(
+    model_class: Type,
+) -> AsyncGenerator[Tuple[List[str], List[Tuple]], None]:
+    """
+    Stream the rows of the table in chunks, each chunk is yielded with
+    the attribute names of the columns. The generator uses its own
+    session because it outlives the request scoped session of the
+    endpoint that returns it
+
+    :params model_class: the table model class to stream
+    :returns: AsyncGenerator of (names, rows) chunks
+    """
+    columns = get_table_columns(model_class)
+    names = [name for name, _ in columns]
+    query = (
+        select(*[column for _, column in columns])
+        .order_by(model_class.id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    async with AsyncSession(engine) as session:
+        result = await session.stream(query)
+        async for rows in result.partitions(STREAM_CHUNK_SIZE):
+            yield names, rows
+
+
+async def encode_ndjson(model_class: Type) -> AsyncGenerator[bytes, None]:
+    """Stream the table as newline delimited JSON, one object per row"""
+    dumps = json.JSONEncoder(default=json_default, separators=(",", ":")).encode
+    async for names, rows in stream_table_rows(model_class):
+        yield "".join(dumps(dict(zip(names, row))) + "\n" for row in rows).encode()
+
+
+async def encode_csv(model_class: Type) -> AsyncGenerator[bytes, None]:
+    """Stream the table as CSV with a header row of the attribute names"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in get_table_columns(model_class)])
+    async for _, rows in stream_table_rows(model_class):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # an empty table still gets its header row
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+EXPORT_ENCODERS = {
+    ExportFormat.NDJSON: encode_ndjson,
+    ExportFormat.CSV: encode_csv,
+}
@@ -0,0 +1,113 @@
+"""
+This module lets the structures derived from the tables (summary
+tables, leaderboards, indexes) follow the writes made to them. A writer
+describes what it changed with a WriteEvent and commits it with
+commit_write. Listeners registered for the model class run either
+before the commit, inside the writer's transaction, or after it. Every
+write also bumps the data version of its table, which lets the other
+worker processes notice it (app.cache.versions).
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import bump_data_version
+from app.endpoints.streaming import get_table_columns
+
+
+class Phase(str, Enum):
+    """When a listener runs relative to the commit of the write"""
+
+    BEFORE_COMMIT = "before_commit"
+    AFTER_COMMIT = "after_commit"
+
+
+@dataclass
+class WriteEvent:
+    """
+    The rows a write changed. rows holds the column values after the
+    write, and previous the values before it (None for inserted rows).
+    deleted holds the values of the rows the write deleted. A bulk
+    write changed rows set-based without reading them, so rows and
+    previous are empty and listeners should refresh the whole table,
+    unless columns (the attributes the write set) shows it didn't
+    change any of the columns they use. version is the data version of
+    the table once the write is committed
+    """
+
+    model_class: Type
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    previous: List[Optional[Dict[str, Any]]] = field(default_factory=list)
+    bulk: bool = False
+    deleted: List[Dict[str, Any]] = field(default_factory=list)
+    columns: Optional[Tuple[str, ...]] = None
+    version: Optional[int] = None
+
+    def touches(self, *names: str) -> bool:
+        """Returns whether the write may have changed any of the attributes"""
+        return self.columns is None or not set(names).isdisjoint(self.columns)
+
+    def changes(self) -> List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]:
+        """Returns (previous, row) pairs for every changed row"""
+        return list(zip(self.previous, self.rows))
+
+
+Listener = Callable[[AsyncSession, WriteEvent], Awaitable[None]]
+
+_listeners: Dict[Phase, List[Tuple[Tuple[Type, ...], Listener]]] = {
+    Phase.BEFORE_COMMIT: [],
+    Phase.AFTER_COMMIT: [],
+}
+
+
+def on_write(*model_classes: Type, phase: Phase = Phase.AFTER_COMMIT):
+    """
+    Decorator that registers the listener for writes to the model classes
+
+    :params model_classes: the table model classes to listen to
+    :params phase: run the listener before or after the commit
+    """
+
+    def register(listener: Listener) -> Listener:
+        _listeners[phase].append((model_classes, listener))
+        return listener
+
+    return register
+
+
+def row_values(db_item) -> Dict[str, Any]:
+    """Returns the column values of a table model instance keyed by attribute name"""
+    return {
+        name: getattr(db_item, name) for name, _ in get_table_columns(type(db_item))
+    }
+
+
+async def count_write(session: AsyncSession, event: WriteEvent) -> None:
+    """Bump the data version of the table of the event, in the write's transaction"""
+    event.version = await bump_data_version(session, event.model_class)
+
+
+async def publish(session: AsyncSession, event: WriteEvent, phase: Phase) -> None:
+    """Run the listeners of the phase registered for the model class of the event"""
+    for model_classes, listener in _listeners[phase]:
+        if event.model_class in model_classes:
+            await listener(session, event)
+
+
+async def commit_write(session: AsyncSession, *events: WriteEvent) -> None:
+    """
+    Commit the session's pending write, running the before commit
+    listeners inside its transaction and the after commit ones once it
+    has been committed. A write to several tables has an event per
+    table, published in the order given
+    """
+    await session.flush()
+    for event in events:
+        await count_write(session, event)
+        await publish(session, event, Phase.BEFORE_COMMIT)
+    await session.commit()
+    for event in events:
+        await publish(session, event, Phase.AFTER_COMMIT)
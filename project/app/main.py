@@ -17,11 +17,21 @@ from logging import getLogger
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.middleware import log_middleware, MetadataMiddleware
-from app.database import init_db
+from app.compression import CompressionMiddleware
+from app.openapi import OpenAPIMiddleware, precompute_openapi
+from app.database import engine, BodyTrackingMiddleware
+from app.prepare import prepare_database
+from app.cache.reference import load_reference_tables
+from app.reports.leaderboards import leaderboards
+from app.reports.customers import customer_rfm
+from app.reports.also_bought import also_bought
+from app.reports.similar import track_features
+from app.search.autocomplete import autocomplete
 
 # get the endpoint models to build the routes
 from app.models import artists
@@ -34,7 +44,15 @@ from app.models import invoices
 from app.models import invoice_items
 from app.models import customers
 from app.models import employees
-from app.endpoints.routes import build_routes
+from app.endpoints.routes import build_routes, include_routes
+from app.endpoints import stats
+from app.endpoints import reports
+from app.endpoints import search
+from app.endpoints import recommendations
+from app.endpoints import schema
+from app.endpoints import batch
+from app.endpoints import invoices as invoice_routes
+from app.endpoints import playlists as playlist_routes
 from app.logger_config import setup_logging
 
 
@@ -52,7 +70,23 @@ async def lifespan(app: FastAPI):
 
     """Event handler for the startup event"""
     logger.info("Starting up presentation app")
-    await init_db()
+
+    # the database is prepared once before the workers start (app.prepare),
+    # checking it again finds nothing to do unless that step was skipped
+    await prepare_database()
+
+    # preload the in-memory reference tables, and seed the leaderboards,
+    # autocomplete, RFM, co-occurrence recommendations and track features
+    async with AsyncSession(engine) as session:
+        await load_reference_tables(session)
+        await leaderboards.load(session)
+        await autocomplete.load(session)
+        await customer_rfm.load(session)
+        await also_bought.load(session)
+        await track_features.load(session)
+
+    # serialise and compress the OpenAPI document once, rather than per worker request
+    precompute_openapi(app)
 
     # yield to the application until it is shutdown
     yield
@@ -87,10 +121,25 @@ def app_factory():
     )
     fastapi_app.add_middleware(BaseHTTPMiddleware, dispatch=log_middleware)
     fastapi_app.add_middleware(MetadataMiddleware)
+    # compresses the bodies the metadata has been added to
+    fastapi_app.add_middleware(CompressionMiddleware)
+    # notes when the body has been read, the disconnect watch of get_db waits for it
+    fastapi_app.add_middleware(BodyTrackingMiddleware)
+    # outermost, the OpenAPI document is served before any other middleware runs
+    fastapi_app.add_middleware(OpenAPIMiddleware, openapi_url=fastapi_app.openapi_url)
 
     # add all the endpoint routes
     for route_config in get_routes_config():
-        fastapi_app.include_router(build_routes(**route_config), prefix="/api/v1")
+        router = build_routes(**route_config, path_prefix="/api/v1", app=fastapi_app)
+        include_routes(fastapi_app, router)
+    fastapi_app.include_router(stats.router, prefix="/api/v1")
+    fastapi_app.include_router(reports.router, prefix="/api/v1")
+    fastapi_app.include_router(search.router, prefix="/api/v1")
+    fastapi_app.include_router(recommendations.router, prefix="/api/v1")
+    fastapi_app.include_router(schema.router, prefix="/api/v1")
+    fastapi_app.include_router(batch.router, prefix="/api/v1")
+    fastapi_app.include_router(invoice_routes.router, prefix="/api/v1")
+    fastapi_app.include_router(playlist_routes.router, prefix="/api/v1")
 
     return fastapi_app
 
@@ -105,8 +154,8 @@ def get_routes_config() -> Dict:
         {"model": artists, "child_models": [albums]},
         {"model": albums, "child_models": [tracks]},
         {"model": tracks, "child_models": [invoice_items, playlists]},
-        {"model": genres, "child_models": [tracks]},
-        {"model": media_types, "child_models": [tracks]},
+        {"model": genres, "child_models": [tracks], "reference": True},
+        {"model": media_types, "child_models": [tracks], "reference": True},
         {"model": playlists, "child_models": [tracks]},
         {"model": invoices, "child_models": [invoice_items]},
         {"model": invoice_items, "child_models": []},
@@ -43,15 +43,15 @@ class MetadataMiddleware(BaseHTTPMiddleware):
     """
 
     async def dispatch(self, request: Request, call_next):
-        # Skip modification for OpenAPI schema requests
-        if request.url.path == "/openapi.json":
-            return await call_next(request)
-
         # Get the response from the route handler
         original_response = await call_next(request)
 
-        # return original response if not JSON
-        if original_response.headers.get("content-type") != "application/json":
+        # return original response if not JSON, or if it's streamed without
+        # a known length (e.g. table exports), those pass through unbuffered
+        if (
+            original_response.headers.get("content-type") != "application/json"
+            or "content-length" not in original_response.headers
+        ):
             return original_response
 
         # Extract the response body
@@ -111,10 +111,14 @@ def build_response_data(
 
     # Handle different HTTP methods
     if request.method == "POST":
-        data["meta_data"] = {
-            **base_meta,
-            "location": f"{request_url}{data['response']['id']}",
-        }
+        data["meta_data"] = base_meta
+        # only a created resource has a location
+        response = data.get("response")
+        if isinstance(response, Dict) and "id" in response:
+            data["meta_data"] = {
+                **base_meta,
+                "location": f"{request_url}{response['id']}",
+            }
         return data
     elif request.method in ("PUT", "PATCH"):
         data["meta_data"] = {
@@ -122,7 +126,12 @@ def build_response_data(
             "location": f"{request_url}",
         }
         return data
-    elif request.method == "GET" and "response" in data and isinstance(data["response"], List):
+    elif request.method == "DELETE":
+        data["meta_data"] = base_meta
+        return data
+    elif request.method == "GET" and (
+        ("response" in data and isinstance(data["response"], List)) or "columns" in data
+    ):
         try:
             query_string = request.scope.get("query_string", b"").decode()
             query_params = parse_qs(query_string)
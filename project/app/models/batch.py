@@ -0,0 +1,33 @@
+"""
+This module defines the classes of the batch endpoint: the sub-requests
+a batch is made of and the result of each
+"""
+
+from typing import Any, List, Literal
+
+from pydantic import BaseModel, Field
+
+# the number of sub-requests a batch can hold
+MAX_BATCH_SIZE = 50
+
+
+class BatchItem(BaseModel):
+    method: Literal["GET"] = Field(
+        default="GET", description="The method of the sub-request, only GET is run"
+    )
+    path: str = Field(
+        description="The path of the sub-request with its query string, "
+        "e.g. /api/v1/customers/1/invoices?limit=5",
+    )
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchItemResult(BaseModel):
+    path: str = Field(description="The path of the sub-request")
+    status_code: int = Field(description="The status code of the sub-request")
+    body: Any = Field(
+        description="The JSON body of the sub-request, with its meta_data"
+    )
@@ -0,0 +1,67 @@
+"""
+This module defines the documents assembled from several tables, e.g. an
+invoice with its customer and its lines, and the documents they are
+created from
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from sqlmodel import SQLModel
+
+from .customers import CustomerRead
+from .invoice_items import InvoiceItemRead
+from .invoices import (
+    BillingAddressField,
+    BillingCityField,
+    BillingCountryField,
+    BillingPostalCodeField,
+    BillingStateField,
+    InvoiceRead,
+)
+
+# the number of lines an invoice can be created with
+MAX_INVOICE_LINES = 1000
+
+
+class InvoiceDocumentLine(InvoiceItemRead):
+    track_name: Optional[str] = Field(default=None, description="The name of the track")
+    album_title: Optional[str] = Field(
+        default=None, description="The title of the track's album"
+    )
+    artist_name: Optional[str] = Field(
+        default=None, description="The name of the album's artist"
+    )
+
+
+class InvoiceDocument(BaseModel):
+    invoice: InvoiceRead
+    customer: Optional[CustomerRead] = Field(
+        default=None, description="The customer the invoice was billed to"
+    )
+    lines: List[InvoiceDocumentLine] = Field(
+        default_factory=list, description="The invoice lines in line id order"
+    )
+
+
+class InvoiceLineCreate(BaseModel):
+    track_id: int = Field(ge=0, description="Foreign key to the track")
+    unit_price: Decimal = Field(ge=0, description="The unit price of the item")
+    quantity: int = Field(ge=0, description="The quantity of items")
+
+
+class InvoiceWithItemsCreate(SQLModel):
+    """An invoice and its lines, the total is computed from the lines"""
+
+    invoice_date: datetime = Field(description="The date of the invoice")
+    billing_address: Optional[str] = BillingAddressField()
+    billing_city: Optional[str] = BillingCityField()
+    billing_state: Optional[str] = BillingStateField()
+    billing_country: Optional[str] = BillingCountryField()
+    billing_postal_code: Optional[str] = BillingPostalCodeField()
+    customer_id: int = Field(description="The customer identifier")
+    items: List[InvoiceLineCreate] = Field(
+        min_length=1, max_length=MAX_INVOICE_LINES, description="The invoice lines"
+    )
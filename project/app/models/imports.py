@@ -0,0 +1,22 @@
+"""
+This module defines the classes that report the outcome of a
+streamed bulk import
+"""
+
+from typing import List
+
+from pydantic import BaseModel
+from sqlmodel import Field
+
+
+class ImportRowError(BaseModel):
+    line: int = Field(description="Line of the upload the rejected row started on")
+    detail: str = Field(description="Why the row was rejected")
+
+
+class ImportResult(BaseModel):
+    accepted: int = Field(default=0, ge=0, description="Number of rows inserted")
+    rejected: int = Field(default=0, ge=0, description="Number of rows rejected")
+    errors: List[ImportRowError] = Field(
+        default_factory=list, description="The first errors found"
+    )
@@ -3,7 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 from functools import partial
 
-from sqlalchemy import Column, Integer, DateTime, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Numeric, ForeignKey, Index
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import ConfigDict
 
@@ -78,6 +78,8 @@ class Invoice(InvoiceBase, table=True):
     # Add this relationship to link to InvoiceItems
     invoice_items: List["InvoiceItem"] = Relationship(back_populates="invoice")
 
+    __table_args__ = (Index("IFK_InvoiceCustomerId", "CustomerId"),)
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -8,6 +8,9 @@ from pydantic import ConfigDict
 from .playlist_track import PlaylistTrack
 from .fields import ValidationConstant, create_string_field
 
+# the number of tracks a playlist change can hold
+MAX_PLAYLIST_CHANGE = 10_000
+
 NameField = partial(
     create_string_field,
     "Playlist name",
@@ -51,4 +54,21 @@ class PlaylistPatch(PlaylistBase):
     name: Optional[str] = NameField()
 
 
+class PlaylistTracksChange(SQLModel):
+    track_ids: List[int] = Field(
+        min_length=1,
+        max_length=MAX_PLAYLIST_CHANGE,
+        description="The ids of the tracks to add to or remove from the playlist",
+    )
+
+
+class PlaylistTracksChanged(SQLModel):
+    playlist_id: int = Field(description="The unique identifier for the playlist")
+    requested: int = Field(description="The number of distinct track ids given")
+    changed: int = Field(
+        description="The number of tracks added or removed, tracks already in "
+        "(or not in) the playlist are left as they are"
+    )
+
+
 from .tracks import Track  # noqa: E402
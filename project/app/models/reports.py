@@ -0,0 +1,143 @@
+"""
+This module defines the summary tables behind the report endpoints and
+the classes those endpoints return
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Column, Integer, String
+from sqlmodel import SQLModel, Field
+
+
+class SalesGroupBy(str, Enum):
+    """The dimensions the sales are rolled up by"""
+
+    GENRE = "genre"
+    ARTIST = "artist"
+    COUNTRY = "country"
+    MONTH = "month"
+
+
+class TopKind(str, Enum):
+    """What the leaderboards rank"""
+
+    TRACKS = "tracks"
+    ALBUMS = "albums"
+    ARTISTS = "artists"
+
+
+class TopMetric(str, Enum):
+    """What the leaderboards are ranked by"""
+
+    QUANTITY = "quantity"
+    REVENUE = "revenue"
+
+
+class RfmSegment(str, Enum):
+    """The customer segments of the recency, frequency and monetary scores"""
+
+    CHAMPIONS = "champions"
+    LOYAL = "loyal"
+    AT_RISK = "at_risk"
+    HIBERNATING = "hibernating"
+    RECENT = "recent"
+    REGULAR = "regular"
+
+
+class SalesRollup(SQLModel, table=True):
+    """
+    The sales of one key of one dimension, e.g. the genre with id 1.
+    Revenue is kept in whole cents so incremental updates never drift
+    """
+
+    __tablename__ = "sales_rollups"
+
+    dimension: str = Field(
+        sa_column=Column("Dimension", String(16), primary_key=True),
+        description="The dimension the sales are rolled up by",
+    )
+    key: str = Field(
+        sa_column=Column("Key", String(120), primary_key=True),
+        description="The id or value of the dimension",
+    )
+    revenue_cents: int = Field(
+        sa_column=Column("RevenueCents", Integer, nullable=False),
+        description="The sum of unit price times quantity, in cents",
+    )
+    quantity: int = Field(
+        sa_column=Column("Quantity", Integer, nullable=False),
+        description="The number of units sold",
+    )
+    line_count: int = Field(
+        sa_column=Column("LineCount", Integer, nullable=False),
+        description="The number of invoice lines",
+    )
+
+
+class SalesRollupRead(BaseModel):
+    key: str = Field(description="The id or value of the dimension")
+    name: Optional[str] = Field(default=None, description="The name of the key")
+    revenue: Decimal = Field(description="The revenue of the key")
+    quantity: int = Field(description="The number of units sold")
+    line_count: int = Field(description="The number of invoice lines")
+
+
+class SalesRollupMismatch(BaseModel):
+    group_by: SalesGroupBy
+    key: str
+    expected: Optional[List[int]] = Field(
+        description="Revenue cents, quantity and line count of a full recompute"
+    )
+    actual: Optional[List[int]] = Field(
+        description="Revenue cents, quantity and line count of the summary table"
+    )
+
+
+class SalesRollupCheck(BaseModel):
+    consistent: bool = Field(description="The summary table matches a full recompute")
+    checked: int = Field(description="Number of keys compared")
+    mismatches: List[SalesRollupMismatch] = Field(default_factory=list)
+    repaired: bool = Field(default=False, description="The summary table was rebuilt")
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int = Field(description="The position in the leaderboard, from 1")
+    id: int = Field(description="The id of the track, album or artist")
+    name: Optional[str] = Field(default=None, description="The name or title")
+    quantity: int = Field(description="The number of units sold")
+    revenue: Decimal = Field(description="The revenue")
+
+
+class CustomerRfmRead(BaseModel):
+    customer_id: int = Field(description="The customer identifier")
+    name: Optional[str] = Field(default=None, description="The customer's name")
+    recency_days: int = Field(
+        description="Days between the last invoice and the latest invoice of any customer"
+    )
+    frequency: int = Field(description="The number of invoices")
+    monetary: Decimal = Field(description="The lifetime total of the invoices")
+    average_order: Decimal = Field(description="The average invoice total")
+    first_invoice: datetime = Field(description="The date of the first invoice")
+    last_invoice: datetime = Field(description="The date of the last invoice")
+    recency_score: int = Field(ge=1, le=5, description="5 for the most recent")
+    frequency_score: int = Field(ge=1, le=5, description="5 for the most frequent")
+    monetary_score: int = Field(ge=1, le=5, description="5 for the highest value")
+    segment: RfmSegment
+
+
+class AlsoBoughtEntry(BaseModel):
+    id: int = Field(description="The id of the track or album")
+    name: Optional[str] = Field(default=None, description="The name or title")
+    count: int = Field(description="The number of invoices both were bought on")
+
+
+class SimilarTrack(BaseModel):
+    id: int = Field(description="The id of the track")
+    name: Optional[str] = Field(default=None, description="The name of the track")
+    distance: float = Field(
+        description="The distance between the normalised features of the tracks"
+    )
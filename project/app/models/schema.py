@@ -0,0 +1,60 @@
+"""
+This module defines the classes returned by the schema endpoints: the
+observed query shapes, the indexes proposed for them and the applied
+migrations, and the table of the data versions of the other tables
+"""
+
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+from sqlalchemy import Column, Integer, String
+from sqlmodel import SQLModel, Field
+
+
+class DataVersion(SQLModel, table=True):
+    """
+    The number of writes committed to one table, by any worker process
+    """
+
+    __tablename__ = "data_versions"
+
+    name: str = Field(
+        sa_column=Column("Name", String(64), primary_key=True),
+        description="The name of the table",
+    )
+    version: int = Field(
+        sa_column=Column("Version", Integer, nullable=False),
+        description="The number of writes committed to the table",
+    )
+
+
+class QueryShapeRead(BaseModel):
+    table: str = Field(description="The table the columns belong to")
+    equality: List[str] = Field(description="The columns compared with = or IN")
+    ranges: List[str] = Field(description="The columns compared with <, <=, > or >=")
+    order_by: List[str] = Field(description="The columns the rows are ordered by")
+    count: int = Field(description="The number of statements executed with the shape")
+    total_ms: float = Field(description="The time spent executing them")
+    plan: List[str] = Field(description="The SQLite query plan of a sample statement")
+    indexed: bool = Field(description="Whether an index serves the shape")
+
+
+class IndexProposal(BaseModel):
+    table: str = Field(description="The table to index")
+    name: str = Field(description="The name of the proposed index")
+    columns: List[str] = Field(description="The indexed columns, in order")
+    statement: str = Field(description="The statement creating the index")
+    count: int = Field(description="The number of statements the index would serve")
+    total_ms: float = Field(description="The time spent executing them")
+
+
+class IndexAdvice(BaseModel):
+    shapes: List[QueryShapeRead]
+    proposals: List[IndexProposal]
+
+
+class MigrationRead(BaseModel):
+    version: int
+    name: str
+    applied_at: datetime
@@ -0,0 +1,31 @@
+"""
+This module defines the classes returned by the full text search
+"""
+
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlmodel import Field
+
+
+class SearchType(str, Enum):
+    """The kinds of rows that are searched"""
+
+    TRACK = "track"
+    ALBUM = "album"
+    ARTIST = "artist"
+
+
+class SearchResult(BaseModel):
+    type: SearchType = Field(description="The kind of row that matched")
+    id: int = Field(description="The id of the track, album or artist")
+    name: str = Field(description="The track or artist name, or the album title")
+    composer: Optional[str] = Field(default=None, description="The track composer")
+    score: float = Field(description="The bm25 relevance, lower is more relevant")
+
+
+class AutocompleteResult(BaseModel):
+    type: SearchType = Field(description="The kind of row the name belongs to")
+    id: int = Field(description="The id of the track, album or artist")
+    name: str = Field(description="The track or artist name, or the album title")
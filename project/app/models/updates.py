@@ -0,0 +1,13 @@
+"""
+This module defines the class that reports the outcome of a set-based
+update of the rows matching a filter
+"""
+
+from pydantic import BaseModel
+from sqlmodel import Field
+
+
+class BulkPatchResult(BaseModel):
+    matched: int = Field(ge=0, description="Number of rows the filter matches")
+    updated: int = Field(ge=0, description="Number of rows updated")
+    dry_run: bool = Field(description="The rows were counted and left unchanged")
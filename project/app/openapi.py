@@ -0,0 +1,108 @@
+"""
+This module serves the OpenAPI document precomputed. The document is
+generated once, at startup or on the first request, and kept as bytes
+with a compressed variant for every available encoding and an ETag. A
+pure ASGI middleware in front of the application answers requests for
+it from those bytes, or with a 304 when the client has them already,
+so a request costs a header lookup rather than building and
+serialising the schema.
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.compression import ENCODERS, negotiate
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class OpenAPIDocument:
+    """The serialised OpenAPI document, its encoded variants and their headers"""
+
+    __slots__ = ("etag", "bodies", "headers", "not_modified_headers")
+
+    def __init__(self, schema: Dict):
+        # serialised the way FastAPI's JSONResponse does
+        body = json.dumps(
+            schema, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies: Dict[Optional[str], bytes] = {None: body}
+        for encoding, encode in ENCODERS.items():
+            self.bodies[encoding] = encode(body)
+        self.headers: Dict[Optional[str], Headers] = {}
+        self.not_modified_headers: Dict[Optional[str], Headers] = {}
+        for encoding, encoded in self.bodies.items():
+            headers = [
+                (b"content-type", b"application/json"),
+                (b"etag", self.variant_etag(encoding).encode()),
+                (b"cache-control", b"no-cache"),
+                (b"vary", b"accept-encoding"),
+            ]
+            if encoding is not None:
+                headers.append((b"content-encoding", encoding.encode()))
+            self.not_modified_headers[encoding] = headers
+            self.headers[encoding] = headers + [
+                (b"content-length", str(len(encoded)).encode())
+            ]
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        """Returns the ETag of the variant, each encoding has its own"""
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """Returns whether an If-None-Match header names any variant"""
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            # weak comparison, as If-None-Match uses
+            tag = tag.removeprefix("W/").strip('"')
+            if tag.split("-")[0] == self.etag:
+                return True
+        return False
+
+
+def precompute_openapi(app: FastAPI) -> OpenAPIDocument:
+    """Generate the OpenAPI document of the application, if it hasn't been"""
+    document = getattr(app.state, "openapi_document", None)
+    if document is None:
+        document = app.state.openapi_document = OpenAPIDocument(app.openapi())
+    return document
+
+
+class OpenAPIMiddleware:
+    """Answers GET and HEAD requests for the OpenAPI document from the precomputed bytes"""
+
+    def __init__(self, app: ASGIApp, openapi_url: str = "/openapi.json"):
+        self.app = app
+        self.openapi_url = openapi_url
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] != self.openapi_url
+            or scope["method"] not in ("GET", "HEAD")
+        ):
+            await self.app(scope, receive, send)
+            return
+        document = precompute_openapi(scope["app"])
+        request_headers = dict(scope["headers"])
+        encoding = negotiate(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"),
+            ENCODERS,
+        )
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match and document.matches(if_none_match.decode("latin-1")):
+            status, headers, body = 304, document.not_modified_headers[encoding], b""
+        else:
+            status, headers = 200, document.headers[encoding]
+            body = document.bodies[encoding] if scope["method"] == "GET" else b""
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
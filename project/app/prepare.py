@@ -0,0 +1,59 @@
+"""
+This module prepares the database before the application starts: it
+creates the tables if the models have changed, applies the schema
+migrations, and builds the sales summary table and the search index.
+It runs once, before the worker processes are started:
+
+    python -m app.prepare && uvicorn app.main:app --workers 4
+
+Every worker's lifespan repeats the same steps as a schema check. On a
+prepared database they find nothing to do, and a single worker started
+without this step still creates and migrates the schema.
+"""
+
+import asyncio
+from logging import getLogger
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine, init_db
+from app.schema.migrations import migrate
+from app.reports.sales import ensure_sales_rollups
+from app.search.fulltext import ensure_search_index
+from app.logger_config import setup_logging
+
+# register every table model so the tables can be created
+from app.models import artists  # noqa: F401
+from app.models import albums  # noqa: F401
+from app.models import tracks  # noqa: F401
+from app.models import genres  # noqa: F401
+from app.models import playlists  # noqa: F401
+from app.models import media_types  # noqa: F401
+from app.models import invoices  # noqa: F401
+from app.models import invoice_items  # noqa: F401
+from app.models import customers  # noqa: F401
+from app.models import employees  # noqa: F401
+
+
+logger = getLogger()
+
+
+async def prepare_database() -> None:
+    """Create the tables, apply the migrations and build the derived tables"""
+    await init_db()
+    async with AsyncSession(engine) as session:
+        for version in await migrate(session):
+            logger.info(f"Applied schema migration {version}")
+        await ensure_sales_rollups(session)
+        await ensure_search_index(session)
+        await session.commit()
+
+
+async def main() -> None:
+    await prepare_database()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(main())
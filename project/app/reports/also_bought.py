@@ -0,0 +1,279 @@
+"""
+This module contains the "customers who bought this also bought"
+recommendations. The invoices are treated as baskets of tracks (and of
+the albums of those tracks), and the number of invoices every pair of
+items appears in together is held in a compressed sparse row (CSR)
+structure. Each row lists an item's neighbours by descending count, so
+the top K of an item are the first K entries of its row.
+
+The matrices are built with vectorised array operations. Invoice line
+writes are applied as per pair deltas in a small overlay on top of the
+matrices, which are rebuilt from the in-memory baskets once the overlay
+grows past a threshold. A read that finds another worker process wrote
+invoice lines or tracks, from their data versions, builds them again.
+"""
+
+import asyncio
+from collections import defaultdict
+from itertools import chain, combinations
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import TableVersions
+from app.events import WriteEvent, on_write
+from app.models.albums import Album
+from app.models.invoice_items import InvoiceItem
+from app.models.reports import AlsoBoughtEntry
+from app.models.tracks import Track
+from app.reports.sales import lookup
+
+# number of changed pairs in the overlay that triggers a rebuild
+REBUILD_THRESHOLD = 10_000
+# writes touching more invoices than this rebuild rather than apply deltas
+MAX_INCREMENTAL_INVOICES = 500
+
+BASKETS_QUERY = text(
+    """
+    SELECT DISTINCT ii.InvoiceId, ii.TrackId, COALESCE(t.AlbumId, -1)
+    FROM invoice_items ii
+    LEFT JOIN tracks t ON t.TrackId = ii.TrackId
+    """
+)
+
+
+def basket_pairs(baskets: np.ndarray, items: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Returns the (item, other item) pairs of every basket, both ways
+    round, with the items of a basket counted once
+    """
+    if len(items) == 0:
+        return items[:0], items[:0]
+    stride = int(items.max()) + 1
+    keys = np.unique(baskets.astype(np.int64) * stride + items)
+    baskets, items = keys // stride, keys % stride
+    _, starts, sizes = np.unique(baskets, return_index=True, return_counts=True)
+    # every entry is paired with each entry of its basket, itself included
+    row_sizes = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(len(items)), row_sizes)
+    block_starts = np.repeat(np.cumsum(row_sizes) - row_sizes, row_sizes)
+    right = np.repeat(np.repeat(starts, sizes), row_sizes) + (
+        np.arange(len(left)) - block_starts
+    )
+    distinct = left != right
+    return items[left[distinct]], items[right[distinct]]
+
+
+class CoOccurrence:
+    """
+    The co-occurrence counts of one kind of item in CSR form: the
+    neighbours of item i are indices[indptr[i]:indptr[i + 1]] with the
+    counts at the same positions, in descending count then id order
+    """
+
+    def __init__(self, baskets: np.ndarray, items: np.ndarray):
+        left, right = basket_pairs(baskets, items)
+        size = int(items.max()) + 2 if len(items) else 1
+        keys, counts = np.unique(left * size + right, return_counts=True)
+        rows, columns = keys // size, keys % size
+        order = np.lexsort((columns, -counts, rows))
+        self.indices = columns[order].astype(np.int32)
+        self.counts = counts[order].astype(np.int32)
+        self.indptr = np.searchsorted(rows[order], np.arange(size + 1)).astype(np.int64)
+        self.overlay: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self.overlay_size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.indices.nbytes + self.counts.nbytes + self.indptr.nbytes
+
+    def add(self, items: Iterable[int], sign: int) -> None:
+        """Add (or with a sign of -1 remove) one basket of the items"""
+        for item, other in combinations(sorted(set(items)), 2):
+            for row, column in ((item, other), (other, item)):
+                deltas = self.overlay[row]
+                if column not in deltas:
+                    self.overlay_size += 1
+                deltas[column] = deltas.get(column, 0) + sign
+
+    def top(self, item: int, k: int) -> List[Tuple[int, int]]:
+        """Returns the k (item, count) most often bought with the item"""
+        if 0 <= item < len(self.indptr) - 1:
+            start, end = self.indptr[item], self.indptr[item + 1]
+        else:
+            start = end = 0
+        deltas = self.overlay.get(item)
+        if not deltas:
+            end = min(end, start + k)
+            return list(
+                zip(self.indices[start:end].tolist(), self.counts[start:end].tolist())
+            )
+        counts = dict(
+            zip(self.indices[start:end].tolist(), self.counts[start:end].tolist())
+        )
+        for column, delta in deltas.items():
+            counts[column] = counts.get(column, 0) + delta
+        ranked = sorted(
+            ((column, count) for column, count in counts.items() if count > 0),
+            key=lambda entry: (-entry[1], entry[0]),
+        )
+        return ranked[:k]
+
+
+class AlsoBought:
+    """The track and album co-occurrences and the baskets they were built from"""
+
+    def __init__(self):
+        self.loaded = False
+        self.tracks: CoOccurrence = None
+        self.albums: CoOccurrence = None
+        self._baskets: Dict[int, Set[Tuple[int, int]]] = {}
+        self.versions = TableVersions(InvoiceItem, Track)
+        self._lock = asyncio.Lock()
+
+    def build(self, columns: np.ndarray) -> None:
+        """(Re)build both matrices from (invoice, track, album) rows"""
+        invoices, tracks, albums = columns[:, 0], columns[:, 1], columns[:, 2]
+        self.tracks = CoOccurrence(invoices, tracks)
+        known = albums >= 0
+        self.albums = CoOccurrence(invoices[known], albums[known])
+
+    def rebuild(self) -> None:
+        """Rebuild both matrices from the baskets, folding the overlays in"""
+        entries = [
+            (invoice_id, track_id, album_id)
+            for invoice_id, basket in self._baskets.items()
+            for track_id, album_id in basket
+        ]
+        self.build(np.array(entries, dtype=np.int64).reshape(-1, 3))
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)load the baskets of every invoice and build the matrices"""
+        async with self._lock:
+            versions = await self.versions.read(session)
+            rows = (await session.execute(BASKETS_QUERY)).all()
+            baskets = defaultdict(set)
+            for invoice_id, track_id, album_id in rows:
+                baskets[invoice_id].add((track_id, album_id))
+            self._baskets = dict(baskets)
+            columns = np.fromiter(
+                chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)
+            )
+            self.build(columns.reshape(-1, 3))
+            await self.versions.record(session, versions)
+            self.loaded = True
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Build the matrices if the application didn't at startup, or again
+        if another worker process wrote to the tables they're built from
+        """
+        if not self.loaded or await self.versions.stale(session):
+            await self.load(session)
+
+    def follow(self, event: WriteEvent) -> bool:
+        """
+        Returns whether the matrices have every earlier write to the
+        table of the event, they're forgotten if they don't
+        """
+        if self.versions.follow(event.model_class, event.version):
+            return True
+        self.clear()
+        return False
+
+    async def apply(self, session: AsyncSession, event: WriteEvent) -> None:
+        """Replace the baskets of the invoices whose lines changed"""
+        async with self._lock:
+            if not self.loaded or not self.follow(event):
+                return
+            invoice_ids = {row["invoice_id"] for row in event.rows} | {
+                previous["invoice_id"] for previous, _ in event.changes() if previous
+            }
+            if len(invoice_ids) > MAX_INCREMENTAL_INVOICES:
+                # e.g. a bulk import, cheaper to rebuild on the next read
+                self.clear()
+                return
+            result = await session.execute(
+                select(InvoiceItem.invoice_id, InvoiceItem.track_id, Track.album_id)
+                .outerjoin(Track, Track.id == InvoiceItem.track_id)
+                .where(InvoiceItem.invoice_id.in_(invoice_ids))
+            )
+            baskets = {invoice_id: set() for invoice_id in invoice_ids}
+            for invoice_id, track_id, album_id in result.all():
+                baskets[invoice_id].add(
+                    (track_id, album_id if album_id is not None else -1)
+                )
+            for invoice_id, basket in baskets.items():
+                old = self._baskets.get(invoice_id, set())
+                if basket == old:
+                    continue
+                for matrix, index in ((self.tracks, 0), (self.albums, 1)):
+                    matrix.add((entry[index] for entry in old if entry[index] >= 0), -1)
+                    matrix.add(
+                        (entry[index] for entry in basket if entry[index] >= 0), 1
+                    )
+                if basket:
+                    self._baskets[invoice_id] = basket
+                else:
+                    self._baskets.pop(invoice_id, None)
+            if self.tracks.overlay_size + self.albums.overlay_size > REBUILD_THRESHOLD:
+                self.rebuild()
+
+    def clear(self) -> None:
+        """Forget the matrices, the next read builds them again"""
+        self.loaded = False
+        self.tracks = self.albums = None
+        self._baskets = {}
+        self.versions.clear()
+
+
+also_bought = AlsoBought()
+
+
+async def read_also_bought(
+    session: AsyncSession, model_class, id: int, k: int = 10
+) -> List[AlsoBoughtEntry]:
+    """
+    Returns the k tracks or albums most often on the same invoice as the
+    track or album with the id
+    """
+    await also_bought.ensure_loaded(session)
+    if model_class is Track:
+        top = also_bought.tracks.top(id, k)
+        name_column = Track.name
+    else:
+        top = also_bought.albums.top(id, k)
+        name_column = Album.title
+    names = await lookup(
+        session,
+        lambda ids: select(model_class.id, name_column).where(model_class.id.in_(ids)),
+        (other for other, _ in top),
+    )
+    return [
+        AlsoBoughtEntry(id=other, name=names.get(other, (None,))[0], count=count)
+        for other, count in top
+    ]
+
+
+@on_write(InvoiceItem)
+async def update_also_bought(session: AsyncSession, event: WriteEvent) -> None:
+    """Apply the changed invoice baskets to the co-occurrences"""
+    if event.bulk:
+        if also_bought.follow(event) and event.touches("invoice_id", "track_id"):
+            also_bought.clear()
+        return
+    await also_bought.apply(session, event)
+
+
+@on_write(Track)
+async def regroup_also_bought(session: AsyncSession, event: WriteEvent) -> None:
+    """A track moved to another album changes the album baskets, rare enough to rebuild for"""
+    if not also_bought.follow(event) or not event.touches("album_id"):
+        return
+    if event.bulk or any(
+        previous is not None and previous["album_id"] != row["album_id"]
+        for previous, row in event.changes()
+    ):
+        also_bought.clear()
@@ -0,0 +1,317 @@
+"""
+This module computes the recency, frequency and monetary value (RFM) of
+every customer, and the segments they fall in. The invoice columns are
+loaded into NumPy arrays once and reduced to per customer totals with
+vectorised operations. Invoice writes then adjust the totals of the
+customers they touch, and the scores and segments, which depend on every
+customer, are recomputed vectorised on the next read after a change.
+A read that finds another worker process wrote invoices, from their
+data version, loads the columns again.
+"""
+
+import asyncio
+import calendar
+from itertools import chain
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import TableVersions
+from app.events import WriteEvent, on_write
+from app.models.customers import Customer
+from app.models.invoices import Invoice
+from app.models.reports import CustomerRfmRead, RfmSegment
+from app.reports.sales import lookup
+
+SECONDS_PER_DAY = 86400
+
+# the score boundaries, quintiles give scores 1 to 5
+SCORE_QUANTILES = [0.2, 0.4, 0.6, 0.8]
+
+LOAD_QUERY = text(
+    """
+    SELECT CustomerId,
+        CAST(strftime('%s', InvoiceDate) AS INTEGER),
+        CAST(ROUND(Total * 100) AS INTEGER)
+    FROM invoices
+    WHERE CustomerId IS NOT NULL
+    """
+)
+
+
+def epoch_seconds(invoice_date: Optional[datetime]) -> int:
+    """Returns the invoice date as seconds since the epoch, like strftime('%s')"""
+    return calendar.timegm(invoice_date.timetuple()) if invoice_date else 0
+
+
+def total_cents(total) -> int:
+    return int(round(Decimal(str(total or 0)) * 100))
+
+
+def scores(values: np.ndarray) -> np.ndarray:
+    """Returns the quintile score (1 to 5) of every value, equal values score the same"""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int8)
+    edges = np.quantile(values, SCORE_QUANTILES)
+    return (np.searchsorted(edges, values, side="right") + 1).astype(np.int8)
+
+
+def segments(recency: np.ndarray, frequency: np.ndarray, monetary: np.ndarray):
+    """Returns the segment of every customer from their scores"""
+    return np.select(
+        [
+            (recency >= 4) & (frequency >= 4) & (monetary >= 4),
+            (recency >= 3) & (frequency >= 4),
+            (recency <= 2) & (frequency >= 3),
+            recency <= 2,
+            recency >= 4,
+        ],
+        [
+            RfmSegment.CHAMPIONS.value,
+            RfmSegment.LOYAL.value,
+            RfmSegment.AT_RISK.value,
+            RfmSegment.HIBERNATING.value,
+            RfmSegment.RECENT.value,
+        ],
+        default=RfmSegment.REGULAR.value,
+    )
+
+
+def aggregate(
+    customer_ids: np.ndarray, dates: np.ndarray, cents: np.ndarray
+) -> Tuple[np.ndarray, ...]:
+    """
+    Returns the sorted customer ids and, for each, the number of
+    invoices, the total in cents and the first and last invoice dates
+    """
+    ids, inverse = np.unique(customer_ids, return_inverse=True)
+    count = np.bincount(inverse, minlength=len(ids)).astype(np.int64)
+    total = np.bincount(inverse, weights=cents, minlength=len(ids))
+    # order by customer then date, each customer's first and last are at the ends of its run
+    order = np.lexsort((dates, inverse))
+    ends = np.cumsum(count) - 1
+    ordered = dates[order]
+    first = ordered[ends - count + 1] if len(ids) else ordered[:0]
+    last = ordered[ends] if len(ids) else ordered[:0]
+    return ids, count, np.rint(total).astype(np.int64), first, last
+
+
+class CustomerRfm:
+    """
+    The per customer invoice totals as parallel arrays sorted by
+    customer id, and the scores and segments computed from them
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.cents = np.zeros(0, dtype=np.int64)
+        self.first = np.zeros(0, dtype=np.int64)
+        self.last = np.zeros(0, dtype=np.int64)
+        self._scored: Optional[Tuple[np.ndarray, ...]] = None
+        self.versions = TableVersions(Invoice)
+        self._lock = asyncio.Lock()
+
+    def set_invoices(
+        self, customer_ids: np.ndarray, dates: np.ndarray, cents: np.ndarray
+    ) -> None:
+        """Replace the totals with those of the invoice columns"""
+        self.ids, self.count, self.cents, self.first, self.last = aggregate(
+            customer_ids, dates, cents
+        )
+        self._scored = None
+        self.loaded = True
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)load the invoice columns and aggregate them"""
+        async with self._lock:
+            versions = await self.versions.read(session)
+            result = await session.execute(LOAD_QUERY)
+            rows = result.all()
+            # fromiter over the flattened rows avoids a Python object per value
+            columns = np.fromiter(
+                chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)
+            ).reshape(-1, 3)
+            self.set_invoices(columns[:, 0], columns[:, 1], columns[:, 2])
+            await self.versions.record(session, versions)
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Load the invoices if the application didn't at startup, or again
+        if another worker process wrote to them
+        """
+        if not self.loaded or await self.versions.stale(session):
+            await self.load(session)
+
+    def position(self, customer_id: int) -> int:
+        """Returns the position of the customer in the arrays, adding it if it's new"""
+        index = int(np.searchsorted(self.ids, customer_id))
+        if index == len(self.ids) or self.ids[index] != customer_id:
+            self.ids = np.insert(self.ids, index, customer_id)
+            self.count = np.insert(self.count, index, 0)
+            self.cents = np.insert(self.cents, index, 0)
+            self.first = np.insert(self.first, index, np.iinfo(np.int64).max)
+            self.last = np.insert(self.last, index, np.iinfo(np.int64).min)
+        return index
+
+    async def apply(self, session: AsyncSession, event: WriteEvent) -> None:
+        """Adjust the totals of the customers of the committed invoice changes"""
+        async with self._lock:
+            if not self.loaded:
+                return
+            if not self.versions.follow(event.model_class, event.version):
+                # a write of another worker came in between
+                self.loaded = False
+                return
+            if not event.touches("customer_id", "invoice_date", "total"):
+                return
+            if event.bulk:
+                self.loaded = False
+                return
+            recompute = set()
+            for previous, row in event.changes():
+                if previous is not None and previous["customer_id"] is not None:
+                    index = self.position(previous["customer_id"])
+                    self.count[index] -= 1
+                    self.cents[index] -= total_cents(previous["total"])
+                    # the dates don't subtract, the customer's range is read again
+                    recompute.add(previous["customer_id"])
+                if row["customer_id"] is not None:
+                    index = self.position(row["customer_id"])
+                    date = epoch_seconds(row["invoice_date"])
+                    self.count[index] += 1
+                    self.cents[index] += total_cents(row["total"])
+                    self.first[index] = min(self.first[index], date)
+                    self.last[index] = max(self.last[index], date)
+            if recompute:
+                result = await session.execute(
+                    select(
+                        Invoice.customer_id,
+                        func.strftime("%s", func.min(Invoice.invoice_date)),
+                        func.strftime("%s", func.max(Invoice.invoice_date)),
+                    )
+                    .where(Invoice.customer_id.in_(recompute))
+                    .group_by(Invoice.customer_id)
+                )
+                for customer_id, first, last in result.all():
+                    index = self.position(customer_id)
+                    self.first[index], self.last[index] = int(first), int(last)
+            self._scored = None
+
+    def scored(self) -> Tuple[np.ndarray, ...]:
+        """
+        Returns the customers with invoices ordered by descending
+        lifetime value, with their recency in days and their scores and
+        segments, computing them if the totals changed since the last call
+        """
+        if self._scored is None:
+            active = self.count > 0
+            ids, count, cents = self.ids[active], self.count[active], self.cents[active]
+            first, last = self.first[active], self.last[active]
+            as_of = last.max() if len(last) else 0
+            recency = (as_of - last) // SECONDS_PER_DAY
+            # a recent customer has a low recency, so its score is inverted
+            r_score = 6 - scores(recency)
+            f_score, m_score = scores(count), scores(cents)
+            order = np.lexsort((ids, -cents))
+            self._scored = tuple(
+                column[order]
+                for column in (
+                    ids,
+                    count,
+                    cents,
+                    first,
+                    last,
+                    recency,
+                    r_score,
+                    f_score,
+                    m_score,
+                    segments(r_score, f_score, m_score),
+                )
+            )
+        return self._scored
+
+    def page(
+        self, segment: Optional[RfmSegment], offset: int, limit: int
+    ) -> Tuple[List[Tuple], int]:
+        """Returns a page of scored customers, in the segment if given, and their number"""
+        columns = self.scored()
+        if segment is not None:
+            selected = columns[-1] == segment.value
+            columns = tuple(column[selected] for column in columns)
+        rows = list(
+            zip(*(column[offset : offset + limit].tolist() for column in columns))
+        )
+        return rows, len(columns[0])
+
+    def clear(self) -> None:
+        """Forget the totals, the next read loads them again"""
+        self.__init__()
+
+
+customer_rfm = CustomerRfm()
+
+
+def to_datetime(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+async def read_customer_rfm(
+    session: AsyncSession,
+    segment: Optional[RfmSegment] = None,
+    offset: int = 0,
+    limit: int = 10,
+) -> Tuple[List[CustomerRfmRead], int]:
+    """
+    Returns a page of customers by descending lifetime value with their
+    RFM metrics, scores and segment, and the number of customers
+    """
+    await customer_rfm.ensure_loaded(session)
+    rows, total_count = customer_rfm.page(segment, offset, limit)
+    names = await lookup(
+        session,
+        lambda ids: select(Customer.id, Customer.first_name, Customer.last_name).where(
+            Customer.id.in_(ids)
+        ),
+        (row[0] for row in rows),
+    )
+    items = [
+        CustomerRfmRead(
+            customer_id=customer_id,
+            name=" ".join(part for part in names.get(customer_id, ()) if part) or None,
+            recency_days=recency,
+            frequency=count,
+            monetary=Decimal(cents).scaleb(-2),
+            average_order=(Decimal(cents) / count / 100).quantize(Decimal("0.01")),
+            first_invoice=to_datetime(first),
+            last_invoice=to_datetime(last),
+            recency_score=r_score,
+            frequency_score=f_score,
+            monetary_score=m_score,
+            segment=segment_value,
+        )
+        for (
+            customer_id,
+            count,
+            cents,
+            first,
+            last,
+            recency,
+            r_score,
+            f_score,
+            m_score,
+            segment_value,
+        ) in rows
+    ]
+    return items, total_count
+
+
+@on_write(Invoice)
+async def update_customer_rfm(session: AsyncSession, event: WriteEvent) -> None:
+    """Adjust the totals of the customers whose invoices changed"""
+    await customer_rfm.apply(session, event)
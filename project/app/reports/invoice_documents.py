@@ -0,0 +1,203 @@
+"""
+This module assembles the invoice documents: an invoice with its
+customer and its lines, each line with the names of its track, album
+and artist. A document is read with one joined statement, whose rows
+are grouped in a single pass, and cached keyed on the change version of
+its invoice. Writes to the invoice or its lines bump the version of the
+invoice, writes to the customers and the catalogue the version of every
+invoice, so a document read while a write commits is never served once
+the write has been. The versions only follow the writes of this worker
+process, so documents also expire after a ttl.
+"""
+
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.events import WriteEvent, on_write
+from app.models.albums import Album
+from app.models.artists import Artist
+from app.models.customers import Customer
+from app.models.documents import InvoiceDocument, InvoiceDocumentLine
+from app.models.invoice_items import InvoiceItem
+from app.models.invoices import Invoice
+from app.models.tracks import Track
+
+# the number of documents the cache holds
+MAX_DOCUMENTS = 1024
+# seconds a document is served, this bounds how long a write made by
+# another worker process can go unseen
+DOCUMENT_TTL = 10.0
+
+Version = Tuple[int, int]
+
+
+class InvoiceDocuments:
+    """LRU cache of the invoice documents keyed by invoice id"""
+
+    def __init__(self, max_documents: int = MAX_DOCUMENTS, ttl: float = DOCUMENT_TTL):
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Version, float, InvoiceDocument]]" = (
+            OrderedDict()
+        )
+        # bumped by the writes to one invoice or its lines
+        self._versions: Dict[int, int] = defaultdict(int)
+        # bumped by the writes every document may depend on
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def version(self, invoice_id: int) -> Version:
+        """Returns the change version of the invoice"""
+        return self._generation, self._versions.get(invoice_id, 0)
+
+    def get(self, invoice_id: int) -> Optional[InvoiceDocument]:
+        """Returns the cached document if it's current, None otherwise"""
+        entry = self._entries.get(invoice_id)
+        if entry is not None and entry[1] < time.monotonic():
+            del self._entries[invoice_id]
+            self.expirations += 1
+            entry = None
+        if entry is None or entry[0] != self.version(invoice_id):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(invoice_id)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, invoice_id: int, version: Version, document: InvoiceDocument) -> None:
+        """Cache the document read at the version, unless the invoice has changed since"""
+        if version != self.version(invoice_id):
+            return
+        self._entries[invoice_id] = (version, time.monotonic() + self.ttl, document)
+        self._entries.move_to_end(invoice_id)
+        while len(self._entries) > self.max_documents:
+            self._entries.popitem(last=False)
+
+    def changed(self, invoice_ids: Iterable[int]) -> None:
+        """Bump the version of the invoices and forget their documents"""
+        for invoice_id in invoice_ids:
+            self._versions[invoice_id] += 1
+            self._entries.pop(invoice_id, None)
+
+    def changed_all(self) -> None:
+        """Bump the version of every invoice and forget every document"""
+        self._generation += 1
+        self._entries.clear()
+
+    def clear(self) -> None:
+        """Forget every document, the counters are kept"""
+        self.changed_all()
+        self._versions.clear()
+
+    def stats(self) -> Dict:
+        """Returns the cache counters and the hit ratio"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_documents,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+invoice_documents = InvoiceDocuments()
+
+
+def document_query(invoice_id: int):
+    """Returns the statement of the invoice, its customer and one row per line"""
+    return (
+        select(
+            Invoice,
+            Customer,
+            InvoiceItem,
+            Track.name,
+            Album.title,
+            Artist.name,
+        )
+        .outerjoin(Customer, Customer.id == Invoice.customer_id)
+        .outerjoin(InvoiceItem, InvoiceItem.invoice_id == Invoice.id)
+        .outerjoin(Track, Track.id == InvoiceItem.track_id)
+        .outerjoin(Album, Album.id == Track.album_id)
+        .outerjoin(Artist, Artist.id == Album.artist_id)
+        .where(Invoice.id == invoice_id)
+        .order_by(InvoiceItem.id)
+    )
+
+
+async def read_invoice_document(
+    session: AsyncSession, invoice_id: int
+) -> InvoiceDocument:
+    """
+    Returns the document of the invoice, from the cache if it's current.
+    Raises a 404 if there is no such invoice
+    """
+    document = invoice_documents.get(invoice_id)
+    if document is not None:
+        return document
+    version = invoice_documents.version(invoice_id)
+    result = await session.execute(document_query(invoice_id))
+    document = None
+    for invoice, customer, item, track_name, album_title, artist_name in result:
+        if document is None:
+            document = InvoiceDocument(
+                invoice=invoice,
+                customer=customer,
+            )
+        if item is not None:
+            document.lines.append(
+                InvoiceDocumentLine(
+                    id=item.id,
+                    invoice_id=item.invoice_id,
+                    track_id=item.track_id,
+                    unit_price=item.unit_price,
+                    quantity=item.quantity,
+                    track_name=track_name,
+                    album_title=album_title,
+                    artist_name=artist_name,
+                )
+            )
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"{Invoice} not found")
+    invoice_documents.put(invoice_id, version, document)
+    return document
+
+
+@on_write(Invoice, InvoiceItem)
+async def refresh_invoice_documents(session: AsyncSession, event: WriteEvent) -> None:
+    """Bump the version of the invoices written, or whose lines were"""
+    if event.bulk:
+        invoice_documents.changed_all()
+        return
+    key = "id" if event.model_class is Invoice else "invoice_id"
+    invoice_documents.changed(
+        {row[key] for row in event.rows}
+        | {previous[key] for previous, _ in event.changes() if previous}
+    )
+
+
+# the attributes of the catalogue tables the lines of a document hold,
+# a document holds every attribute of its customer
+LINE_COLUMNS = {
+    Track: ("name", "album_id"),
+    Album: ("title", "artist_id"),
+    Artist: ("name",),
+}
+
+
+@on_write(Customer, Track, Album, Artist)
+async def refresh_all_invoice_documents(
+    session: AsyncSession, event: WriteEvent
+) -> None:
+    """The customers and names a document holds change rarely enough to drop them all"""
+    columns = LINE_COLUMNS.get(event.model_class)
+    if columns is None or event.touches(*columns):
+        invoice_documents.changed_all()
@@ -0,0 +1,257 @@
+"""
+This module maintains the best-selling track, album and artist
+leaderboards. Every leaderboard keeps the units sold and revenue of each
+id, and a ranking list per metric sorted by descending total, for all
+time, every year and every month. They are seeded from the invoice lines
+at startup and updated in place by the invoice line writes, so reading
+the top N costs O(N) rather than an aggregation of the whole table. The
+writes of the other worker processes aren't seen as they happen, a read
+that finds their data versions moved seeds the leaderboards again.
+"""
+
+import asyncio
+from decimal import Decimal
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import TableVersions
+from app.events import WriteEvent, on_write
+from app.models.albums import Album
+from app.models.artists import Artist
+from app.models.invoices import Invoice
+from app.models.invoice_items import InvoiceItem
+from app.models.reports import LeaderboardEntry, TopKind, TopMetric
+from app.models.tracks import Track
+from app.reports.sales import LINE_CENTS, line_cents, lookup, month_key
+
+ALL_TIME = "all"
+
+METRIC_INDEX = {TopMetric.QUANTITY: 0, TopMetric.REVENUE: 1}
+
+NAME_COLUMNS = {
+    TopKind.TRACKS: (Track.id, Track.name),
+    TopKind.ALBUMS: (Album.id, Album.title),
+    TopKind.ARTISTS: (Artist.id, Artist.name),
+}
+
+SEED_QUERY = text(
+    f"""
+    SELECT ii.TrackId, t.AlbumId, al.ArtistId, strftime('%Y-%m', i.InvoiceDate),
+        SUM(ii.Quantity), SUM({LINE_CENTS})
+    FROM invoice_items ii
+    LEFT JOIN tracks t ON t.TrackId = ii.TrackId
+    LEFT JOIN albums al ON al.AlbumId = t.AlbumId
+    LEFT JOIN invoices i ON i.InvoiceId = ii.InvoiceId
+    GROUP BY 1, 2, 3, 4
+    """
+)
+
+
+class Leaderboard:
+    """
+    The totals of every id of one kind in one period, with a ranking
+    list per metric of (-total, id) tuples kept sorted by bisection
+    """
+
+    __slots__ = ("totals", "rankings")
+
+    def __init__(self):
+        self.totals: Dict[int, List[int]] = {}
+        self.rankings: Tuple[List[Tuple[int, int]], ...] = ([], [])
+
+    def add(self, id: int, quantity: int, cents: int) -> None:
+        """Add to the totals of the id, moving it in the rankings"""
+        old = self.totals.get(id, [0, 0])
+        new = [old[0] + quantity, old[1] + cents]
+        for ranking, old_total, new_total in zip(self.rankings, old, new):
+            if old_total > 0:
+                index = bisect_left(ranking, (-old_total, id))
+                del ranking[index]
+            if new_total > 0:
+                insort(ranking, (-new_total, id))
+        if new[0] > 0 or new[1] > 0:
+            self.totals[id] = new
+        else:
+            self.totals.pop(id, None)
+
+    def top(
+        self, metric: TopMetric, offset: int, limit: int
+    ) -> Tuple[List[Tuple[int, List[int]]], int]:
+        """Returns a page of (id, totals) in rank order and the number of ranked ids"""
+        ranking = self.rankings[METRIC_INDEX[metric]]
+        page = ranking[offset : offset + limit]
+        return [(id, self.totals[id]) for _, id in page], len(ranking)
+
+
+class Leaderboards:
+    """The leaderboards of every kind and period"""
+
+    def __init__(self):
+        self.loaded = False
+        self._boards: Dict[Tuple[TopKind, str], Leaderboard] = defaultdict(Leaderboard)
+        self.versions = TableVersions(InvoiceItem, Invoice, Track, Album)
+        self._lock = asyncio.Lock()
+
+    def add_line(
+        self,
+        ids: Tuple[Optional[int], Optional[int], Optional[int]],
+        month: str,
+        quantity: int,
+        cents: int,
+    ) -> None:
+        """Add the totals of invoice lines to the track, album and artist they belong to"""
+        periods = [ALL_TIME] + ([month[:4], month] if month else [])
+        for kind, id in zip(TopKind, ids):
+            if id is None:
+                continue
+            for period in periods:
+                self._boards[(kind, period)].add(id, quantity, cents)
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)seed every leaderboard from the invoice lines"""
+        async with self._lock:
+            self._boards.clear()
+            versions = await self.versions.read(session)
+            result = await session.execute(SEED_QUERY)
+            for track_id, album_id, artist_id, month, quantity, cents in result.all():
+                self.add_line(
+                    (track_id, album_id, artist_id), month or "", quantity, cents
+                )
+            await self.versions.record(session, versions)
+            self.loaded = True
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Seed the leaderboards if the application didn't at startup, or
+        again if another worker process wrote to the tables they're seeded from
+        """
+        if not self.loaded or await self.versions.stale(session):
+            await self.load(session)
+
+    def follow(self, event: WriteEvent) -> bool:
+        """
+        Returns whether the leaderboards have every earlier write to the
+        table of the event, they're forgotten if they don't
+        """
+        if self.versions.follow(event.model_class, event.version):
+            return True
+        self.clear()
+        return False
+
+    async def apply(self, session: AsyncSession, event: WriteEvent) -> None:
+        """Apply the committed invoice line changes of the event"""
+        async with self._lock:
+            if not self.loaded or not self.follow(event):
+                return
+            lines = [(previous, -1) for previous, _ in event.changes() if previous]
+            lines += [(row, 1) for row in event.rows]
+            tracks = await lookup(
+                session,
+                lambda ids: select(Track.id, Track.album_id, Album.artist_id)
+                .outerjoin(Album, Album.id == Track.album_id)
+                .where(Track.id.in_(ids)),
+                (line["track_id"] for line, _ in lines),
+            )
+            invoices = await lookup(
+                session,
+                lambda ids: select(Invoice.id, Invoice.invoice_date).where(
+                    Invoice.id.in_(ids)
+                ),
+                (line["invoice_id"] for line, _ in lines),
+            )
+            for line, sign in lines:
+                album_id, artist_id = tracks.get(line["track_id"], (None, None))
+                (invoice_date,) = invoices.get(line["invoice_id"], (None,))
+                self.add_line(
+                    (line["track_id"], album_id, artist_id),
+                    month_key(invoice_date),
+                    sign * line["quantity"],
+                    sign * line_cents(line["unit_price"], line["quantity"]),
+                )
+
+    def top(
+        self, kind: TopKind, period: str, metric: TopMetric, offset: int, limit: int
+    ) -> Tuple[List[Tuple[int, List[int]]], int]:
+        board = self._boards.get((kind, period))
+        if board is None:
+            return [], 0
+        return board.top(metric, offset, limit)
+
+    def clear(self) -> None:
+        """Forget the totals, the next read seeds them again"""
+        self._boards.clear()
+        self.versions.clear()
+        self.loaded = False
+
+
+leaderboards = Leaderboards()
+
+
+async def read_top(
+    session: AsyncSession,
+    kind: TopKind,
+    period: str = ALL_TIME,
+    metric: TopMetric = TopMetric.QUANTITY,
+    offset: int = 0,
+    limit: int = 10,
+) -> Tuple[List[LeaderboardEntry], int]:
+    """
+    Returns a page of the best sellers of the kind in the period (all,
+    a year or a month) ranked by the metric, and the number ranked
+    """
+    await leaderboards.ensure_loaded(session)
+    page, total_count = leaderboards.top(kind, period, metric, offset, limit)
+    id_column, name_column = NAME_COLUMNS[kind]
+    names = await lookup(
+        session,
+        lambda ids: select(id_column, name_column).where(id_column.in_(ids)),
+        (id for id, _ in page),
+    )
+    entries = [
+        LeaderboardEntry(
+            rank=offset + index + 1,
+            id=id,
+            name=names.get(id, (None,))[0],
+            quantity=quantity,
+            revenue=Decimal(cents).scaleb(-2),
+        )
+        for index, (id, (quantity, cents)) in enumerate(page)
+    ]
+    return entries, total_count
+
+
+@on_write(InvoiceItem)
+async def update_leaderboards(session: AsyncSession, event: WriteEvent) -> None:
+    """Move the tracks, albums and artists of the changed lines in the leaderboards"""
+    if event.bulk:
+        if leaderboards.follow(event) and event.touches(
+            "invoice_id", "track_id", "unit_price", "quantity"
+        ):
+            leaderboards.clear()
+        return
+    await leaderboards.apply(session, event)
+
+
+@on_write(Invoice, Track, Album)
+async def invalidate_leaderboards(session: AsyncSession, event: WriteEvent) -> None:
+    """
+    Moving an invoice to another month, or a track or album to another
+    album or artist, regroups its lines, which is rare enough to reseed for
+    """
+    groups = {
+        Invoice: ("invoice_date", lambda row: month_key(row["invoice_date"])),
+        Track: ("album_id", lambda row: row["album_id"]),
+        Album: ("artist_id", lambda row: row["artist_id"]),
+    }
+    column, group = groups[event.model_class]
+    if not leaderboards.follow(event) or not event.touches(column):
+        return
+    if event.bulk or any(
+        previous is not None and group(previous) != group(row)
+        for previous, row in event.changes()
+    ):
+        leaderboards.clear()
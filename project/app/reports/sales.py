@@ -0,0 +1,424 @@
+"""
+This module maintains the sales rollups, the revenue, quantity and line
+count of the invoice lines summed by genre, artist, billing country and
+invoice month. They are built once from the invoice lines and then kept
+current by the write events of the tables they are derived from, inside
+the transaction of the write, so the summary table is always consistent
+with the lines it summarises.
+"""
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.events import Phase, WriteEvent, on_write
+from app.models.albums import Album
+from app.models.invoices import Invoice
+from app.models.invoice_items import InvoiceItem
+from app.models.reports import (
+    SalesGroupBy,
+    SalesRollup,
+    SalesRollupCheck,
+    SalesRollupMismatch,
+    SalesRollupRead,
+)
+from app.models.tracks import Track
+
+# revenue, quantity and line count of a key
+Totals = Tuple[int, int, int]
+Deltas = Dict[Tuple[str, str], List[int]]
+
+LINE_CENTS = "CAST(ROUND(ii.UnitPrice * ii.Quantity * 100) AS INTEGER)"
+
+# the key of every invoice line in each dimension, a missing key is ''
+DIMENSION_QUERIES = {
+    SalesGroupBy.GENRE: """
+        SELECT COALESCE(CAST(t.GenreId AS TEXT), '') AS key, ii.*
+        FROM invoice_items ii
+        LEFT JOIN tracks t ON t.TrackId = ii.TrackId
+    """,
+    SalesGroupBy.ARTIST: """
+        SELECT COALESCE(CAST(al.ArtistId AS TEXT), '') AS key, ii.*
+        FROM invoice_items ii
+        LEFT JOIN tracks t ON t.TrackId = ii.TrackId
+        LEFT JOIN albums al ON al.AlbumId = t.AlbumId
+    """,
+    SalesGroupBy.COUNTRY: """
+        SELECT COALESCE(i.BillingCountry, '') AS key, ii.*
+        FROM invoice_items ii
+        LEFT JOIN invoices i ON i.InvoiceId = ii.InvoiceId
+    """,
+    SalesGroupBy.MONTH: """
+        SELECT COALESCE(strftime('%Y-%m', i.InvoiceDate), '') AS key, ii.*
+        FROM invoice_items ii
+        LEFT JOIN invoices i ON i.InvoiceId = ii.InvoiceId
+    """,
+}
+
+RECOMPUTE_QUERY = " UNION ALL ".join(
+    f"""
+    SELECT '{group_by.value}' AS dimension, key,
+        SUM({LINE_CENTS}) AS revenue_cents,
+        SUM(ii.Quantity) AS quantity,
+        COUNT(*) AS line_count
+    FROM ({query}) ii
+    GROUP BY key
+    """
+    for group_by, query in DIMENSION_QUERIES.items()
+)
+
+# the names of the keys that are ids
+NAME_JOINS = {
+    SalesGroupBy.GENRE: "LEFT JOIN genres n ON n.GenreId = CAST(r.Key AS INTEGER)",
+    SalesGroupBy.ARTIST: "LEFT JOIN artists n ON n.ArtistId = CAST(r.Key AS INTEGER)",
+}
+
+UPSERT_QUERY = text(
+    """
+    INSERT INTO sales_rollups (Dimension, Key, RevenueCents, Quantity, LineCount)
+    VALUES (:dimension, :key, :revenue_cents, :quantity, :line_count)
+    ON CONFLICT (Dimension, Key) DO UPDATE SET
+        RevenueCents = RevenueCents + excluded.RevenueCents,
+        Quantity = Quantity + excluded.Quantity,
+        LineCount = LineCount + excluded.LineCount
+    """
+)
+
+# number of ids looked up per statement
+LOOKUP_CHUNK_SIZE = 900
+
+_ready = False
+
+
+def line_cents(unit_price, quantity: int) -> int:
+    """Returns the revenue of an invoice line in cents, rounded like the SQL recompute"""
+    cents = Decimal(str(unit_price)) * quantity * 100
+    return int(cents.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def month_key(invoice_date) -> str:
+    return invoice_date.strftime("%Y-%m") if invoice_date is not None else ""
+
+
+def id_key(id: Optional[int]) -> str:
+    return "" if id is None else str(id)
+
+
+async def build_sales_rollups(session: AsyncSession) -> None:
+    """Rebuild the summary table from the invoice lines, in the session's transaction"""
+    await session.execute(text("DELETE FROM sales_rollups"))
+    await session.execute(
+        text(
+            "INSERT INTO sales_rollups "
+            "(Dimension, Key, RevenueCents, Quantity, LineCount) " + RECOMPUTE_QUERY
+        )
+    )
+
+
+async def ensure_sales_rollups(session: AsyncSession) -> bool:
+    """
+    Create and build the summary table the first time it's used in this
+    process, unless it has already been built. Returns True if it was
+    built, in which case it already reflects the session's pending writes
+    """
+    global _ready
+    if _ready:
+        return False
+    connection = await session.connection()
+    await connection.run_sync(
+        lambda sync_connection: SalesRollup.__table__.create(
+            sync_connection, checkfirst=True
+        )
+    )
+    built = False
+    if not await session.scalar(select(func.count()).select_from(SalesRollup)):
+        await build_sales_rollups(session)
+        built = True
+    _ready = True
+    return built
+
+
+def reset_sales_rollups() -> None:
+    """Forget the summary table has been built, e.g. for a new database"""
+    global _ready
+    _ready = False
+
+
+async def read_sales_rollups(
+    session: AsyncSession,
+    group_by: SalesGroupBy,
+    offset: int = 0,
+    limit: int = 10,
+) -> Tuple[List[SalesRollupRead], int]:
+    """
+    Returns a page of the sales of the dimension, months in calendar
+    order and every other dimension by descending revenue, and the
+    number of keys. The summary table is built before the application
+    starts (app.prepare), so reading it only reads
+    """
+    name = "n.Name" if group_by in NAME_JOINS else "r.Key"
+    order = "r.Key" if group_by == SalesGroupBy.MONTH else "r.RevenueCents DESC, r.Key"
+    result = await session.execute(
+        text(
+            f"""
+            SELECT r.Key, {name}, r.RevenueCents, r.Quantity, r.LineCount
+            FROM sales_rollups r {NAME_JOINS.get(group_by, "")}
+            WHERE r.Dimension = :dimension
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+            """
+        ),
+        {"dimension": group_by.value, "limit": limit, "offset": offset},
+    )
+    items = [
+        SalesRollupRead(
+            key=key,
+            name=name,
+            revenue=Decimal(revenue_cents).scaleb(-2),
+            quantity=quantity,
+            line_count=line_count,
+        )
+        for key, name, revenue_cents, quantity, line_count in result.all()
+    ]
+    total_count = await session.scalar(
+        select(func.count())
+        .select_from(SalesRollup)
+        .where(SalesRollup.dimension == group_by.value)
+    )
+    return items, total_count
+
+
+async def check_sales_rollups(
+    session: AsyncSession, repair: bool = False
+) -> SalesRollupCheck:
+    """
+    Compare the summary table with a full recompute from the invoice
+    lines, and rebuild it if asked to and they differ. Only a repair
+    writes, creating the summary table too if it's missing
+    """
+    if repair and await ensure_sales_rollups(session):
+        await session.commit()
+    expected = await fetch_totals(session, RECOMPUTE_QUERY)
+    actual = await fetch_totals(
+        session,
+        "SELECT Dimension, Key, RevenueCents, Quantity, LineCount FROM sales_rollups",
+    )
+    mismatches = [
+        SalesRollupMismatch(
+            group_by=dimension,
+            key=key,
+            expected=expected.get((dimension, key)),
+            actual=actual.get((dimension, key)),
+        )
+        for dimension, key in sorted(expected.keys() | actual.keys())
+        if expected.get((dimension, key)) != actual.get((dimension, key))
+    ]
+    check = SalesRollupCheck(
+        consistent=not mismatches,
+        checked=len(expected.keys() | actual.keys()),
+        mismatches=mismatches,
+    )
+    if mismatches and repair:
+        await build_sales_rollups(session)
+        await session.commit()
+        check.repaired = True
+    return check
+
+
+async def fetch_totals(
+    session: AsyncSession, query: str
+) -> Dict[Tuple[str, str], List[int]]:
+    result = await session.execute(text(query))
+    return {
+        (dimension, key): [revenue_cents, quantity, line_count]
+        for dimension, key, revenue_cents, quantity, line_count in result.all()
+    }
+
+
+async def apply_deltas(session: AsyncSession, deltas: Deltas) -> None:
+    """Add the deltas to the summary table, dropping the keys left without lines"""
+    changes = [
+        {
+            "dimension": dimension,
+            "key": key,
+            "revenue_cents": revenue_cents,
+            "quantity": quantity,
+            "line_count": line_count,
+        }
+        for (dimension, key), (revenue_cents, quantity, line_count) in deltas.items()
+        if revenue_cents or quantity or line_count
+    ]
+    if not changes:
+        return
+    await session.execute(UPSERT_QUERY, changes)
+    if any(change["line_count"] < 0 for change in changes):
+        await session.execute(text("DELETE FROM sales_rollups WHERE LineCount <= 0"))
+
+
+def add_totals(
+    deltas: Deltas, dimension: SalesGroupBy, key: str, totals: Totals, sign: int
+) -> None:
+    delta = deltas[(dimension.value, key)]
+    for index, value in enumerate(totals):
+        delta[index] += sign * value
+
+
+async def lookup(session: AsyncSession, query, ids: Iterable[int]) -> Dict:
+    """Returns the remaining columns of the query's rows keyed by their first column"""
+    ids = sorted({id for id in ids if id is not None})
+    found = {}
+    # chunked to stay well inside SQLite's limit on bound parameters
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        result = await session.execute(query(ids[start : start + LOOKUP_CHUNK_SIZE]))
+        found.update((row[0], tuple(row[1:])) for row in result.all())
+    return found
+
+
+async def line_totals(session: AsyncSession, column, id: int) -> Totals:
+    """Returns the totals of the invoice lines whose column equals the id"""
+    result = await session.execute(
+        text(
+            f"SELECT COALESCE(SUM({LINE_CENTS}), 0), COALESCE(SUM(ii.Quantity), 0), "
+            f"COUNT(*) FROM invoice_items ii WHERE ii.{column} = :id"
+        ),
+        {"id": id},
+    )
+    return tuple(result.one())
+
+
+# the attributes of every table the rollups are summed or keyed by
+ROLLUP_COLUMNS = {
+    InvoiceItem: ("invoice_id", "track_id", "unit_price", "quantity"),
+    Invoice: ("invoice_date", "billing_country"),
+    Track: ("genre_id", "album_id"),
+    Album: ("artist_id",),
+}
+
+
+@on_write(InvoiceItem, Invoice, Track, Album, phase=Phase.BEFORE_COMMIT)
+async def update_sales_rollups(session: AsyncSession, event: WriteEvent) -> None:
+    """Apply the change of the invoice lines, or what they are keyed by, to the rollups"""
+    if not event.touches(*ROLLUP_COLUMNS[event.model_class]):
+        return
+    if await ensure_sales_rollups(session):
+        return
+    if event.bulk:
+        await build_sales_rollups(session)
+        return
+    handlers = {
+        InvoiceItem: invoice_item_deltas,
+        Invoice: invoice_deltas,
+        Track: track_deltas,
+        Album: album_deltas,
+    }
+    deltas: Deltas = defaultdict(lambda: [0, 0, 0])
+    await handlers[event.model_class](session, event, deltas)
+    await apply_deltas(session, deltas)
+
+
+async def invoice_item_deltas(
+    session: AsyncSession, event: WriteEvent, deltas: Deltas
+) -> None:
+    lines = [(previous, -1) for previous, _ in event.changes() if previous]
+    lines += [(row, 1) for row in event.rows]
+    tracks = await lookup(
+        session,
+        lambda ids: select(Track.id, Track.genre_id, Album.artist_id)
+        .outerjoin(Album, Album.id == Track.album_id)
+        .where(Track.id.in_(ids)),
+        (line["track_id"] for line, _ in lines),
+    )
+    invoices = await lookup(
+        session,
+        lambda ids: select(
+            Invoice.id, Invoice.billing_country, Invoice.invoice_date
+        ).where(Invoice.id.in_(ids)),
+        (line["invoice_id"] for line, _ in lines),
+    )
+    for line, sign in lines:
+        totals = (line_cents(line["unit_price"], line["quantity"]), line["quantity"], 1)
+        genre_id, artist_id = tracks.get(line["track_id"], (None, None))
+        country, invoice_date = invoices.get(line["invoice_id"], (None, None))
+        add_totals(deltas, SalesGroupBy.GENRE, id_key(genre_id), totals, sign)
+        add_totals(deltas, SalesGroupBy.ARTIST, id_key(artist_id), totals, sign)
+        add_totals(deltas, SalesGroupBy.COUNTRY, country or "", totals, sign)
+        add_totals(deltas, SalesGroupBy.MONTH, month_key(invoice_date), totals, sign)
+
+
+async def invoice_deltas(
+    session: AsyncSession, event: WriteEvent, deltas: Deltas
+) -> None:
+    # a new invoice has no lines yet, a changed one moves its lines
+    for previous, row in event.changes():
+        if previous is None:
+            continue
+        moves = [
+            (
+                SalesGroupBy.COUNTRY,
+                previous["billing_country"] or "",
+                row["billing_country"] or "",
+            ),
+            (
+                SalesGroupBy.MONTH,
+                month_key(previous["invoice_date"]),
+                month_key(row["invoice_date"]),
+            ),
+        ]
+        moves = [move for move in moves if move[1] != move[2]]
+        if moves:
+            totals = await line_totals(session, "InvoiceId", row["id"])
+            for dimension, old_key, new_key in moves:
+                add_totals(deltas, dimension, old_key, totals, -1)
+                add_totals(deltas, dimension, new_key, totals, 1)
+
+
+async def track_deltas(
+    session: AsyncSession, event: WriteEvent, deltas: Deltas
+) -> None:
+    for previous, row in event.changes():
+        if previous is None:
+            continue
+        genre_changed = previous["genre_id"] != row["genre_id"]
+        album_changed = previous["album_id"] != row["album_id"]
+        if not (genre_changed or album_changed):
+            continue
+        totals = await line_totals(session, "TrackId", row["id"])
+        if genre_changed:
+            add_totals(
+                deltas, SalesGroupBy.GENRE, id_key(previous["genre_id"]), totals, -1
+            )
+            add_totals(deltas, SalesGroupBy.GENRE, id_key(row["genre_id"]), totals, 1)
+        if album_changed:
+            artists = await lookup(
+                session,
+                lambda ids: select(Album.id, Album.artist_id).where(Album.id.in_(ids)),
+                (previous["album_id"], row["album_id"]),
+            )
+            old_artist = artists.get(previous["album_id"], (None,))[0]
+            new_artist = artists.get(row["album_id"], (None,))[0]
+            add_totals(deltas, SalesGroupBy.ARTIST, id_key(old_artist), totals, -1)
+            add_totals(deltas, SalesGroupBy.ARTIST, id_key(new_artist), totals, 1)
+
+
+async def album_deltas(
+    session: AsyncSession, event: WriteEvent, deltas: Deltas
+) -> None:
+    for previous, row in event.changes():
+        if previous is None or previous["artist_id"] == row["artist_id"]:
+            continue
+        result = await session.execute(
+            text(
+                f"SELECT COALESCE(SUM({LINE_CENTS}), 0), COALESCE(SUM(ii.Quantity), 0), "
+                "COUNT(*) FROM invoice_items ii "
+                "JOIN tracks t ON t.TrackId = ii.TrackId WHERE t.AlbumId = :id"
+            ),
+            {"id": row["id"]},
+        )
+        totals = tuple(result.one())
+        add_totals(
+            deltas, SalesGroupBy.ARTIST, id_key(previous["artist_id"]), totals, -1
+        )
+        add_totals(deltas, SalesGroupBy.ARTIST, id_key(row["artist_id"]), totals, 1)
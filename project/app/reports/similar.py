@@ -0,0 +1,322 @@
+"""
+This module finds the tracks most similar to a track by their features:
+length, size, price, genre and media type. Every track is a row of a
+normalised feature matrix held in NumPy, and the nearest rows to a
+track are found with vectorised distance computations. Once the table
+is large the rows are partitioned into k-means clusters, and a query
+only scans the clusters nearest to the track (an inverted file index).
+Track writes update the matrix in place. A read that finds another
+worker process wrote tracks, from their data version, builds it again.
+"""
+
+import asyncio
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import TableVersions
+from app.events import WriteEvent, on_write
+from app.models.reports import SimilarTrack
+from app.models.tracks import Track
+from app.reports.sales import lookup
+
+# the numeric features, the first two are log scaled as they're heavy tailed
+NUMERIC_FEATURES = ("milliseconds", "bytes", "unit_price")
+LOG_SCALED = np.array([True, True, False])
+# the categorical features, one hot encoded
+CATEGORY_FEATURES = ("genre_id", "media_type_id")
+# a different genre or media type adds this to the squared distance
+CATEGORY_WEIGHT = 1.0
+
+# the number of tracks from which queries use the partitioned index
+PARTITION_THRESHOLD = 20_000
+# the number of clusters scanned by a query
+PROBES = 8
+KMEANS_ITERATIONS = 10
+# the k-means clusters are trained on a sample of this many rows per cluster
+KMEANS_SAMPLE = 64
+# rows per block when assigning rows to clusters, bounds the distance matrix
+ASSIGN_BLOCK = 4096
+
+# missing values are read as -1, none of the features can be negative
+LOAD_QUERY = text(
+    """
+    SELECT TrackId, COALESCE(Milliseconds, -1), COALESCE(Bytes, -1),
+        COALESCE(CAST(UnitPrice AS REAL), -1),
+        COALESCE(GenreId, -1), COALESCE(MediaTypeId, -1)
+    FROM tracks
+    """
+)
+
+
+def nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Returns the index of the centroid nearest to every point"""
+    squared = (centroids**2).sum(axis=1)
+    labels = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), ASSIGN_BLOCK):
+        block = points[start : start + ASSIGN_BLOCK]
+        # |p - c|^2 without the |p|^2 term, which is the same for every centroid
+        labels[start : start + ASSIGN_BLOCK] = np.argmin(
+            squared - 2 * block @ centroids.T, axis=1
+        )
+    return labels
+
+
+class Partitions:
+    """
+    The rows of a feature matrix grouped in k-means clusters: the
+    centroids, the cluster of every row and the rows of every cluster
+    """
+
+    def __init__(self, vectors: np.ndarray, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        count = max(1, int(np.sqrt(len(vectors))))
+        sample = vectors[
+            rng.choice(len(vectors), min(len(vectors), count * KMEANS_SAMPLE), False)
+        ]
+        centroids = sample[rng.choice(len(sample), count, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = nearest(sample, centroids)
+            sizes = np.bincount(labels, minlength=count)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            # an empty cluster keeps its centroid
+            filled = sizes > 0
+            centroids[filled] = sums[filled] / sizes[filled, None]
+        self.centroids = centroids
+        self.built_size = len(vectors)
+        self.labels = nearest(vectors, centroids)
+        order = np.argsort(self.labels, kind="stable")
+        bounds = np.searchsorted(self.labels[order], np.arange(count + 1))
+        self.members: List[np.ndarray] = [
+            order[bounds[index] : bounds[index + 1]] for index in range(count)
+        ]
+
+    def put(self, position: int, vector: np.ndarray) -> None:
+        """Put the row at the position in the cluster nearest to its vector"""
+        label = int(nearest(vector[None, :], self.centroids)[0])
+        if position < len(self.labels):
+            old = int(self.labels[position])
+            if old == label:
+                return
+            self.members[old] = self.members[old][self.members[old] != position]
+            self.labels[position] = label
+        else:
+            self.labels = np.append(self.labels, label)
+        self.members[label] = np.append(self.members[label], position)
+
+    def candidates(self, vector: np.ndarray, probes: int = PROBES) -> np.ndarray:
+        """Returns the rows of the clusters nearest to the vector"""
+        distances = ((self.centroids - vector) ** 2).sum(axis=1)
+        probes = min(probes, len(distances))
+        closest = np.argpartition(distances, probes - 1)[:probes]
+        return np.concatenate([self.members[index] for index in closest])
+
+
+class TrackFeatures:
+    """
+    The normalised feature vector of every track as the rows of a
+    matrix, with the row of every track id and the scaling used
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.partitions: Optional[Partitions] = None
+        self._positions: Dict[int, int] = {}
+        self._mean = np.zeros(len(NUMERIC_FEATURES))
+        self._scale = np.ones(len(NUMERIC_FEATURES))
+        # the sorted values of each categorical feature, one column each
+        self._categories: Tuple[np.ndarray, ...] = ()
+        self.versions = TableVersions(Track)
+        self._lock = asyncio.Lock()
+
+    def transform(self, numeric: np.ndarray) -> np.ndarray:
+        """Returns the numeric features log scaled where needed, missing values as NaN"""
+        numeric = np.where(numeric < 0, np.nan, numeric)
+        return np.where(LOG_SCALED, np.log1p(np.abs(numeric)), numeric)
+
+    def encode(self, numeric: np.ndarray, categories: np.ndarray) -> np.ndarray:
+        """
+        Returns the feature vectors of rows of numeric and categorical
+        values, the numeric ones standardised with the scaling of the
+        matrix and missing ones at the mean
+        """
+        standard = np.nan_to_num((self.transform(numeric) - self._mean) / self._scale)
+        width = len(NUMERIC_FEATURES) + sum(len(known) for known in self._categories)
+        vectors = np.zeros((len(numeric), width), dtype=np.float32)
+        vectors[:, : len(NUMERIC_FEATURES)] = standard
+        # a mismatch differs in two columns, each adding half the weight
+        value = np.sqrt(CATEGORY_WEIGHT / 2)
+        offset = len(NUMERIC_FEATURES)
+        rows = np.arange(len(numeric))
+        for values, known in zip(categories.T, self._categories):
+            if len(known) == 0:
+                continue
+            columns = np.searchsorted(known, values).clip(max=len(known) - 1)
+            found = known[columns] == values
+            vectors[rows[found], offset + columns[found]] = value
+            offset += len(known)
+        return vectors
+
+    def build(self, ids: np.ndarray, numeric: np.ndarray, categories: np.ndarray):
+        """Replace the matrix with the features of the tracks"""
+        transformed = self.transform(numeric)
+        self._mean = np.nan_to_num(np.nanmean(transformed, axis=0)) if len(ids) else 0
+        scale = np.nan_to_num(np.nanstd(transformed, axis=0)) if len(ids) else 1
+        self._scale = np.where(scale > 0, scale, 1.0)
+        self._categories = tuple(
+            np.unique(values[values >= 0]) for values in categories.T
+        )
+        self.vectors = self.encode(numeric, categories)
+        self.ids = ids.copy()
+        self.size = len(ids)
+        self._positions = {id: position for position, id in enumerate(ids.tolist())}
+        self.partitions = None
+        self.partition()
+        self.loaded = True
+
+    def partition(self) -> None:
+        """Partition the rows once the table is large, again when it has doubled"""
+        if self.size < PARTITION_THRESHOLD:
+            self.partitions = None
+        elif self.partitions is None or self.size > 2 * self.partitions.built_size:
+            self.partitions = Partitions(self.vectors[: self.size])
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)load the features of every track and build the matrix"""
+        async with self._lock:
+            versions = await self.versions.read(session)
+            rows = (await session.execute(LOAD_QUERY)).all()
+            columns = np.fromiter(
+                chain.from_iterable(rows), dtype=np.float64, count=6 * len(rows)
+            ).reshape(-1, 6)
+            self.build(
+                columns[:, 0].astype(np.int64),
+                columns[:, 1:4],
+                columns[:, 4:].astype(np.int64),
+            )
+            await self.versions.record(session, versions)
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Build the matrix if the application didn't at startup, or again if
+        another worker process wrote to the tracks
+        """
+        if not self.loaded or await self.versions.stale(session):
+            await self.load(session)
+
+    def put(self, id: int, vector: np.ndarray) -> None:
+        """Replace the vector of the track, adding a row if it's new"""
+        position = self._positions.get(id)
+        if position is None:
+            position = self.size
+            if position == len(self.vectors):
+                # grow by doubling so appending rows is amortised O(1)
+                capacity = max(2 * len(self.vectors), 16)
+                vectors = np.zeros((capacity, self.vectors.shape[1]), np.float32)
+                vectors[:position] = self.vectors[:position]
+                ids = np.zeros(capacity, dtype=np.int64)
+                ids[:position] = self.ids[:position]
+                self.vectors, self.ids = vectors, ids
+            self.ids[position] = id
+            self._positions[id] = position
+            self.size += 1
+        self.vectors[position] = vector
+        if self.partitions is not None:
+            self.partitions.put(position, vector)
+
+    def apply(self, event: WriteEvent) -> None:
+        """Apply the committed track changes of the event"""
+        if not self.loaded:
+            return
+        if not self.versions.follow(event.model_class, event.version):
+            # a write of another worker came in between
+            self.clear()
+            return
+        if not event.touches(*NUMERIC_FEATURES, *CATEGORY_FEATURES):
+            return
+        if event.bulk:
+            self.clear()
+            return
+        for row in event.rows:
+            values = [row[feature] for feature in NUMERIC_FEATURES]
+            numeric = np.array(
+                [[-1 if value is None else float(Decimal(value)) for value in values]]
+            )
+            categories = np.array(
+                [
+                    [
+                        -1 if row[feature] is None else row[feature]
+                        for feature in CATEGORY_FEATURES
+                    ]
+                ]
+            )
+            if any(
+                category >= 0 and category not in known
+                for category, known in zip(categories[0], self._categories)
+            ):
+                # a new genre or media type needs another column
+                self.clear()
+                return
+            self.put(row["id"], self.encode(numeric, categories)[0])
+        self.partition()
+
+    def similar(self, id: int, k: int) -> List[Tuple[int, float]]:
+        """Returns the k (track id, distance) nearest to the track, nearest first"""
+        position = self._positions.get(id)
+        if position is None:
+            return []
+        vector = self.vectors[position]
+        if self.partitions is None:
+            candidates = np.arange(self.size)
+        else:
+            candidates = self.partitions.candidates(vector)
+        candidates = candidates[candidates != position]
+        distances = ((self.vectors[candidates] - vector) ** 2).sum(axis=1)
+        if len(candidates) > k:
+            closest = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[closest], distances[closest]
+        ids = self.ids[candidates]
+        order = np.lexsort((ids, distances))
+        return list(
+            zip(ids[order].tolist(), np.sqrt(distances[order]).astype(float).tolist())
+        )
+
+    def clear(self) -> None:
+        """Forget the matrix, the next read builds it again"""
+        self.__init__()
+
+
+track_features = TrackFeatures()
+
+
+async def read_similar_tracks(
+    session: AsyncSession, id: int, k: int = 10
+) -> List[SimilarTrack]:
+    """Returns the k tracks with features nearest to those of the track"""
+    await track_features.ensure_loaded(session)
+    nearest_tracks = track_features.similar(id, k)
+    names = await lookup(
+        session,
+        lambda ids: select(Track.id, Track.name).where(Track.id.in_(ids)),
+        (other for other, _ in nearest_tracks),
+    )
+    # deleted tracks aren't removed from the matrix, the name lookup drops them
+    return [
+        SimilarTrack(id=other, name=names[other][0], distance=distance)
+        for other, distance in nearest_tracks
+        if other in names
+    ]
+
+
+@on_write(Track)
+async def update_track_features(session: AsyncSession, event: WriteEvent) -> None:
+    """Put the features of the written tracks in the matrix"""
+    track_features.apply(event)
@@ -0,0 +1,59 @@
+"""
+This module lets startup skip creating the tables when the models
+haven't changed. A fingerprint of the models' tables and indexes is
+kept in the database's user_version, and create_all, which reflects
+every table, only runs when the stored fingerprint differs.
+Tables dropped from the database behind the application's back aren't
+noticed, clearing user_version (PRAGMA user_version = 0) forces a check.
+"""
+
+import hashlib
+
+from sqlalchemy import MetaData
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+def schema_fingerprint(metadata: MetaData) -> int:
+    """
+    Returns a positive 31 bit hash of the tables, columns, foreign keys
+    and indexes, read from the metadata rather than compiled to DDL,
+    which would cost as much as the check it saves. It isn't cached, the
+    metadata can gain tables after it was first computed
+    """
+    parts = []
+    for table in metadata.sorted_tables:
+        parts.append(table.name)
+        for column in table.columns:
+            targets = sorted(key.target_fullname for key in column.foreign_keys)
+            parts.append(
+                repr(
+                    (
+                        column.name,
+                        repr(column.type),
+                        column.primary_key,
+                        column.nullable,
+                        targets,
+                    )
+                )
+            )
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            columns = [column.name for column in index.columns]
+            parts.append(repr((index.name, columns, index.unique)))
+    digest = hashlib.sha256("\n".join(parts).encode()).digest()
+    # user_version is a signed 32 bit integer, and 0 means never set
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF or 1
+
+
+async def ensure_schema(async_engine: AsyncEngine, metadata: MetaData) -> bool:
+    """
+    Create the missing tables of the metadata unless the database was
+    last checked against the same schema. Returns True if it was checked
+    """
+    fingerprint = schema_fingerprint(metadata)
+    async with async_engine.begin() as connection:
+        result = await connection.exec_driver_sql("PRAGMA user_version")
+        if result.scalar() == fingerprint:
+            return False
+        await connection.run_sync(metadata.create_all)
+        await connection.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+    return True
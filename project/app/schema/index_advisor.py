@@ -0,0 +1,285 @@
+"""
+This module contains the index advisor. It records the shape of every
+SELECT the engine executes: the columns of each table compared for
+equality, compared as a range and ordered by, with how often and how
+long statements of that shape ran. The advisor checks the shapes
+against the indexes in sqlite_master and the query plan SQLite chooses
+for a sample statement, and proposes a composite index for the shapes
+no index serves. Approved proposals are applied as migrations.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Column, Table, event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.sql.selectable import Select
+
+from app.models.schema import IndexAdvice, IndexProposal, QueryShapeRead
+
+EQUALITY_OPERATORS = {operators.eq, operators.in_op, operators.is_}
+RANGE_OPERATORS = {operators.lt, operators.le, operators.gt, operators.ge}
+
+# the number of distinct statements recorded, to bound the memory used
+MAX_STATEMENTS = 2000
+
+
+@dataclass
+class QueryShape:
+    """The columns of one table a statement filters and orders by, and its timings"""
+
+    table: str
+    equality: Tuple[str, ...]
+    ranges: Tuple[str, ...]
+    order_by: Tuple[str, ...]
+    count: int = 0
+    total_seconds: float = 0.0
+    # a statement and parameters of the shape to explain
+    sample: Optional[Tuple[str, Any]] = field(default=None, repr=False)
+
+
+def table_column(element) -> Optional[Column]:
+    """Returns the element if it's a column of a table, unwrapping DESC and the like"""
+    while element is not None and not isinstance(element, Column):
+        element = getattr(element, "element", None)
+    if element is not None and isinstance(element.table, Table):
+        return element
+    return None
+
+
+def statement_shapes(statement: Select) -> List[Tuple[str, Tuple, Tuple, Tuple]]:
+    """Returns the (table, equality, ranges, order by) column names of every table of the statement"""
+    columns: Dict[str, Tuple[Set[str], List[str], List[str]]] = {}
+
+    def table_columns(column: Column):
+        return columns.setdefault(column.table.name, (set(), [], []))
+
+    if statement.whereclause is not None:
+        for element in visitors.iterate(statement.whereclause):
+            if not isinstance(element, BinaryExpression):
+                continue
+            column = table_column(element.left)
+            if column is None:
+                continue
+            if element.operator in EQUALITY_OPERATORS:
+                table_columns(column)[0].add(column.name)
+            elif element.operator in RANGE_OPERATORS:
+                ranges = table_columns(column)[1]
+                if column.name not in ranges:
+                    ranges.append(column.name)
+    for clause in statement._order_by_clauses:
+        column = table_column(clause)
+        if column is not None:
+            table_columns(column)[2].append(column.name)
+    return [
+        (table, tuple(sorted(equality)), tuple(ranges), tuple(order_by))
+        for table, (equality, ranges, order_by) in columns.items()
+    ]
+
+
+class QueryShapes:
+    """The shapes of the statements executed, keyed by the statement's SQL"""
+
+    def __init__(self):
+        self._statements: Dict[str, List[QueryShape]] = {}
+        self._shapes: Dict[Tuple, QueryShape] = {}
+
+    def record(self, compiled, statement: str, parameters, seconds: float) -> None:
+        shapes = self._statements.get(statement)
+        if shapes is None:
+            if len(self._statements) >= MAX_STATEMENTS:
+                return
+            shapes = []
+            for key in statement_shapes(compiled.statement):
+                if not any(key[1:]):
+                    continue
+                shape = self._shapes.get(key)
+                if shape is None:
+                    shape = self._shapes[key] = QueryShape(*key)
+                shapes.append(shape)
+            self._statements[statement] = shapes
+        for shape in shapes:
+            shape.count += 1
+            shape.total_seconds += seconds
+            if shape.sample is None:
+                shape.sample = (statement, parameters)
+
+    def shapes(self) -> List[QueryShape]:
+        """Returns the shapes recorded, the most time consuming first"""
+        return sorted(self._shapes.values(), key=lambda shape: -shape.total_seconds)
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+query_shapes = QueryShapes()
+
+
+def start_timer(connection, cursor, statement, parameters, context, executemany):
+    context._query_shape_started = time.perf_counter()
+
+
+def record_shape(connection, cursor, statement, parameters, context, executemany):
+    compiled = context.compiled
+    if executemany or compiled is None or not isinstance(compiled.statement, Select):
+        return
+    seconds = time.perf_counter() - context._query_shape_started
+    query_shapes.record(compiled, statement, parameters, seconds)
+
+
+def record_query_shapes(async_engine: AsyncEngine) -> None:
+    """Record the shape and time of every SELECT the engine executes"""
+    sync_engine = async_engine.sync_engine
+    if not event.contains(sync_engine, "after_cursor_execute", record_shape):
+        event.listen(sync_engine, "before_cursor_execute", start_timer)
+        event.listen(sync_engine, "after_cursor_execute", record_shape)
+
+
+async def read_indexes(
+    session: AsyncSession,
+) -> Tuple[Dict[str, List[Tuple[str, ...]]], Dict[str, str]]:
+    """
+    Returns the columns of every index of every table, and the integer
+    primary key of the tables that have one. SQLite keeps the rows in
+    the order of that key, and every index ends with it implicitly
+    """
+    result = await session.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table'")
+    )
+    indexes: Dict[str, List[Tuple[str, ...]]] = {}
+    rowids: Dict[str, str] = {}
+    for (table,) in result.all():
+        table_info = await session.execute(text(f'PRAGMA table_info("{table}")'))
+        primary_key = [
+            (name, type) for _, name, type, _, _, pk in table_info.all() if pk
+        ]
+        indexes[table] = []
+        if len(primary_key) == 1 and primary_key[0][1].upper() == "INTEGER":
+            rowids[table] = primary_key[0][0]
+            indexes[table].append((primary_key[0][0],))
+        index_list = await session.execute(text(f'PRAGMA index_list("{table}")'))
+        for index in index_list.all():
+            index_info = await session.execute(text(f'PRAGMA index_info("{index[1]}")'))
+            indexes[table].append(
+                tuple(name for _, _, name in sorted(index_info.all()))
+            )
+    return indexes, rowids
+
+
+def proposed_columns(shape: QueryShape, rowid: Optional[str]) -> Tuple[str, ...]:
+    """
+    Returns the columns of the index serving the shape: the equality
+    columns, then the first range column, or the order by columns an
+    index can return the rows in
+    """
+    columns = list(shape.equality)
+    if shape.ranges:
+        columns.append(shape.ranges[0])
+    else:
+        columns += [column for column in shape.order_by if column not in columns]
+    # the rows of an index are in rowid order after its columns
+    while len(columns) > max(len(shape.equality), 1) and columns[-1] == rowid:
+        columns.pop()
+    return tuple(columns)
+
+
+def serves(index: Tuple[str, ...], columns: Tuple[str, ...], equality: int) -> bool:
+    """Returns whether the index leads with the equality columns, in any order, then the rest"""
+    if len(index) < len(columns):
+        return False
+    return set(index[:equality]) == set(columns[:equality]) and (
+        index[equality : len(columns)] == columns[equality:]
+    )
+
+
+async def explain(session: AsyncSession, shape: QueryShape) -> List[str]:
+    """Returns the query plan SQLite chooses for the sample statement of the shape"""
+    if shape.sample is None:
+        return []
+    statement, parameters = shape.sample
+    connection = await session.connection()
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [row[-1] for row in result.all()]
+
+
+def index_name(table: str, columns: Tuple[str, ...]) -> str:
+    return f"IX_{table}_{'_'.join(columns)}"
+
+
+async def advise(session: AsyncSession) -> IndexAdvice:
+    """
+    Returns the recorded shapes, whether an index serves them, and a
+    composite index for the tables the shapes not served are scanned in
+    """
+    indexes, rowids = await read_indexes(session)
+    shapes, proposals = [], {}
+    for shape in query_shapes.shapes():
+        table_indexes = indexes.get(shape.table, [])
+        columns = proposed_columns(shape, rowids.get(shape.table))
+        plan = await explain(session, shape)
+        # e.g. "SCAN invoices", or "SCAN TABLE invoices" before SQLite 3.36
+        scanned = any(
+            step.split()[0] == "SCAN"
+            and shape.table in step.split()
+            and "INDEX" not in step
+            for step in plan
+        )
+        indexed = not scanned or any(
+            serves(index, columns, len(shape.equality)) for index in table_indexes
+        )
+        shapes.append(
+            QueryShapeRead(
+                table=shape.table,
+                equality=list(shape.equality),
+                ranges=list(shape.ranges),
+                order_by=list(shape.order_by),
+                count=shape.count,
+                total_ms=shape.total_seconds * 1000,
+                plan=plan,
+                indexed=indexed,
+            )
+        )
+        if indexed:
+            continue
+        proposal = proposals.get((shape.table, columns))
+        if proposal is None:
+            name = index_name(shape.table, columns)
+            proposal = proposals[(shape.table, columns)] = IndexProposal(
+                table=shape.table,
+                name=name,
+                columns=list(columns),
+                statement=(
+                    f"CREATE INDEX IF NOT EXISTS {name} "
+                    f"ON {shape.table} ({', '.join(columns)})"
+                ),
+                count=0,
+                total_ms=0.0,
+            )
+        proposal.count += shape.count
+        proposal.total_ms += shape.total_seconds * 1000
+    # an index serves the shapes of the indexes its columns start with
+    merged = []
+    for (table, columns), proposal in sorted(
+        proposals.items(), key=lambda item: -len(item[0][1])
+    ):
+        wider = next(
+            (
+                other
+                for other in merged
+                if other.table == table
+                and tuple(other.columns[: len(columns)]) == columns
+            ),
+            None,
+        )
+        if wider is None:
+            merged.append(proposal)
+        else:
+            wider.count += proposal.count
+            wider.total_ms += proposal.total_ms
+    merged.sort(key=lambda proposal: -proposal.total_ms)
+    return IndexAdvice(shapes=shapes, proposals=merged)
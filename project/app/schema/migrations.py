@@ -0,0 +1,93 @@
+"""
+This module contains the versioned schema migrations applied before
+the application starts (app.prepare) and checked again by every
+worker at startup. The tables are created from the models, the migrations add
+what create_all leaves out of an existing database, such as the indexes
+approved from the index advisor's proposals. Every migration runs once
+per database, the versions applied are recorded in schema_migrations.
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.schema import MigrationRead
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+# append new migrations with the next version, never edit applied ones,
+# their statements must be idempotent (IF NOT EXISTS) as workers started
+# together on a database that wasn't prepared may both apply them
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(
+        1,
+        "index the invoices of a customer",
+        ("CREATE INDEX IF NOT EXISTS IFK_InvoiceCustomerId ON invoices (CustomerId)",),
+    ),
+)
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        Version INTEGER PRIMARY KEY,
+        Name TEXT NOT NULL,
+        AppliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+async def migrate(
+    session: AsyncSession, migrations: Tuple[Migration, ...] = MIGRATIONS
+) -> List[int]:
+    """
+    Apply the migrations not yet applied to the database, in version
+    order. Returns the versions applied, which the caller has to commit
+    """
+    await session.execute(text(CREATE_MIGRATIONS_TABLE))
+    applied = set(
+        (await session.scalars(text("SELECT Version FROM schema_migrations"))).all()
+    )
+    versions = []
+    for migration in sorted(migrations, key=lambda migration: migration.version):
+        if migration.version in applied:
+            continue
+        for statement in migration.statements:
+            await session.execute(text(statement))
+        await session.execute(
+            text(
+                "INSERT OR IGNORE INTO schema_migrations (Version, Name) "
+                "VALUES (:version, :name)"
+            ),
+            {"version": migration.version, "name": migration.name},
+        )
+        versions.append(migration.version)
+    return versions
+
+
+async def read_migrations(session: AsyncSession) -> List[MigrationRead]:
+    """
+    Returns the migrations applied to the database, none if they have
+    never been applied. Only reads, the table is created by migrate
+    """
+    exists = await session.scalar(
+        text(
+            "SELECT COUNT(*) FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'schema_migrations'"
+        )
+    )
+    if not exists:
+        return []
+    result = await session.execute(
+        text("SELECT Version, Name, AppliedAt FROM schema_migrations ORDER BY Version")
+    )
+    return [
+        MigrationRead(version=version, name=name, applied_at=applied_at)
+        for version, name, applied_at in result.all()
+    ]
@@ -0,0 +1,183 @@
+"""
+This module contains the prefix autocomplete of artist, album and track
+names. Each type has an in-memory index of its normalised names kept in
+a sorted array, so the names starting with a prefix are found by
+bisection and read off in order without touching the database. The
+indexes are built at startup and kept current by the write events of
+their tables. A read that finds another worker process wrote to the
+tables, from their data versions, builds them again.
+"""
+
+import asyncio
+import unicodedata
+from bisect import bisect_left
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.versions import TableVersions
+from app.events import WriteEvent, on_write
+from app.models.albums import Album
+from app.models.artists import Artist
+from app.models.search import AutocompleteResult, SearchType
+from app.models.tracks import Track
+
+# the table model class and name attribute of each type
+SOURCES = {
+    SearchType.ARTIST: (Artist, "name"),
+    SearchType.ALBUM: (Album, "title"),
+    SearchType.TRACK: (Track, "name"),
+}
+
+
+def normalize(name: str) -> str:
+    """Returns the name case folded and without accents, as it's matched"""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class PrefixIndex:
+    """
+    The names of one type as parallel arrays of (normalised name, id)
+    sorted by name then id, and the display name of every id
+    """
+
+    __slots__ = ("keys", "ids", "names")
+
+    def __init__(self, rows: List[Tuple[int, str]] = ()):
+        entries = sorted((normalize(name), id) for id, name in rows if name is not None)
+        self.keys: List[str] = [key for key, _ in entries]
+        self.ids: List[int] = [id for _, id in entries]
+        self.names: Dict[int, str] = {id: name for id, name in rows if name is not None}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def put(self, id: int, name: Optional[str]) -> None:
+        """Add the name of the id, replacing its previous name"""
+        self.remove(id)
+        if name is None:
+            return
+        key = normalize(name)
+        index = bisect_left(self.keys, key)
+        # keep equal names in id order
+        while (
+            index < len(self.keys) and self.keys[index] == key and self.ids[index] < id
+        ):
+            index += 1
+        self.keys.insert(index, key)
+        self.ids.insert(index, id)
+        self.names[id] = name
+
+    def remove(self, id: int) -> None:
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        key = normalize(name)
+        index = bisect_left(self.keys, key)
+        while self.ids[index] != id:
+            index += 1
+        del self.keys[index]
+        del self.ids[index]
+
+    def complete(
+        self, prefix: str, kind: SearchType
+    ) -> Iterator[Tuple[str, SearchType, int]]:
+        """Yields the (normalised name, kind, id) of the names starting with the prefix in order"""
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            yield self.keys[index], kind, self.ids[index]
+            index += 1
+
+
+class Autocomplete:
+    """The prefix indexes of every type"""
+
+    def __init__(self):
+        self.loaded = False
+        self._indexes: Dict[SearchType, PrefixIndex] = {}
+        self.versions = TableVersions(Artist, Album, Track)
+        self._lock = asyncio.Lock()
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)build every index from its table"""
+        async with self._lock:
+            versions = await self.versions.read(session)
+            indexes = {}
+            for kind, (model_class, attribute) in SOURCES.items():
+                result = await session.execute(
+                    select(model_class.id, getattr(model_class, attribute))
+                )
+                indexes[kind] = PrefixIndex(result.all())
+            await self.versions.record(session, versions)
+            self._indexes = indexes
+            self.loaded = True
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Build the indexes if the application didn't at startup, or again
+        if another worker process wrote to their tables
+        """
+        if not self.loaded or await self.versions.stale(session):
+            await self.load(session)
+
+    def complete(
+        self, prefix: str, kinds: List[SearchType], limit: int
+    ) -> List[AutocompleteResult]:
+        """Returns the first names of the types starting with the prefix, in name order"""
+        prefix = normalize(prefix)
+        matches = merge(*(self._indexes[kind].complete(prefix, kind) for kind in kinds))
+        return [
+            AutocompleteResult(type=kind, id=id, name=self._indexes[kind].names[id])
+            for _, kind, id in islice(matches, limit)
+        ]
+
+    def apply(self, event: WriteEvent) -> None:
+        """Apply the committed name changes of the event"""
+        if not self.loaded:
+            return
+        if not self.versions.follow(event.model_class, event.version):
+            # a write of another worker came in between
+            self.clear()
+            return
+        for kind, (model_class, attribute) in SOURCES.items():
+            if model_class is event.model_class and event.touches(attribute):
+                if event.bulk:
+                    self.clear()
+                    return
+                index = self._indexes[kind]
+                for row in event.rows:
+                    index.put(row["id"], row[attribute])
+
+    def sizes(self) -> Dict[str, int]:
+        """Returns the number of names in the index of every type"""
+        return {kind.value: len(index) for kind, index in self._indexes.items()}
+
+    def clear(self) -> None:
+        """Forget the indexes, the next read builds them again"""
+        self._indexes = {}
+        self.versions.clear()
+        self.loaded = False
+
+
+autocomplete = Autocomplete()
+
+
+async def complete(
+    session: AsyncSession,
+    prefix: str,
+    kinds: List[SearchType],
+    limit: int = 10,
+) -> List[AutocompleteResult]:
+    """Returns the first names of the types starting with the prefix"""
+    await autocomplete.ensure_loaded(session)
+    return autocomplete.complete(prefix, kinds, limit)
+
+
+@on_write(Artist, Album, Track)
+async def update_autocomplete(session: AsyncSession, event: WriteEvent) -> None:
+    """Put the new names of the written rows in their index"""
+    autocomplete.apply(event)
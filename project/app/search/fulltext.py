@@ -0,0 +1,182 @@
+"""
+This module contains the full text search over track names and
+composers, album titles and artist names. It uses one SQLite FTS5 table
+for all three, so matches of every kind are ranked together by bm25.
+The rowid of an index row encodes the kind and id of the row it was
+built from, which lets the triggers that keep the index in sync with
+the tables replace a row's entry without scanning the index.
+"""
+
+import asyncio
+import re
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.search import SearchResult, SearchType
+
+# rowid = id * KIND_STRIDE + kind code
+KIND_STRIDE = 4
+KIND_CODES = {SearchType.TRACK: 1, SearchType.ALBUM: 2, SearchType.ARTIST: 3}
+KINDS_BY_CODE = {code: kind for kind, code in KIND_CODES.items()}
+
+# the table, id, name and composer columns indexed for each kind
+SOURCES = {
+    SearchType.TRACK: ("tracks", "TrackId", "Name", "Composer"),
+    SearchType.ALBUM: ("albums", "AlbumId", "Title", "NULL"),
+    SearchType.ARTIST: ("artists", "ArtistId", "Name", "NULL"),
+}
+
+# matches in the name count for more than matches in the composer
+NAME_WEIGHT = 10.0
+COMPOSER_WEIGHT = 1.0
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+CREATE_INDEX = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        name, composer, tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+_ready = False
+_lock = asyncio.Lock()
+
+
+def index_row(kind: SearchType, row: str) -> Tuple[str, str, str]:
+    """Returns the rowid, name and composer expressions of a row of the kind"""
+    _, id_column, name_column, composer_column = SOURCES[kind]
+    composer = "NULL" if composer_column == "NULL" else f"{row}.{composer_column}"
+    return (
+        f"{row}.{id_column} * {KIND_STRIDE} + {KIND_CODES[kind]}",
+        f"{row}.{name_column}",
+        composer,
+    )
+
+
+def trigger_statements(kind: SearchType) -> List[str]:
+    """Returns the statements creating the triggers that sync the index with the table"""
+    table, id_column, name_column, composer_column = SOURCES[kind]
+    indexed = ", ".join(
+        column
+        for column in (id_column, name_column, composer_column)
+        if column != "NULL"
+    )
+    new_rowid, new_name, new_composer = index_row(kind, "new")
+    old_rowid, _, _ = index_row(kind, "old")
+    insert = (
+        "INSERT INTO search_index (rowid, name, composer) "
+        f"VALUES ({new_rowid}, {new_name}, {new_composer});"
+    )
+    delete = f"DELETE FROM search_index WHERE rowid = {old_rowid};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_insert "
+        f"AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_update "
+        f"AFTER UPDATE OF {indexed} ON {table} BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{table}_delete "
+        f"AFTER DELETE ON {table} BEGIN {delete} END",
+    ]
+
+
+async def ensure_search_index(session: AsyncSession) -> bool:
+    """
+    Create the search index and its triggers, and fill it from the
+    tables, the first time it's used with a database. Returns True if
+    anything was created, which the caller has to commit
+    """
+    global _ready
+    if _ready:
+        return False
+    async with _lock:
+        if _ready:
+            return False
+        exists = await session.scalar(
+            text(
+                "SELECT COUNT(*) FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'search_index'"
+            )
+        )
+        if not exists:
+            await session.execute(text(CREATE_INDEX))
+            for kind, (table, _, _, _) in SOURCES.items():
+                rowid, name, composer = index_row(kind, table)
+                await session.execute(
+                    text(
+                        "INSERT INTO search_index (rowid, name, composer) "
+                        f"SELECT {rowid}, {name}, {composer} FROM {table}"
+                    )
+                )
+        for kind in SOURCES:
+            for statement in trigger_statements(kind):
+                await session.execute(text(statement))
+        _ready = True
+        return True
+
+
+def reset_search_index() -> None:
+    """Forget the search index has been checked, e.g. for a new database"""
+    global _ready
+    _ready = False
+
+
+def build_match(q: str) -> str:
+    """
+    Returns the FTS5 query matching every word of q, the last one as a
+    prefix so results narrow as the user types. Words are quoted so FTS5
+    operators in q are searched for rather than interpreted
+    """
+    tokens = TOKEN_PATTERN.findall(q)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+async def search(
+    session: AsyncSession,
+    q: str,
+    types: Iterable[SearchType],
+    offset: int = 0,
+    limit: int = 10,
+) -> Tuple[List[SearchResult], int]:
+    """
+    Returns a page of the tracks, albums and artists matching q, most
+    relevant first, and the number of matches
+    """
+    match = build_match(q)
+    if not match:
+        return [], 0
+    if await ensure_search_index(session):
+        await session.commit()
+    codes = ", ".join(str(KIND_CODES[kind]) for kind in sorted(set(types)))
+    where = f"search_index MATCH :match AND rowid % {KIND_STRIDE} IN ({codes})"
+    result = await session.execute(
+        text(
+            f"""
+            SELECT rowid, name, composer,
+                bm25(search_index, {NAME_WEIGHT}, {COMPOSER_WEIGHT}) AS score
+            FROM search_index
+            WHERE {where}
+            ORDER BY score, rowid
+            LIMIT :limit OFFSET :offset
+            """
+        ),
+        {"match": match, "limit": limit, "offset": offset},
+    )
+    items = [
+        SearchResult(
+            type=KINDS_BY_CODE[rowid % KIND_STRIDE],
+            id=rowid // KIND_STRIDE,
+            name=name,
+            composer=composer,
+            score=score,
+        )
+        for rowid, name, composer, score in result.all()
+    ]
+    total_count = await session.scalar(
+        text(f"SELECT COUNT(*) FROM search_index WHERE {where}"), {"match": match}
+    )
+    return items, total_count
@@ -0,0 +1,103 @@
+"""
+Benchmark the also bought co-occurrences on synthetic invoices: the
+time to build the track and album matrices, their memory, and the
+latency of top K reads and of applying an invoice line write, e.g.
+
+    python -m benchmarks.bench_also_bought 100000
+"""
+
+import asyncio
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 200
+DEFAULT_INVOICES = 100_000
+MAX_BASKET = 15
+
+
+def add_synthetic_baskets(db_path, invoice_count: int) -> int:
+    """Add invoice lines of random baskets of tracks, returns the line count"""
+    rng = np.random.default_rng(42)
+    with sqlite3.connect(db_path) as connection:
+        track_count = connection.execute("SELECT MAX(TrackId) FROM tracks").fetchone()[
+            0
+        ]
+        first_invoice = (
+            connection.execute("SELECT MAX(InvoiceId) FROM invoices").fetchone()[0] + 1
+        )
+        sizes = rng.integers(1, MAX_BASKET + 1, invoice_count)
+        invoices = np.repeat(
+            np.arange(first_invoice, first_invoice + invoice_count), sizes
+        )
+        # popular tracks are bought more often
+        tracks = np.minimum(rng.zipf(1.3, len(invoices)), track_count)
+        connection.executemany(
+            "INSERT INTO invoice_items (InvoiceId, TrackId, UnitPrice, Quantity) "
+            "VALUES (?, ?, 0.99, 1)",
+            zip(invoices.tolist(), tracks.tolist()),
+        )
+        return connection.execute("SELECT COUNT(*) FROM invoice_items").fetchone()[0]
+
+
+async def main(invoice_count: int):
+    db_path = use_scratch_database()
+    line_count = add_synthetic_baskets(db_path, invoice_count)
+
+    import httpx
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+    from app.reports.also_bought import also_bought
+
+    silence_logging()
+
+    rows = []
+    async with AsyncSession(engine) as session:
+        start = time.perf_counter()
+        await also_bought.load(session)
+        rows.append(("load and build", {"ms": (time.perf_counter() - start) * 1000}))
+    start = time.perf_counter()
+    also_bought.rebuild()
+    rows.append(("rebuild from baskets", {"ms": (time.perf_counter() - start) * 1000}))
+    rows.append(
+        (
+            "matrix memory",
+            {
+                "track_MiB": also_bought.tracks.nbytes / 1024 / 1024,
+                "track_pairs": len(also_bought.tracks.indices),
+                "album_MiB": also_bought.albums.nbytes / 1024 / 1024,
+                "album_pairs": len(also_bought.albums.indices),
+            },
+        )
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for url in ("/api/v1/tracks/1/also_bought", "/api/v1/albums/1/also_bought"):
+            rows.append((url, await time_async(lambda: client.get(url), ITERATIONS)))
+        line = {"invoice_id": 1, "track_id": 3, "unit_price": "0.99", "quantity": 1}
+        timings = await time_async(
+            lambda: client.post("/api/v1/invoice_items/", json=line), ITERATIONS
+        )
+        rows.append(("create invoice line (matrices updated)", timings))
+        url = "/api/v1/tracks/1/also_bought"
+        rows.append(
+            (
+                f"{url} with overlay",
+                await time_async(lambda: client.get(url), ITERATIONS),
+            )
+        )
+    report(f"Also bought, {line_count:,} invoice lines", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INVOICES))
@@ -0,0 +1,94 @@
+"""
+Benchmark the autocomplete prefix index: the memory used per 100k
+names, the latency of completing a prefix directly and through the
+endpoint, and the cost of putting a changed name
+"""
+
+import asyncio
+import sqlite3
+import time
+import tracemalloc
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+NAME_COUNT = 100_000
+ITERATIONS = 1000
+PREFIXES = ["a", "love", "black sab", "zz"]
+
+
+def time_sync(func, iterations: int) -> float:
+    """Returns the mean time of the callable in microseconds"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+async def main():
+    db_path = use_scratch_database()
+    with sqlite3.connect(db_path) as connection:
+        track_names = [
+            name for (name,) in connection.execute("SELECT Name FROM tracks")
+        ]
+
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+    from app.models.search import SearchType
+    from app.search.autocomplete import PrefixIndex
+
+    silence_logging()
+
+    # real track names, made unique by a copy number
+    rows = [
+        (id, f"{track_names[id % len(track_names)]} {id // len(track_names)}")
+        for id in range(NAME_COUNT)
+    ]
+    tracemalloc.start()
+    index = PrefixIndex(rows)
+    index_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results = []
+    for prefix in PREFIXES:
+
+        def lookup():
+            return list(zip(range(10), index.complete(prefix, SearchType.TRACK)))
+
+        results.append(
+            (
+                f"direct complete '{prefix}' (us)",
+                {"mean": time_sync(lookup, ITERATIONS)},
+            )
+        )
+    next_id = NAME_COUNT
+
+    def put():
+        nonlocal next_id
+        index.put(next_id, "Some New Track")
+        next_id += 1
+
+    results.append(("put a name (us)", {"mean": time_sync(put, ITERATIONS)}))
+    report(
+        f"Autocomplete index of {NAME_COUNT:,} names: "
+        f"{index_bytes / 1024 / 1024:.1f} MiB",
+        results,
+    )
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            rows = []
+            for prefix in PREFIXES:
+                url = f"/api/v1/autocomplete?prefix={prefix}"
+                timings = await time_async(lambda: client.get(url), ITERATIONS // 10)
+                rows.append((f"endpoint prefix={prefix}", timings))
+            report(f"Autocomplete endpoint ({ITERATIONS // 10} iterations)", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
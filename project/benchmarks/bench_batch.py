@@ -0,0 +1,80 @@
+"""
+Benchmark the batch endpoint on the requests a customer screen is
+rendered from: the customer, their invoices, the items of each invoice
+and their support rep. The screen is fetched as separate requests one
+after the other, as separate concurrent requests, and as one batch,
+with the connections each checks out of the pool, e.g.
+
+    python -m benchmarks.bench_batch
+"""
+
+import asyncio
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 50
+CUSTOMER_ID = 1
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    checkouts = []
+    event.listen(engine.sync_engine, "checkout", lambda *args: checkouts.append(1))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+            customer = (await client.get(f"/api/v1/customers/{CUSTOMER_ID}")).json()[
+                "response"
+            ]
+            invoices = (
+                await client.get(f"/api/v1/customers/{CUSTOMER_ID}/invoices?limit=20")
+            ).json()["response"]
+            paths = [
+                f"/api/v1/customers/{CUSTOMER_ID}",
+                f"/api/v1/customers/{CUSTOMER_ID}/invoices?limit=20",
+                f"/api/v1/employees/{customer['support_rep_id']}",
+            ] + [
+                f"/api/v1/invoices/{invoice['id']}/invoice_items"
+                for invoice in invoices
+            ]
+
+            async def sequential():
+                for path in paths:
+                    await client.get(path)
+
+            async def concurrent():
+                await asyncio.gather(*(client.get(path) for path in paths))
+
+            batch = {"requests": [{"path": path} for path in paths]}
+
+            async def batched():
+                await client.post("/api/v1/batch", json=batch)
+
+            rows = []
+            for name, func in (
+                ("separate requests, sequential (before)", sequential),
+                ("separate requests, concurrent (before)", concurrent),
+                ("one batch", batched),
+            ):
+                timings = await time_async(func, ITERATIONS)
+                checkouts.clear()
+                await func()
+                rows.append((name, {**timings, "checkouts": len(checkouts)}))
+            report(f"Customer screen, {len(paths)} requests", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Benchmark the columnar collection format against the default row
+format, comparing the response size and latency of large pages
+"""
+
+import asyncio
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 100
+URLS = [
+    "/api/v1/tracks/?limit=1000",
+    "/api/v1/invoice_items/?limit=1000",
+    "/api/v1/invoices/?limit=400",
+]
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        rows = []
+        for url in URLS:
+            for format in ("json", "columnar"):
+                format_url = f"{url}&format={format}"
+                response = await client.get(format_url)
+                timings = await time_async(
+                    lambda: client.get(format_url), ITERATIONS, warmup=5
+                )
+                rows.append(
+                    (f"{url} {format}", {"bytes": len(response.content), **timings})
+                )
+        report(f"Collection formats ({ITERATIONS} iterations)", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
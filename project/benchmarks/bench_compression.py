@@ -0,0 +1,150 @@
+"""
+Benchmark the response compression: the size and CPU time of every
+encoding at every level for a page of tracks and a table export, a page
+served from the compressed cache against compressing it per request,
+and the bytes sent for pages and exports with and without compression, e.g.
+
+    python -m benchmarks.bench_compression
+"""
+
+import asyncio
+import time
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 100
+PAGE = "/api/v1/tracks/?limit=500"
+EXPORT = "/api/v1/tracks/export"
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+
+    from app.compression import (
+        ENCODINGS,
+        LEVELS,
+        CompressedCache,
+        Compressor,
+        compress,
+        compressed_cache,
+    )
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+            identity = {"Accept-Encoding": "identity"}
+            page = (await client.get(PAGE, headers=identity)).content
+            export = (await client.get(EXPORT, headers=identity)).content
+
+            rows = []
+            for name, body in (("page", page), ("export", export)):
+                for level, levels in LEVELS.items():
+                    for encoding in ENCODINGS:
+                        start = time.perf_counter()
+                        compressed = compress(body, encoding, levels[encoding])
+                        rows.append(
+                            (
+                                f"{name} {encoding} {level.value} ({levels[encoding]})",
+                                {
+                                    "ms": (time.perf_counter() - start) * 1000,
+                                    "KiB": len(compressed) / 1024,
+                                    "ratio": len(body) / len(compressed),
+                                },
+                            )
+                        )
+            report(
+                f"Encodings, page {len(page) / 1024:,.0f} KiB, "
+                f"export {len(export) / 1024:,.0f} KiB",
+                rows,
+            )
+
+            # the export as the middleware sends it, a flushed chunk per cursor chunk
+            rows = []
+            chunks = [
+                export[start : start + 64 * 1024]
+                for start in range(0, len(export), 64 * 1024)
+            ]
+            for encoding in ENCODINGS:
+                start = time.perf_counter()
+                compressor = Compressor(encoding, LEVELS["fast"][encoding])
+                size = sum(len(compressor.compress(chunk)) for chunk in chunks)
+                size += len(compressor.finish())
+                rows.append(
+                    (
+                        f"export streamed {encoding} fast",
+                        {
+                            "ms": (time.perf_counter() - start) * 1000,
+                            "KiB": size / 1024,
+                            "ratio": len(export) / size,
+                        },
+                    )
+                )
+            report("Streaming compression of the export in 64 KiB chunks", rows)
+
+            rows = []
+            for encoding in ENCODINGS:
+                level = LEVELS["default"][encoding]
+                rows.append(
+                    (
+                        f"compress page {encoding} per request (before)",
+                        await time_async(
+                            lambda: asyncio.to_thread(compress, page, encoding, level),
+                            ITERATIONS // 4,
+                            1,
+                        ),
+                    )
+                )
+                cache = CompressedCache()
+                cache.compress(page, encoding, level)
+
+                async def cached():
+                    cache.compress(page, encoding, level)
+
+                rows.append(
+                    (
+                        f"compress page {encoding} cache hit",
+                        await time_async(cached, ITERATIONS),
+                    )
+                )
+            report("Compressing a hot page", rows)
+
+            rows = []
+            for accept in ["identity"] + ENCODINGS:
+                headers = {"Accept-Encoding": accept}
+                for path in (PAGE, EXPORT):
+                    sent = []
+
+                    async def get():
+                        async with client.stream(
+                            "GET", path, headers=headers
+                        ) as response:
+                            sent.append(
+                                sum(
+                                    [len(chunk) async for chunk in response.aiter_raw()]
+                                )
+                            )
+
+                    timings = await time_async(
+                        get, ITERATIONS if path == PAGE else 5, 1
+                    )
+                    rows.append(
+                        (
+                            f"GET {path} {accept}",
+                            {**timings, "KiB_sent": sent[-1] / 1024},
+                        )
+                    )
+            report("Requests, bytes sent", rows)
+            print(f"\ncompressed cache: {compressed_cache.stats()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark the customer RFM report on a synthetic set of invoices: the
+time to load and aggregate the invoice columns, to score and segment
+every customer, to serve the cached report and to refresh it after an
+invoice write, e.g.
+
+    python -m benchmarks.bench_customer_rfm 1000000
+"""
+
+import asyncio
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 20
+DEFAULT_INVOICES = 1_000_000
+CUSTOMERS = 10_000
+
+
+def add_synthetic_invoices(db_path, invoice_count: int) -> int:
+    """Add random invoices of random customers, returns the invoice count"""
+    rng = np.random.default_rng(42)
+    customer_ids = rng.integers(1, CUSTOMERS + 1, invoice_count)
+    days = rng.integers(0, 5 * 365, invoice_count)
+    totals = rng.integers(99, 2500, invoice_count) / 100
+    with sqlite3.connect(db_path) as connection:
+        connection.executemany(
+            "INSERT INTO invoices (CustomerId, InvoiceDate, Total) "
+            "VALUES (?, datetime('2009-01-01', '+' || ? || ' days'), ?)",
+            zip(customer_ids.tolist(), days.tolist(), totals.tolist()),
+        )
+        return connection.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+
+async def main(invoice_count: int):
+    db_path = use_scratch_database()
+    total_invoices = add_synthetic_invoices(db_path, invoice_count)
+
+    import httpx
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+    from app.reports.customers import LOAD_QUERY, customer_rfm
+
+    silence_logging()
+
+    rows = []
+    async with AsyncSession(engine) as session:
+        start = time.perf_counter()
+        await customer_rfm.load(session)
+        rows.append(("load from SQLite", {"ms": (time.perf_counter() - start) * 1000}))
+        columns = [
+            np.array(column, dtype=np.int64)
+            for column in zip(*(await session.execute(LOAD_QUERY)).all())
+        ]
+    # the vectorised part, from the invoice columns to the segments
+    start = time.perf_counter()
+    customer_rfm.set_invoices(*columns)
+    customer_rfm.scored()
+    elapsed = (time.perf_counter() - start) * 1000
+    rows.append(("aggregate, score and segment", {"ms": elapsed}))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        url = "/api/v1/reports/customers/rfm?limit=100"
+        rows.append(
+            ("cached report", await time_async(lambda: client.get(url), ITERATIONS))
+        )
+        invoice = {
+            "invoice_date": "2014-01-01T00:00:00",
+            "total": "9.99",
+            "customer_id": 1,
+        }
+
+        async def write_and_read():
+            await client.post("/api/v1/invoices/", json=invoice)
+            await client.get(url)
+
+        rows.append(
+            (
+                "create invoice and read report",
+                await time_async(write_and_read, ITERATIONS),
+            )
+        )
+    report(
+        f"Customer RFM, {total_invoices:,} invoices of "
+        f"{len(customer_rfm.ids):,} customers",
+        rows,
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INVOICES))
@@ -0,0 +1,88 @@
+"""
+Benchmark the streamed bulk import with a generated invoice_items file
+(1M rows by default, pass a different row count as the first argument).
+It reports the throughput and the growth of the peak RSS of the process,
+which should stay flat no matter how large the upload is
+"""
+
+import asyncio
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import use_scratch_database, silence_logging, report
+
+ROWS = 1_000_000
+CHUNK_SIZE = 64 * 1024
+
+
+def generate_file(path: Path, rows: int) -> None:
+    """Write an NDJSON invoice_items file, with roughly 1% invalid rows"""
+    rng = random.Random(42)
+    with path.open("w") as output:
+        for index in range(rows):
+            invoice_id = rng.randint(1, 412) if index % 100 else 999_999
+            output.write(
+                f'{{"unit_price": "0.99", "quantity": {rng.randint(1, 5)}, '
+                f'"invoice_id": {invoice_id}, "track_id": {rng.randint(1, 3503)}}}\n'
+            )
+
+
+async def read_file(path: Path):
+    with path.open("rb") as upload:
+        while chunk := upload.read(CHUNK_SIZE):
+            yield chunk
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main(rows: int):
+    use_scratch_database()
+
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    path = Path(tempfile.mkdtemp(prefix="chinook_import_")) / "invoice_items.ndjson"
+    generate_file(path, rows)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/v1/invoice_items/import?format=ndjson&batch_size=5000",
+            content=read_file(path),
+        )
+        elapsed = time.perf_counter() - start
+        result = response.json()["response"]
+    report(
+        f"Bulk import of {rows:,} rows ({path.stat().st_size / 2**20:,.1f} MiB)",
+        [
+            (
+                "POST /api/v1/invoice_items/import",
+                {
+                    "seconds": elapsed,
+                    "rows_per_second": rows / elapsed,
+                    "accepted": result["accepted"],
+                    "rejected": result["rejected"],
+                    "peak_rss_growth_mb": peak_rss_mb() - rss_before,
+                },
+            )
+        ],
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS))
@@ -0,0 +1,78 @@
+"""
+Benchmark the routes the index advisor finds an index missing for. The
+scratch database has more invoices and no index on the invoices'
+CustomerId, as a database created from the models before they declared
+it would. The child routes run first without the migrations, then the
+advice is read, the database is prepared (app.prepare), which applies
+the migrations, and the routes run again, e.g.
+
+    python -m benchmarks.bench_index_advisor 500000
+"""
+
+import asyncio
+import sqlite3
+import sys
+
+from benchmarks.bench_customer_rfm import add_synthetic_invoices
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 100
+DEFAULT_INVOICES = 500_000
+
+ROUTES = (
+    "/api/v1/customers/7/invoices",
+    "/api/v1/artists/90/albums",
+    "/api/v1/albums/10/tracks",
+    "/api/v1/tracks/100/invoice_items",
+    "/api/v1/invoices/10/invoice_items",
+    "/api/v1/employees/3/customers",
+)
+
+
+async def time_routes(client, label: str):
+    rows = []
+    for url in ROUTES:
+        response = await client.get(url)
+        assert response.status_code == 200, url
+        rows.append(
+            (f"{label} {url}", await time_async(lambda: client.get(url), ITERATIONS))
+        )
+    return rows
+
+
+async def main(invoice_count: int):
+    db_path = use_scratch_database()
+    total_invoices = add_synthetic_invoices(db_path, invoice_count)
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("DROP INDEX IFK_InvoiceCustomerId")
+
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+    from app.prepare import prepare_database
+
+    silence_logging()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        rows = await time_routes(client, "before")
+        response = await client.get("/api/v1/schema/index_advice")
+        for proposal in response.json()["response"]["proposals"]:
+            print(
+                f"proposed: {proposal['statement']} "
+                f"({proposal['count']} statements, {proposal['total_ms']:,.0f} ms)"
+            )
+        await prepare_database()
+        rows += await time_routes(client, "after")
+        response = await client.get("/api/v1/schema/index_advice")
+        print(f"proposals after: {len(response.json()['response']['proposals'])}")
+
+    report(f"Child routes, {total_invoices:,} invoices", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INVOICES))
@@ -0,0 +1,83 @@
+"""
+Benchmark the invoice document against assembling it from the table
+routes, a request for the invoice, its customer, its lines and then the
+track, album and artist of every line, with the statements each runs:
+
+    python -m benchmarks.bench_invoice_document
+"""
+
+import asyncio
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 100
+INVOICE_ID = 1
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.cache.entities import clear_entity_caches
+    from app.database import engine
+    from app.main import app
+    from app.reports.invoice_documents import invoice_documents
+
+    silence_logging()
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(1),
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+
+            async def separate():
+                clear_entity_caches()
+                invoice = (await client.get(f"/api/v1/invoices/{INVOICE_ID}")).json()[
+                    "response"
+                ]
+                await client.get(f"/api/v1/customers/{invoice['customer_id']}")
+                lines = (
+                    await client.get(f"/api/v1/invoices/{INVOICE_ID}/invoice_items")
+                ).json()["response"]
+                for line in lines:
+                    track = (
+                        await client.get(f"/api/v1/tracks/{line['track_id']}")
+                    ).json()["response"]
+                    album = (
+                        await client.get(f"/api/v1/albums/{track['album_id']}")
+                    ).json()["response"]
+                    await client.get(f"/api/v1/artists/{album['artist_id']}")
+
+            async def cold():
+                invoice_documents.clear()
+                await client.get(f"/api/v1/invoices/{INVOICE_ID}/document")
+
+            async def cached():
+                await client.get(f"/api/v1/invoices/{INVOICE_ID}/document")
+
+            rows = []
+            for name, func in (
+                ("separate requests, entity caches cold (before)", separate),
+                ("document, not cached", cold),
+                ("document, cached", cached),
+            ):
+                timings = await time_async(func, ITERATIONS)
+                statements.clear()
+                await func()
+                rows.append((name, {**timings, "statements": len(statements)}))
+            report(f"Document of invoice {INVOICE_ID}", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
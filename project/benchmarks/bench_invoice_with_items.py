@@ -0,0 +1,80 @@
+"""
+Benchmark creating an invoice with its lines: the invoice and then
+every line posted on their own, each committed separately, against one
+request inserting them in a single transaction, with the commits each
+makes, e.g.
+
+    python -m benchmarks.bench_invoice_with_items 10
+"""
+
+import asyncio
+import sys
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 50
+DEFAULT_LINES = 10
+CUSTOMER_ID = 1
+
+
+async def main(line_count: int):
+    use_scratch_database()
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    commits = []
+    event.listen(engine.sync_engine, "commit", lambda *args: commits.append(1))
+
+    invoice = {
+        "invoice_date": "2024-01-01T00:00:00",
+        "billing_country": "USA",
+        "customer_id": CUSTOMER_ID,
+    }
+    items = [
+        {"track_id": track_id, "unit_price": "0.99", "quantity": 1}
+        for track_id in range(1, line_count + 1)
+    ]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+
+            async def separate():
+                created = await client.post(
+                    "/api/v1/invoices/", json={**invoice, "total": "9.90"}
+                )
+                invoice_id = created.json()["response"]["id"]
+                for item in items:
+                    await client.post(
+                        "/api/v1/invoice_items/",
+                        json={**item, "invoice_id": invoice_id},
+                    )
+
+            async def with_items():
+                await client.post(
+                    "/api/v1/invoices/with_items", json={**invoice, "items": items}
+                )
+
+            rows = []
+            for name, func in (
+                ("invoice then each line (before)", separate),
+                ("invoice with items", with_items),
+            ):
+                timings = await time_async(func, ITERATIONS)
+                commits.clear()
+                await func()
+                rows.append((name, {**timings, "commits": len(commits)}))
+            report(f"Create an invoice with {line_count} lines", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES))
@@ -0,0 +1,69 @@
+"""
+Benchmark the top N leaderboards against ranking the invoice lines with
+a full aggregation per request, on a scaled copy of the invoice lines, e.g.
+
+    python -m benchmarks.bench_leaderboards 100
+"""
+
+import asyncio
+import sys
+
+from benchmarks.bench_sales_rollup import DEFAULT_SCALE, scale_invoice_lines
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 50
+TOP_N = 50
+
+
+async def main(scale: int):
+    db_path = use_scratch_database()
+    line_count = scale_invoice_lines(db_path, scale)
+
+    import httpx
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    naive = text(
+        """
+        SELECT t.TrackId, t.Name, SUM(ii.Quantity) AS quantity
+        FROM invoice_items ii
+        JOIN invoices i ON i.InvoiceId = ii.InvoiceId
+        JOIN tracks t ON t.TrackId = ii.TrackId
+        WHERE strftime('%Y-%m', i.InvoiceDate) = '2013-06'
+        GROUP BY t.TrackId ORDER BY quantity DESC LIMIT :limit
+        """
+    )
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+            AsyncSession(engine) as session,
+        ):
+            rows = []
+            timings = await time_async(
+                lambda: session.execute(naive, {"limit": TOP_N}), ITERATIONS, warmup=2
+            )
+            rows.append((f"naive top {TOP_N} tracks of 2013-06", timings))
+            for kind in ("tracks", "albums", "artists"):
+                url = f"/api/v1/reports/top/{kind}?period=2013-06&limit={TOP_N}"
+                timings = await time_async(lambda: client.get(url), ITERATIONS)
+                rows.append((f"leaderboard top {TOP_N} {kind} of 2013-06", timings))
+            line = {"invoice_id": 1, "track_id": 1, "unit_price": "0.99", "quantity": 1}
+            timings = await time_async(
+                lambda: client.post("/api/v1/invoice_items/", json=line), ITERATIONS
+            )
+            rows.append(("create invoice line (leaderboards updated)", timings))
+            report(
+                f"Leaderboards, {line_count:,} invoice lines ({ITERATIONS} iterations)",
+                rows,
+            )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCALE))
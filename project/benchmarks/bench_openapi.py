@@ -0,0 +1,104 @@
+"""
+Benchmark the OpenAPI document: the time to generate and serialise it,
+the size of every encoding, and a request for it served from the
+precomputed bytes against building the response per request as
+FastAPI's own route does, e.g.
+
+    python -m benchmarks.bench_openapi
+"""
+
+import asyncio
+import json
+import time
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 200
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+    from fastapi.responses import JSONResponse
+
+    from app.compression import ENCODERS
+    from app.database import engine
+    from app.main import app
+    from app.openapi import OpenAPIDocument
+
+    silence_logging()
+
+    rows = []
+    start = time.perf_counter()
+    schema = app.openapi()
+    rows.append(("generate the schema", {"ms": (time.perf_counter() - start) * 1000}))
+    start = time.perf_counter()
+    document = OpenAPIDocument(schema)
+    rows.append(
+        ("serialise, compress and hash", {"ms": (time.perf_counter() - start) * 1000})
+    )
+    identity = len(document.bodies[None])
+    for encoding, body in document.bodies.items():
+        rows.append(
+            (
+                f"size {encoding or 'identity'}",
+                {"KiB": len(body) / 1024, "ratio": identity / len(body)},
+            )
+        )
+
+    # the per request work of FastAPI's route with the schema already built
+    def render():
+        return JSONResponse(schema).body
+
+    rows.append(
+        (
+            "per request: render (before)",
+            await time_async(lambda: asyncio.to_thread(render), ITERATIONS),
+        )
+    )
+    for encoding, encode in ENCODERS.items():
+        body = render()
+        rows.append(
+            (
+                f"per request: {encoding} the rendered body (before)",
+                await time_async(
+                    lambda: asyncio.to_thread(encode, body), ITERATIONS // 10, 1
+                ),
+            )
+        )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+            for accept in ("identity", "gzip", "br"):
+                headers = {"Accept-Encoding": accept}
+                rows.append(
+                    (
+                        f"GET /openapi.json {accept}",
+                        await time_async(
+                            lambda: client.get("/openapi.json", headers=headers),
+                            ITERATIONS,
+                        ),
+                    )
+                )
+            headers = {"If-None-Match": f'"{document.etag}"'}
+            rows.append(
+                (
+                    "GET /openapi.json If-None-Match (304)",
+                    await time_async(
+                        lambda: client.get("/openapi.json", headers=headers), ITERATIONS
+                    ),
+                )
+            )
+    report(
+        f"OpenAPI document, {len(json.loads(document.bodies[None])['paths'])} paths",
+        rows,
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
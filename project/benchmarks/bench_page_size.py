@@ -0,0 +1,137 @@
+"""
+Benchmark the memory of large pages on a catalogue of synthetic tracks.
+Every request runs in a fresh interpreter, which reports the growth of
+its peak resident set size (RSS) during the request: a page of the
+maximum size, the whole table streamed as an oversized page, and the
+whole table built in memory as every page was before. The script exits
+with an error when the streamed page is over its memory budget
+
+    python -m benchmarks.bench_page_size 200000
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.bench_similar_tracks import add_synthetic_tracks
+from benchmarks.common import use_scratch_database, report
+
+DEFAULT_TRACKS = 200_000
+
+# the growth of the peak RSS a streamed page may cause, in MiB
+BUDGET_MIB = 32
+
+REQUEST_SCRIPT = """
+import asyncio, json, resource, sys, time
+from app.main import app
+from app.database import engine
+from benchmarks.common import silence_logging
+
+
+def peak_mib():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def get(url):
+    # called straight through ASGI, the body is counted and dropped as it's
+    # sent (the httpx ASGI transport would hold the whole of it)
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    response = {"status": None, "size": 0}
+    requested = []
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # the client stays connected until the response is complete
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["size"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return response["status"], response["size"]
+
+
+async def main(url):
+    silence_logging()
+    # a small page first, so imports and first use caches aren't counted
+    await get("/api/v1/tracks/?limit=10")
+    try:
+        # reset the peak RSS to the current RSS
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+    before = peak_mib()
+    started = time.perf_counter()
+    status, size = await get(url)
+    seconds = time.perf_counter() - started
+    await engine.dispose()
+    print(json.dumps({
+        "status": status,
+        "ms": seconds * 1000,
+        "MiB_sent": size / 2**20,
+        "peak_growth_MiB": peak_mib() - before,
+    }))
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+def request(url: str, max_page_size: int) -> dict:
+    """Returns the time, size and peak RSS growth of a request in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", REQUEST_SCRIPT, url],
+        cwd=Path(__file__).parent.parent,
+        env={**os.environ, "CHINOOK_MAX_PAGE_SIZE": str(max_page_size)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(track_count: int) -> int:
+    db_path = use_scratch_database()
+    track_count = add_synthetic_tracks(db_path, track_count)
+
+    from app.endpoints.pagination import MAX_PAGE_SIZE
+
+    everything = f"/api/v1/tracks/?limit={track_count}"
+    rows = [
+        (
+            f"limit={MAX_PAGE_SIZE}, built",
+            request(f"/api/v1/tracks/?limit={MAX_PAGE_SIZE}", MAX_PAGE_SIZE),
+        ),
+        (f"limit={track_count}, streamed", request(everything, MAX_PAGE_SIZE)),
+        (f"limit={track_count}, built (before)", request(everything, track_count)),
+    ]
+    report(f"Peak RSS growth of a page of tracks, {track_count} tracks", rows)
+    streamed = rows[1][1]["peak_growth_MiB"]
+    if streamed > BUDGET_MIB:
+        print(f"\nstreamed page over budget: {streamed:,.1f} > {BUDGET_MIB} MiB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRACKS))
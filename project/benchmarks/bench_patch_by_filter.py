@@ -0,0 +1,96 @@
+"""
+Benchmark repricing every track of a genre: the tracks read from the
+genre's track pages and patched one request at a time, against one
+patch by filter, with the statements each runs, e.g.
+
+    python -m benchmarks.bench_patch_by_filter 1
+"""
+
+import asyncio
+import sys
+import time
+
+from benchmarks.common import use_scratch_database, silence_logging, report
+
+DEFAULT_GENRE = 1
+PAGE_SIZE = 500
+MAX_ROWS = 10_000
+
+
+async def main(genre_id: int):
+    use_scratch_database()
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(1),
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+
+            async def one_at_a_time(price: str) -> int:
+                tracks, offset = [], 0
+                while True:
+                    page = (
+                        await client.get(
+                            f"/api/v1/genres/{genre_id}/tracks"
+                            f"?offset={offset}&limit={PAGE_SIZE}"
+                        )
+                    ).json()["response"]
+                    tracks += page
+                    offset += PAGE_SIZE
+                    if len(page) < PAGE_SIZE:
+                        break
+                for track in tracks:
+                    # the Patch models take every field
+                    body = {key: value for key, value in track.items() if key != "id"}
+                    await client.patch(
+                        f"/api/v1/tracks/{track['id']}",
+                        json={**body, "unit_price": price},
+                    )
+                return len(tracks)
+
+            async def by_filter(price: str) -> int:
+                response = await client.patch(
+                    f"/api/v1/tracks/?genre_id={genre_id}&max_rows={MAX_ROWS}",
+                    json={"unit_price": price},
+                )
+                return response.json()["response"]["updated"]
+
+            rows = []
+            for name, func, price in (
+                ("read pages, patch each track (before)", one_at_a_time, "1.29"),
+                ("patch by filter", by_filter, "1.49"),
+            ):
+                statements.clear()
+                start = time.perf_counter()
+                updated = await func(price)
+                rows.append(
+                    (
+                        name,
+                        {
+                            "ms": (time.perf_counter() - start) * 1000,
+                            "tracks": updated,
+                            "statements": len(statements),
+                        },
+                    )
+                )
+            report(f"Reprice the tracks of genre {genre_id}", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_GENRE))
@@ -0,0 +1,61 @@
+"""
+Benchmark curating a large playlist: the tracks added one request at a
+time against one request adding them all, and removing them all, e.g.
+
+    python -m benchmarks.bench_playlist_tracks 3000
+"""
+
+import asyncio
+import sys
+import time
+
+from benchmarks.common import use_scratch_database, silence_logging, report
+
+DEFAULT_TRACKS = 3000
+
+
+async def main(track_count: int):
+    use_scratch_database()
+
+    import httpx
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    track_ids = list(range(1, track_count + 1))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async with app.router.lifespan_context(app):
+            created = await client.post("/api/v1/playlists/", json={"name": "Bench"})
+            url = f"/api/v1/playlists/{created.json()['response']['id']}/tracks"
+
+            async def one_at_a_time():
+                for track_id in track_ids:
+                    await client.post(url, json={"track_ids": [track_id]})
+
+            async def add_all():
+                await client.post(url, json={"track_ids": track_ids})
+
+            async def remove_all():
+                await client.request("DELETE", url, json={"track_ids": track_ids})
+
+            rows = []
+            for name, func in (
+                ("add one track per request (before)", one_at_a_time),
+                ("remove all in one request", remove_all),
+                ("add all in one request", add_all),
+                ("add all again, nothing changes", add_all),
+            ):
+                start = time.perf_counter()
+                await func()
+                rows.append((name, {"ms": (time.perf_counter() - start) * 1000}))
+            report(f"Playlist of {len(track_ids)} tracks", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRACKS))
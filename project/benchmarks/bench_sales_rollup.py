@@ -0,0 +1,96 @@
+"""
+Benchmark the sales rollups against aggregating the invoice lines with
+the naive join on every request. The invoice lines of the scratch
+database are first duplicated to give the join some work, e.g.
+
+    python -m benchmarks.bench_sales_rollup 100
+"""
+
+import asyncio
+import sqlite3
+import sys
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 50
+DEFAULT_SCALE = 50
+
+
+def scale_invoice_lines(db_path, scale: int) -> int:
+    """Duplicate every invoice line scale - 1 times, returns the line count"""
+    with sqlite3.connect(db_path) as connection:
+        for _ in range(scale - 1):
+            connection.execute(
+                "INSERT INTO invoice_items (InvoiceId, TrackId, UnitPrice, Quantity) "
+                "SELECT InvoiceId, TrackId, UnitPrice, Quantity FROM invoice_items "
+                "WHERE InvoiceLineId <= 2240"
+            )
+        return connection.execute("SELECT COUNT(*) FROM invoice_items").fetchone()[0]
+
+
+async def main(scale: int):
+    db_path = use_scratch_database()
+    line_count = scale_invoice_lines(db_path, scale)
+
+    import httpx
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+    from app.models.reports import SalesGroupBy
+    from app.reports.sales import DIMENSION_QUERIES, LINE_CENTS, NAME_JOINS
+
+    silence_logging()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+            AsyncSession(engine) as session,
+        ):
+            rows = []
+            for group_by in SalesGroupBy:
+                name = "n.Name" if group_by in NAME_JOINS else "r.Key"
+                naive = text(
+                    f"""
+                    SELECT r.Key, {name}, r.RevenueCents FROM (
+                        SELECT key AS Key, SUM({LINE_CENTS}) AS RevenueCents
+                        FROM ({DIMENSION_QUERIES[group_by]}) ii GROUP BY key
+                    ) r {NAME_JOINS.get(group_by, "")}
+                    ORDER BY r.RevenueCents DESC LIMIT 10
+                    """
+                )
+                timings = await time_async(
+                    lambda: session.execute(naive), ITERATIONS, warmup=2
+                )
+                rows.append((f"naive join group_by={group_by.value}", timings))
+                url = f"/api/v1/reports/sales?group_by={group_by.value}"
+                timings = await time_async(
+                    lambda: client.get(url), ITERATIONS, warmup=2
+                )
+                rows.append((f"rollup endpoint group_by={group_by.value}", timings))
+
+            line = {"invoice_id": 1, "track_id": 1, "unit_price": "0.99", "quantity": 1}
+            timings = await time_async(
+                lambda: client.post("/api/v1/invoice_items/", json=line),
+                ITERATIONS,
+                warmup=2,
+            )
+            rows.append(("create invoice line (rollups updated)", timings))
+            check = await client.get("/api/v1/reports/sales/check")
+            consistent = check.json()["response"]["consistent"]
+            timings = await time_async(
+                lambda: client.get("/api/v1/reports/sales/check"), 5, warmup=0
+            )
+            rows.append(("consistency check (full recompute)", timings))
+            report(
+                f"Sales rollups, {line_count:,} invoice lines "
+                f"({ITERATIONS} iterations, consistent={consistent})",
+                rows,
+            )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCALE))
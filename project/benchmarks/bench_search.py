@@ -0,0 +1,108 @@
+"""
+Benchmark the FTS5 search against a LIKE '%q%' scan of the same
+columns, on a copy of the tracks, albums and artists duplicated to give
+the scan some work, e.g.
+
+    python -m benchmarks.bench_search 50
+"""
+
+import asyncio
+import sqlite3
+import sys
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 50
+DEFAULT_SCALE = 30
+QUERIES = ["love", "black sabbath", "beethoven", "zzz"]
+
+# like the endpoint, the baseline returns a page and the number of matches
+LIKE_MATCHES = """
+        SELECT 'track' AS type, TrackId AS id, Name FROM tracks
+        WHERE Name LIKE :pattern OR Composer LIKE :pattern
+        UNION ALL
+        SELECT 'album', AlbumId, Title FROM albums WHERE Title LIKE :pattern
+        UNION ALL
+        SELECT 'artist', ArtistId, Name FROM artists WHERE Name LIKE :pattern
+"""
+LIKE_PAGE = f"SELECT * FROM ({LIKE_MATCHES}) LIMIT 10"
+LIKE_COUNT = f"SELECT COUNT(*) FROM ({LIKE_MATCHES})"
+
+
+def scale_names(db_path, scale: int) -> int:
+    """Duplicate the tracks, albums and artists scale - 1 times, returns the row count"""
+    with sqlite3.connect(db_path) as connection:
+        counts = {
+            table: connection.execute(f"SELECT MAX({id}) FROM {table}").fetchone()[0]
+            for table, id in (
+                ("tracks", "TrackId"),
+                ("albums", "AlbumId"),
+                ("artists", "ArtistId"),
+            )
+        }
+        for copy in range(1, scale):
+            connection.execute(
+                "INSERT INTO artists (Name) SELECT Name || ' ' || ? FROM artists "
+                "WHERE ArtistId <= ?",
+                (copy, counts["artists"]),
+            )
+            connection.execute(
+                "INSERT INTO albums (Title, ArtistId) SELECT Title || ' ' || ?, "
+                "ArtistId FROM albums WHERE AlbumId <= ?",
+                (copy, counts["albums"]),
+            )
+            connection.execute(
+                "INSERT INTO tracks (Name, AlbumId, MediaTypeId, GenreId, Composer, "
+                "Milliseconds, Bytes, UnitPrice) SELECT Name || ' ' || ?, AlbumId, "
+                "MediaTypeId, GenreId, Composer, Milliseconds, Bytes, UnitPrice "
+                "FROM tracks WHERE TrackId <= ?",
+                (copy, counts["tracks"]),
+            )
+        return sum(
+            connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in counts
+        )
+
+
+async def main(scale: int):
+    db_path = use_scratch_database()
+    row_count = scale_names(db_path, scale)
+
+    import httpx
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+
+    silence_logging()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+            AsyncSession(engine) as session,
+        ):
+            rows = []
+            for q in QUERIES:
+                pattern = f"%{q}%"
+
+                async def like_search():
+                    await session.execute(text(LIKE_PAGE), {"pattern": pattern})
+                    await session.scalar(text(LIKE_COUNT), {"pattern": pattern})
+
+                timings = await time_async(like_search, ITERATIONS, warmup=2)
+                rows.append((f"LIKE '%{q}%'", timings))
+                url = f"/api/v1/search?q={q}"
+                timings = await time_async(lambda: client.get(url), ITERATIONS)
+                rows.append((f"search q={q}", timings))
+            report(
+                f"Search, {row_count:,} tracks, albums and artists "
+                f"({ITERATIONS} iterations)",
+                rows,
+            )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SCALE))
@@ -0,0 +1,84 @@
+"""
+Benchmark the database session setup overhead per request. It compares
+the previous get_db (an asynccontextmanager entered by every endpoint)
+with the request scoped get_db dependency, both on their own and
+through a full request to a light weight endpoint
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 2000
+
+
+async def main():
+    use_scratch_database()
+
+    import httpx
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from starlette.requests import Request
+
+    from app.database import engine, get_db
+    from app.main import app
+
+    silence_logging()
+
+    @asynccontextmanager
+    async def legacy_get_db():
+        async with AsyncSession(engine) as session:
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    async def legacy_session():
+        async with legacy_get_db() as session:
+            await session.execute(text("SELECT 1"))
+
+    async def request_scoped_session():
+        request = Request({"type": "http", "headers": [], "state": {}})
+        dependency = get_db(request)
+        session = await dependency.__anext__()
+        await session.execute(text("SELECT 1"))
+        await dependency.aclose()
+
+    async def unused_request_scoped_session():
+        request = Request({"type": "http", "headers": [], "state": {}})
+        dependency = get_db(request)
+        await dependency.__anext__()
+        await dependency.aclose()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def full_request():
+            await client.get("/api/v1/genres/1")
+
+        report(
+            f"Session setup overhead ({ITERATIONS} iterations)",
+            [
+                (
+                    "legacy get_db + SELECT 1",
+                    await time_async(legacy_session, ITERATIONS),
+                ),
+                (
+                    "request scoped get_db + SELECT 1",
+                    await time_async(request_scoped_session, ITERATIONS),
+                ),
+                (
+                    "request scoped get_db, no statement",
+                    await time_async(unused_request_scoped_session, ITERATIONS),
+                ),
+                ("GET /api/v1/genres/1", await time_async(full_request, ITERATIONS)),
+            ],
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Benchmark the similar tracks on a catalogue of synthetic tracks: the
+time to build the feature matrix and partitioned index, the latency of
+a query scanning every row against one probing the nearest clusters,
+how many of the exact nearest tracks the partitioned query finds, and
+the endpoint against downloading the catalogue to compare client side
+
+    python -m benchmarks.bench_similar_tracks 200000
+"""
+
+import asyncio
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import use_scratch_database, silence_logging, time_async, report
+
+ITERATIONS = 200
+DEFAULT_TRACKS = 200_000
+K = 10
+
+
+def add_synthetic_tracks(db_path, count: int) -> int:
+    """Add copies of the tracks with their length, size and price varied, returns the track count"""
+    with sqlite3.connect(db_path) as connection:
+        original = connection.execute("SELECT MAX(TrackId) FROM tracks").fetchone()[0]
+        while connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0] < count:
+            # each copy varies by up to +-50% from its original
+            connection.execute(
+                "INSERT INTO tracks (Name, AlbumId, MediaTypeId, GenreId, Milliseconds, "
+                "Bytes, UnitPrice) SELECT Name, AlbumId, MediaTypeId, GenreId, "
+                "CAST(Milliseconds * (0.5 + ABS(RANDOM() % 1000) / 1000.0) AS INTEGER), "
+                "CAST(Bytes * (0.5 + ABS(RANDOM() % 1000) / 1000.0) AS INTEGER), "
+                "UnitPrice + ABS(RANDOM() % 3) FROM tracks WHERE TrackId <= ?",
+                (original,),
+            )
+        return connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+
+async def main(track_count: int):
+    db_path = use_scratch_database()
+    track_count = add_synthetic_tracks(db_path, track_count)
+
+    import httpx
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import engine
+    from app.main import app
+    from app.reports.similar import track_features
+
+    silence_logging()
+
+    rows = []
+    async with AsyncSession(engine) as session:
+        start = time.perf_counter()
+        await track_features.load(session)
+        rows.append(
+            ("load, build and partition", {"ms": (time.perf_counter() - start) * 1000})
+        )
+    partitions = track_features.partitions
+    rows.append(
+        (
+            "matrix",
+            {
+                "rows": track_features.size,
+                "features": track_features.vectors.shape[1],
+                "MiB": track_features.vectors.nbytes / 1024 / 1024,
+                "clusters": len(partitions.members) if partitions else 0,
+            },
+        )
+    )
+
+    rng = np.random.default_rng(7)
+    ids = rng.choice(track_features.ids[: track_features.size], ITERATIONS).tolist()
+    partitioned, exact = [], []
+    start = time.perf_counter()
+    for id in ids:
+        partitioned.append({other for other, _ in track_features.similar(id, K)})
+    rows.append(
+        (
+            "partitioned query",
+            {"mean_ms": (time.perf_counter() - start) * 1000 / len(ids)},
+        )
+    )
+    track_features.partitions = None
+    start = time.perf_counter()
+    for id in ids:
+        exact.append({other for other, _ in track_features.similar(id, K)})
+    rows.append(
+        (
+            "exact query over every row",
+            {"mean_ms": (time.perf_counter() - start) * 1000 / len(ids)},
+        )
+    )
+    track_features.partitions = partitions
+    recall = np.mean([len(a & b) / len(b) for a, b in zip(partitioned, exact)])
+    rows.append((f"partitioned recall@{K}", {"recall": recall}))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        url = "/api/v1/tracks/1/similar"
+        rows.append((url, await time_async(lambda: client.get(url), ITERATIONS)))
+        track = {
+            "name": "New Track",
+            "milliseconds": 200_000,
+            "unit_price": "0.99",
+            "bytes": 6_000_000,
+            "media_type_id": 1,
+            "album_id": 1,
+            "genre_id": 1,
+        }
+        timings = await time_async(
+            lambda: client.post("/api/v1/tracks/", json=track), ITERATIONS
+        )
+        rows.append(("create track (matrix updated)", timings))
+        start = time.perf_counter()
+        response = await client.get(f"/api/v1/tracks/?offset=0&limit={track_count}")
+        rows.append(
+            (
+                "client side: download the catalogue",
+                {
+                    "ms": (time.perf_counter() - start) * 1000,
+                    "MiB": len(response.content) / 1024 / 1024,
+                },
+            )
+        )
+    report(f"Similar tracks, {track_count:,} tracks", rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TRACKS))
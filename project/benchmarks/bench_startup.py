@@ -0,0 +1,114 @@
+"""
+Benchmark the cold start of the application in fresh interpreters: the
+import of app.main (which builds the application), building it again,
+initialising and preparing the database, and the whole lifespan. The
+first boot of a scratch database creates its tables and summaries, the
+later boots are the ones autoscaling and the --reload dev loop pay for. The script
+exits with an error when a median later boot step is over its budget
+
+    python -m benchmarks.bench_startup
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.common import use_scratch_database, report
+
+BOOTS = 7
+
+# the regression budget of every step of a later boot, in milliseconds
+BUDGET_MS = {
+    "import app.main": 2500,
+    "app_factory": 500,
+    "include_router (before)": 1000,
+    "init_db": 10,
+    "create_all (before)": 50,
+    "prepare_database": 100,
+    "lifespan": 1500,
+}
+
+BOOT_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import app.main
+timings = {"import app.main": time.perf_counter() - started}
+
+from fastapi import FastAPI
+from sqlmodel import SQLModel
+from app.database import engine, init_db
+from app.endpoints.routes import build_routes
+from app.prepare import prepare_database
+
+started = time.perf_counter()
+app.main.app_factory()
+timings["app_factory"] = time.perf_counter() - started
+
+# the routes as they were built before, included into the application
+started = time.perf_counter()
+fastapi_app = FastAPI()
+for route_config in app.main.get_routes_config():
+    fastapi_app.include_router(build_routes(**route_config), prefix="/api/v1")
+timings["include_router (before)"] = time.perf_counter() - started
+
+
+async def boot():
+    # open the first connection outside the timings
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("SELECT 1")
+    started = time.perf_counter()
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+    timings["create_all (before)"] = time.perf_counter() - started
+    started = time.perf_counter()
+    await init_db()
+    timings["init_db"] = time.perf_counter() - started
+    started = time.perf_counter()
+    await prepare_database()
+    timings["prepare_database"] = time.perf_counter() - started
+    started = time.perf_counter()
+    async with app.main.app.router.lifespan_context(app.main.app):
+        timings["lifespan"] = time.perf_counter() - started
+    await engine.dispose()
+
+asyncio.run(boot())
+print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+"""
+
+
+def boot() -> dict:
+    """Returns the step timings of a boot in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", BOOT_SCRIPT],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    use_scratch_database()
+    first = boot()
+    later = [boot() for _ in range(BOOTS)]
+    medians = {name: statistics.median(boot[name] for boot in later) for name in first}
+    rows = [
+        (
+            name,
+            {"first_ms": first[name], "median_ms": medians[name], "budget_ms": budget},
+        )
+        for name, budget in BUDGET_MS.items()
+    ]
+    report(f"Startup, first boot and median of {BOOTS} later boots", rows)
+    over = [name for name, budget in BUDGET_MS.items() if medians[name] > budget]
+    if over:
+        print(f"\nover budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Helpers shared by the benchmarks. The benchmarks run against a scratch
+copy of the original chinook database so they never modify db/active.
+Run them from the project directory, for example:
+
+    python -m benchmarks.bench_session_overhead
+"""
+
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+ORIGINAL_DB_PATH = (
+    Path(__file__).parent.parent / "app" / "db" / "original" / "chinook.db"
+)
+
+
+def use_scratch_database() -> Path:
+    """
+    Copy the original database to a temporary directory and point the
+    application at it. This has to run before the app package is imported
+
+    :returns: Path of the scratch database
+    """
+    scratch_dir = Path(tempfile.mkdtemp(prefix="chinook_bench_"))
+    db_path = scratch_dir / "chinook.db"
+    shutil.copyfile(ORIGINAL_DB_PATH, db_path)
+    os.environ["CHINOOK_DB_PATH"] = str(db_path)
+    return db_path
+
+
+def silence_logging() -> None:
+    """Stop the per-request log lines of the application drowning the results"""
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def time_async(
+    func: Callable[[], Awaitable], iterations: int, warmup: int = 10
+) -> Dict[str, float]:
+    """
+    Time an async callable over a number of iterations
+
+    :returns: Dict of mean, median and p95 timings in milliseconds
+    """
+    for _ in range(warmup):
+        await func()
+    timings: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.fmean(timings),
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def report(title: str, rows: List[Tuple[str, Dict[str, float]]]) -> None:
+    """Print a simple table of benchmark results"""
+    print(f"\n{title}")
+    print("-" * len(title))
+    for name, values in rows:
+        formatted = "  ".join(f"{key}={value:,.3f}" for key, value in values.items())
+        print(f"{name:<50} {formatted}")
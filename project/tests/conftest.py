@@ -1,11 +1,178 @@
-import os
 import sys
+from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 # Add the project directory to Python path
 project_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(project_dir))
 
+from app.cache.entities import clear_entity_caches  # noqa: E402
+from app.cache.reference import clear_reference_tables  # noqa: E402
+from app.cache.foreign_keys import clear_id_sets  # noqa: E402
+from app.reports.sales import ensure_sales_rollups, reset_sales_rollups  # noqa: E402
+from app.reports.leaderboards import leaderboards  # noqa: E402
+from app.search.fulltext import reset_search_index  # noqa: E402
+from app.search.autocomplete import autocomplete  # noqa: E402
+from app.reports.customers import customer_rfm  # noqa: E402
+from app.reports.also_bought import also_bought  # noqa: E402
+from app.reports.similar import track_features  # noqa: E402
+from app.schema.index_advisor import query_shapes  # noqa: E402
+from app.compression import compressed_cache  # noqa: E402
+from app.reports.invoice_documents import invoice_documents  # noqa: E402
+from app.main import app  # noqa: E402
+from app.database import get_db  # noqa: E402
+from app.models.albums import Album  # noqa: E402
+from app.models.artists import Artist  # noqa: E402
+from app.models.customers import Customer  # noqa: E402
+from app.models.genres import Genre  # noqa: E402
+from app.models.invoice_items import InvoiceItem  # noqa: E402
+from app.models.invoices import Invoice  # noqa: E402
+from app.models.media_types import MediaType  # noqa: E402
+from app.models.tracks import Track  # noqa: E402
+
 pytest_plugins = [
     "pytest_asyncio",
-] 
\ No newline at end of file
+]
+
+# Test database URL
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+# Create async engine for tests
+engine = create_async_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+# Create test session
+TestingSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Every test gets a fresh database, so it needs empty in-memory caches too"""
+    clear_entity_caches()
+    clear_reference_tables()
+    clear_id_sets()
+    reset_sales_rollups()
+    leaderboards.clear()
+    reset_search_index()
+    autocomplete.clear()
+    customer_rfm.clear()
+    also_bought.clear()
+    track_features.clear()
+    query_shapes.clear()
+    compressed_cache.clear()
+    invoice_documents.clear()
+    yield
+
+
+@pytest_asyncio.fixture(scope="function")
+async def async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Create a fresh database session for each test."""
+    async with engine.begin() as conn:
+        # Create all tables
+        await conn.run_sync(Album.metadata.create_all)
+        await conn.run_sync(Artist.metadata.create_all)
+
+    async with TestingSessionLocal() as session:
+        yield session
+        # Clean up after test
+        async with engine.begin() as conn:
+            await conn.run_sync(Album.metadata.drop_all)
+            await conn.run_sync(Artist.metadata.drop_all)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def async_client(
+    async_session: AsyncSession,
+) -> AsyncGenerator[AsyncClient, None]:
+    """Create an async client with the test database session."""
+
+    async def override_get_db():
+        try:
+            yield async_session
+        finally:
+            await async_session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def test_artist_fixture(async_session: AsyncSession) -> Artist:
+    """Create a test artist in the database."""
+    artist = Artist(id=1, name="Test Artist")
+    async_session.add(artist)
+    await async_session.commit()
+    return artist
+
+
+@pytest_asyncio.fixture(scope="function")
+async def sales(async_session: AsyncSession) -> AsyncSession:
+    """Seed two genres, artists and countries with a few invoice lines."""
+    async_session.add_all(
+        [
+            Genre(id=1, name="Rock"),
+            Genre(id=2, name="Jazz"),
+            MediaType(id=1, name="MPEG audio file"),
+            Artist(id=1, name="Rock Artist"),
+            Artist(id=2, name="Jazz Artist"),
+            Album(id=1, title="Rock Album", artist_id=1),
+            Album(id=2, title="Jazz Album", artist_id=2),
+            Customer(id=1, first_name="Ann", last_name="Lee", email="ann@example.com"),
+        ]
+    )
+    for id, (album_id, genre_id) in enumerate([(1, 1), (2, 2)], start=1):
+        async_session.add(
+            Track(
+                id=id,
+                name=f"Track {id}",
+                milliseconds=1000,
+                unit_price=Decimal("0.99"),
+                bytes=100,
+                media_type_id=1,
+                album_id=album_id,
+                genre_id=genre_id,
+            )
+        )
+    for id, (country, month) in enumerate([("USA", 1), ("Canada", 2)], start=1):
+        async_session.add(
+            Invoice(
+                id=id,
+                invoice_date=datetime(2024, month, 15),
+                billing_country=country,
+                total=Decimal("0"),
+                customer_id=1,
+            )
+        )
+    async_session.add_all(
+        [
+            InvoiceItem(
+                invoice_id=1, track_id=1, unit_price=Decimal("0.99"), quantity=2
+            ),
+            InvoiceItem(
+                invoice_id=1, track_id=2, unit_price=Decimal("1.99"), quantity=1
+            ),
+            InvoiceItem(
+                invoice_id=2, track_id=1, unit_price=Decimal("0.99"), quantity=1
+            ),
+        ]
+    )
+    await async_session.commit()
+    # as app.prepare does before the application starts
+    await ensure_sales_rollups(async_session)
+    await async_session.commit()
+    return async_session
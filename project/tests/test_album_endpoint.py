@@ -1,39 +1,13 @@
-from typing import AsyncGenerator
 import pytest
-import pytest_asyncio
 from fastapi.testclient import TestClient
-from httpx import AsyncClient, ASGITransport
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.main import app
-from app.database import get_db
 from app.models.albums import Album, AlbumCreate, AlbumRead
 from app.models.artists import Artist
 from app.models.fields import ValidationConstant
 
-# Test database URL
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-# Create async engine for tests
-engine = create_async_engine(
-    TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-
-# Create test session
-TestingSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
-
 # Test data
-test_artist = {
-    "id": 1,
-    "name": "Test Artist"
-}
-
 test_album = {
     "title": "Test Album",
     "artist_id": 1
@@ -45,44 +19,6 @@ expected_album_response = {
     "artist_id": 1
 }
 
-@pytest_asyncio.fixture(scope="function")
-async def async_session() -> AsyncGenerator[AsyncSession, None]:
-    """Create a fresh database session for each test."""
-    async with engine.begin() as conn:
-        # Create all tables
-        await conn.run_sync(Album.metadata.create_all)
-        await conn.run_sync(Artist.metadata.create_all)
-    
-    async with TestingSessionLocal() as session:
-        yield session
-        # Clean up after test
-        async with engine.begin() as conn:
-            await conn.run_sync(Album.metadata.drop_all)
-            await conn.run_sync(Artist.metadata.drop_all)
-
-@pytest_asyncio.fixture(scope="function")
-async def async_client(async_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
-    """Create an async client with the test database session."""
-    async def override_get_db():
-        try:
-            yield async_session
-        finally:
-            await async_session.close()
-
-    app.dependency_overrides[get_db] = override_get_db
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as client:
-        yield client
-    app.dependency_overrides.clear()
-
-@pytest_asyncio.fixture(scope="function")
-async def test_artist_fixture(async_session: AsyncSession) -> Artist:
-    """Create a test artist in the database."""
-    artist = Artist(**test_artist)
-    async_session.add(artist)
-    await async_session.commit()
-    return artist
-
 @pytest.mark.asyncio
 async def test_create_album(async_client: AsyncClient, test_artist_fixture: Artist):
     """Test creating a new album."""
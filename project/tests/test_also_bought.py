@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import versions
+from app.cache.versions import bump_data_version
+from app.models.invoice_items import InvoiceItem
+from app.reports.also_bought import CoOccurrence
+
+
+def test_co_occurrence_counts_baskets():
+    """Test pairs are counted once per basket and ranked by count."""
+    matrix = CoOccurrence(
+        np.array([1, 1, 1, 2, 2, 2, 3, 3]),
+        np.array([10, 20, 20, 10, 20, 30, 10, 30]),
+    )
+    assert matrix.top(10, 5) == [(20, 2), (30, 2)]
+    assert matrix.top(30, 1) == [(10, 2)]
+    assert matrix.top(99, 5) == []
+
+    matrix.add([20, 30, 40], 1)
+    matrix.add([10, 30], -1)
+    assert matrix.top(30, 5) == [(20, 2), (10, 1), (40, 1)]
+
+
+async def also_bought(client: AsyncClient, url: str) -> list:
+    response = await client.get(url)
+    assert response.status_code == 200
+    return [(item["id"], item["count"]) for item in response.json()["response"]]
+
+
+@pytest.mark.asyncio
+async def test_also_bought_follows_invoice_line_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test tracks and albums bought together are recommended and kept current."""
+    assert await also_bought(async_client, "/api/v1/tracks/1/also_bought") == [(2, 1)]
+    assert await also_bought(async_client, "/api/v1/albums/2/also_bought") == [(1, 1)]
+    assert await also_bought(async_client, "/api/v1/tracks/2/also_bought") == [(1, 1)]
+
+    response = await async_client.post(
+        "/api/v1/invoice_items/",
+        json={"invoice_id": 2, "track_id": 2, "unit_price": "1.99", "quantity": 1},
+    )
+    assert response.status_code == 201
+    assert await also_bought(async_client, "/api/v1/tracks/1/also_bought") == [(2, 2)]
+    assert await also_bought(async_client, "/api/v1/albums/1/also_bought?k=1") == [
+        (2, 2)
+    ]
+
+    response = await async_client.get("/api/v1/tracks/99/also_bought")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_also_bought_rebuilt_after_writes_of_other_workers(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a line written by another worker is counted once its data version moved."""
+    monkeypatch.setattr(versions, "VERSION_CHECK_INTERVAL", 0)
+    assert await also_bought(async_client, "/api/v1/tracks/1/also_bought") == [(2, 1)]
+
+    # another worker commits a line, this worker's listeners never see it
+    sales.add(
+        InvoiceItem(invoice_id=2, track_id=2, unit_price=Decimal("1.99"), quantity=1)
+    )
+    await bump_data_version(sales, InvoiceItem)
+    await sales.commit()
+    assert await also_bought(async_client, "/api/v1/tracks/1/also_bought") == [(2, 2)]
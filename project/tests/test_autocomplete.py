@@ -0,0 +1,86 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import versions
+from app.cache.versions import bump_data_version
+from app.models.artists import Artist
+from app.models.search import SearchType
+from app.search.autocomplete import PrefixIndex
+
+
+def test_prefix_index_ignores_case_and_accents():
+    """Test names are matched by normalised prefix and kept sorted on change."""
+    index = PrefixIndex(
+        [(1, "Motörhead"), (2, "Metallica"), (3, "motown"), (4, "AC/DC")]
+    )
+    assert [id for _, _, id in index.complete("mot", SearchType.ARTIST)] == [1, 3]
+
+    index.put(2, "Motley Crue")
+    index.put(5, "Mötley")
+    assert [id for _, _, id in index.complete("mot", SearchType.ARTIST)] == [
+        5,
+        2,
+        1,
+        3,
+    ]
+    assert list(index.complete("met", SearchType.ARTIST)) == []
+    assert len(index) == 5
+
+
+async def complete(client: AsyncClient, query: str) -> list:
+    response = await client.get(f"/api/v1/autocomplete?{query}")
+    assert response.status_code == 200
+    return [
+        (item["type"], item["id"], item["name"]) for item in response.json()["response"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_autocomplete_follows_create_and_patch(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the names of every type are completed and kept current by writes."""
+    assert await complete(async_client, "prefix=ROCK") == [
+        ("album", 1, "Rock Album"),
+        ("artist", 1, "Rock Artist"),
+    ]
+    assert await complete(async_client, "prefix=tr&type=track&limit=1") == [
+        ("track", 1, "Track 1")
+    ]
+
+    response = await async_client.post("/api/v1/artists/", json={"name": "Rockabilly"})
+    assert response.status_code == 201
+    response = await async_client.patch("/api/v1/albums/1", json={"title": "Blues"})
+    assert response.status_code == 200
+
+    assert await complete(async_client, "prefix=rock") == [
+        ("artist", 1, "Rock Artist"),
+        ("artist", 3, "Rockabilly"),
+    ]
+    assert await complete(async_client, "prefix=blu&type=album") == [
+        ("album", 1, "Blues")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_autocomplete_sees_names_added_by_other_workers(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a name written by another worker is completed once its data version moved."""
+    monkeypatch.setattr(versions, "VERSION_CHECK_INTERVAL", 0)
+    assert await complete(async_client, "prefix=rock&type=artist") == [
+        ("artist", 1, "Rock Artist")
+    ]
+
+    # another worker commits an artist, this worker's listeners never see it
+    sales.add(Artist(id=3, name="Rockabilly"))
+    await bump_data_version(sales, Artist)
+    await sales.commit()
+    assert await complete(async_client, "prefix=rock&type=artist") == [
+        ("artist", 1, "Rock Artist"),
+        ("artist", 3, "Rockabilly"),
+    ]
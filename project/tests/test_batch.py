@@ -0,0 +1,140 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.database import get_db
+from app.endpoints import batch
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_sub_requests_on_one_session(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test every sub-request gets the body and metadata a request of its own would."""
+    paths = [
+        "/api/v1/customers/1",
+        "/api/v1/customers/1/invoices?limit=5",
+        "/api/v1/invoices/1/invoice_items",
+        "/api/v1/invoices/2/invoice_items",
+        "/api/v1/genres",
+        "/api/v1/customers/9",
+    ]
+    response = await async_client.post(
+        "/api/v1/batch", json={"requests": [{"path": path} for path in paths]}
+    )
+    assert response.status_code == 200
+    results = response.json()["response"]
+    assert [result["path"] for result in results] == paths
+    for path, result in zip(paths, results):
+        single = await async_client.get(path, follow_redirects=True)
+        assert result["status_code"] == single.status_code
+        assert result["body"] == single.json()
+    assert results[1]["body"]["meta_data"]["total_count"] == 2
+    assert results[5]["status_code"] == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_each_failure(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test sub-requests that can't run get their own status without failing the batch."""
+    paths = [
+        "/api/v1/nowhere",
+        "/api/v1/batch",
+        "/api/v1/tracks/export",
+        "/api/v1/tracks/x",
+        "/api/v1/tracks/1",
+    ]
+    response = await async_client.post(
+        "/api/v1/batch", json={"requests": [{"path": path} for path in paths]}
+    )
+    assert response.status_code == 200
+    statuses = [result["status_code"] for result in response.json()["response"]]
+    assert statuses == [404, 405, 406, 422, 200]
+
+    response = await async_client.post(
+        "/api/v1/batch",
+        json={"requests": [{"method": "DELETE", "path": "/api/v1/tracks/1"}]},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_shares_the_real_session_between_parallel_sub_requests(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test parallel sub-requests all succeed on the one session get_db opened for the batch."""
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+    monkeypatch.setattr(database, "engine", sales.bind)
+    sessions = []
+
+    class CountedSession(AsyncSession):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            sessions.append(self)
+
+    monkeypatch.setattr(database, "AsyncSession", CountedSession)
+    running, peak = 0, 0
+    run_item = batch.run_item
+
+    async def count(*args):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            return await run_item(*args)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(batch, "run_item", count)
+    statements, overlapping = 0, 0
+
+    def started(*args):
+        nonlocal statements, overlapping
+        statements += 1
+        overlapping = max(overlapping, statements)
+
+    def finished(*args):
+        nonlocal statements
+        statements -= 1
+
+    sync_engine = sales.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", started)
+    event.listen(sync_engine, "after_cursor_execute", finished)
+    paths = [
+        f"/api/v1/{path}"
+        for path in [
+            "customers/1",
+            "customers/1/invoices",
+            "invoices/1",
+            "invoices/2",
+            "invoices/1/invoice_items",
+            "invoices/2/invoice_items",
+            "tracks/1",
+            "tracks/2",
+            "albums/1/tracks",
+            "albums/2/tracks",
+        ]
+    ]
+    try:
+        response = await async_client.post(
+            "/api/v1/batch", json={"requests": [{"path": path} for path in paths]}
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", started)
+        event.remove(sync_engine, "after_cursor_execute", finished)
+    assert response.status_code == 200
+    results = response.json()["response"]
+    assert [result["status_code"] for result in results] == [200] * len(paths)
+    assert results[5]["body"]["meta_data"]["total_count"] == 1
+    assert len(sessions) == 1
+    assert peak == batch.MAX_CONCURRENCY
+    # the sub-requests ran together, their statements one at a time
+    assert overlapping == 1
@@ -0,0 +1,86 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.endpoints import bulk_import
+
+ALBUMS_CSV = [
+    b'title,artist_id\n"Good 1",1\n',
+    b'"Good 2",2\n"Missing artist",9\n,1\n"Go',
+    b'od 3",1\n"Too",many,1\n"Two\nlines",2\n',
+]
+
+
+@pytest.fixture
+def import_engine(sales: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    """Imports write with their own session, point it at the test database"""
+    monkeypatch.setattr(bulk_import, "engine", sales.bind)
+
+
+async def stream_body(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_csv_import_batches_valid_rows_and_reports_the_rest(
+    async_client: AsyncClient, sales: AsyncSession, import_engine
+):
+    """Test valid rows are inserted batch by batch and invalid ones counted by line."""
+    commits = []
+
+    def count(conn):
+        commits.append(1)
+
+    engine = sales.bind.sync_engine
+    event.listen(engine, "commit", count)
+    try:
+        response = await async_client.post(
+            "/api/v1/albums/import?format=csv&batch_size=2",
+            content=stream_body(ALBUMS_CSV),
+            headers={"content-type": "text/csv"},
+        )
+    finally:
+        event.remove(engine, "commit", count)
+    assert response.status_code == 200
+    result = response.json()["response"]
+    assert (result["accepted"], result["rejected"]) == (4, 3)
+    assert [error["line"] for error in result["errors"]] == [4, 5, 7]
+    assert result["errors"][0]["detail"] == "Artist not found"
+    assert result["errors"][1]["detail"].startswith("title:")
+    assert result["errors"][2]["detail"] == "expected 2 values, found 3"
+    assert len(commits) == 2
+
+    response = await async_client.get("/api/v1/albums/?offset=2&limit=10")
+    assert [album["title"] for album in response.json()["response"]] == [
+        "Good 1",
+        "Good 2",
+        "Good 3",
+        "Two\nlines",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_import_limits_the_errors_reported(
+    async_client: AsyncClient, sales: AsyncSession, import_engine
+):
+    """Test every rejected row is counted while only max_errors are reported."""
+    body = b'{"name": "Blues"}\nnot json\n[1]\n{"name": null}\n{"name": "Soul"}\n'
+    response = await async_client.post(
+        "/api/v1/genres/import?max_errors=1",
+        content=body,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    result = response.json()["response"]
+    assert (result["accepted"], result["rejected"]) == (2, 3)
+    assert [error["line"] for error in result["errors"]] == [2]
+    assert result["errors"][0]["detail"].startswith("invalid JSON")
+    response = await async_client.get("/api/v1/genres/")
+    assert [genre["name"] for genre in response.json()["response"]] == [
+        "Rock",
+        "Jazz",
+        "Blues",
+        "Soul",
+    ]
@@ -0,0 +1,47 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def read_rows(client: AsyncClient, path: str) -> list:
+    response = await client.get(path)
+    assert response.status_code == 200
+    return response.json()["response"]
+
+
+@pytest.mark.asyncio
+async def test_columnar_page_matches_the_row_format(
+    async_client: AsyncClient, sales: AsyncSession
+):
+    """Test the columnar page holds the same values as the rows, column by column."""
+    rows = await read_rows(async_client, "/api/v1/tracks/?limit=10")
+    response = await async_client.get("/api/v1/tracks/?limit=10&format=columnar")
+    assert response.status_code == 200
+    body = response.json()
+    assert "response" not in body
+    assert set(body["columns"]) == set(rows[0])
+    assert list(body["data"]) == body["columns"]
+    assert [
+        {name: body["data"][name][index] for name in body["columns"]}
+        for index in range(len(rows))
+    ] == rows
+    assert body["meta_data"]["total_count"] == 2
+    assert body["meta_data"]["page_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_columnar_page_of_a_reference_table(
+    async_client: AsyncClient, sales: AsyncSession
+):
+    """Test reference tables serve the columnar format from memory, paginated."""
+    response = await async_client.get(
+        "/api/v1/genres/?offset=1&limit=1&format=columnar"
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"] == {"name": ["Jazz"], "id": [2]}
+    assert body["meta_data"]["page"] == 2
+    assert body["meta_data"]["total_count"] == 2
+
+    response = await async_client.get("/api/v1/genres/?format=rows")
+    assert response.status_code == 422
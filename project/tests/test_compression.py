@@ -0,0 +1,109 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.compression import (
+    ENCODINGS,
+    brotli,
+    zstandard,
+    CompressionMiddleware,
+    Compressor,
+    compressed_cache,
+)
+
+ROWS = [{"id": index, "name": f"Track {index}"} for index in range(200)]
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/page")
+    async def page():
+        return JSONResponse(ROWS)
+
+    @app.get("/small")
+    async def small():
+        return JSONResponse({"id": 1})
+
+    @app.get("/tracks/export")
+    async def export():
+        async def rows():
+            for row in ROWS:
+                yield (json.dumps(row) + "\n").encode()
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    return app
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_compressor_chunks_decode_to_the_body(encoding):
+    """Test the flushed chunks of a streaming compressor decode to the whole body."""
+    compressor = Compressor(encoding, 1)
+    body = b"".join((json.dumps(row) + "\n").encode() for row in ROWS)
+    chunks = [
+        compressor.compress(body[start : start + 500])
+        for start in range(0, len(body), 500)
+    ]
+    # every chunk is flushed, so it can be sent as soon as it's made
+    assert all(chunks)
+    chunks.append(compressor.finish())
+    if encoding == "gzip":
+        decompress = zlib.decompressobj(31).decompress
+    elif encoding == "br":
+        decompress = brotli.Decompressor().process
+    else:
+        decompress = zstandard.ZstdDecompressor().decompressobj().decompress
+    # each chunk decodes to the bytes compressed so far
+    decoded = b""
+    for index, chunk in enumerate(chunks[:-2]):
+        decoded += decompress(chunk)
+        assert decoded == body[: 500 * (index + 1)]
+    decoded += b"".join(decompress(chunk) for chunk in chunks[-2:])
+    assert decoded == body
+
+
+@pytest.mark.asyncio
+async def test_responses_compressed_once_and_streamed():
+    """Test large pages are compressed through the cache, small ones and exports as expected."""
+    transport = ASGITransport(app=build_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/page", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "accept-encoding"
+        assert int(response.headers["content-length"]) < len(json.dumps(ROWS))
+        assert response.json() == ROWS
+        response = await client.get("/page", headers={"Accept-Encoding": "gzip"})
+        assert response.json() == ROWS
+        assert compressed_cache.stats()["hits"] == 1
+        assert compressed_cache.stats()["misses"] == 1
+
+        response = await client.get("/page", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == ROWS
+
+        response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.json() == {"id": 1}
+
+        response = await client.get(
+            "/tracks/export", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows == ROWS
+        assert compressed_cache.stats()["misses"] == 1
+
+        # the encoded bytes are a valid gzip stream on their own
+        async with client.stream(
+            "GET", "/tracks/export", headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        assert gzip.decompress(raw).decode().splitlines()[0] == json.dumps(ROWS[0])
@@ -0,0 +1,118 @@
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import versions
+from app.cache.versions import bump_data_version
+from app.models.customers import Customer
+from app.models.invoices import Invoice
+from app.reports.customers import aggregate, scores
+
+
+def test_aggregate_and_score_vectorised():
+    """Test invoices are reduced per customer and scored by quintile."""
+    ids, count, cents, first, last = aggregate(
+        np.array([3, 1, 3, 3, 1]),
+        np.array([50, 10, 20, 40, 30]),
+        np.array([100, 200, 300, 400, 500]),
+    )
+    assert ids.tolist() == [1, 3]
+    assert count.tolist() == [2, 3]
+    assert cents.tolist() == [700, 800]
+    assert first.tolist() == [10, 20]
+    assert last.tolist() == [30, 50]
+
+    assert scores(np.arange(10)).tolist() == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5]
+    assert scores(np.full(4, 7)).tolist() == [5, 5, 5, 5]
+
+
+async def read_rfm(client: AsyncClient) -> list:
+    response = await client.get("/api/v1/reports/customers/rfm")
+    assert response.status_code == 200
+    return [
+        (item["customer_id"], item["frequency"], item["monetary"], item["last_invoice"])
+        for item in response.json()["response"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_customer_rfm_follows_invoice_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the customer totals are refreshed by invoice creates and updates."""
+    assert await read_rfm(async_client) == [(1, 2, "0.00", "2024-02-15T00:00:00")]
+
+    invoice = {
+        "invoice_date": "2024-05-01T00:00:00",
+        "billing_country": "USA",
+        "total": "12.50",
+        "customer_id": 1,
+    }
+    response = await async_client.post("/api/v1/invoices/", json=invoice)
+    assert response.status_code == 201
+    assert await read_rfm(async_client) == [(1, 3, "12.50", "2024-05-01T00:00:00")]
+
+    invoice_id = response.json()["response"]["id"]
+    response = await async_client.put(
+        f"/api/v1/invoices/{invoice_id}",
+        json={**invoice, "invoice_date": "2024-01-01T00:00:00", "total": "2.00"},
+    )
+    assert response.status_code == 200
+    assert await read_rfm(async_client) == [(1, 3, "2.00", "2024-02-15T00:00:00")]
+
+
+@pytest.mark.asyncio
+async def test_customer_rfm_names_customers_missing_a_name(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test a customer with no last name is named by the first name alone."""
+    sales.add_all(
+        [
+            Customer(id=2, first_name="Bo", last_name=None, email="bo@example.com"),
+            Invoice(
+                id=3,
+                invoice_date=datetime(2024, 3, 1),
+                billing_country="USA",
+                total=Decimal("5.00"),
+                customer_id=2,
+            ),
+        ]
+    )
+    await sales.commit()
+    response = await async_client.get("/api/v1/reports/customers/rfm")
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()["response"]] == [
+        "Bo",
+        "Ann Lee",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_customer_rfm_reloaded_after_writes_of_other_workers(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test an invoice written by another worker is counted once its data version moved."""
+    monkeypatch.setattr(versions, "VERSION_CHECK_INTERVAL", 0)
+    assert await read_rfm(async_client) == [(1, 2, "0.00", "2024-02-15T00:00:00")]
+
+    # another worker commits an invoice, this worker's listeners never see it
+    sales.add(
+        Invoice(
+            id=3,
+            invoice_date=datetime(2024, 6, 1),
+            billing_country="USA",
+            total=Decimal("4.00"),
+            customer_id=1,
+        )
+    )
+    await bump_data_version(sales, Invoice)
+    await sales.commit()
+    assert await read_rfm(async_client) == [(1, 3, "4.00", "2024-06-01T00:00:00")]
@@ -0,0 +1,80 @@
+import pytest
+from httpx import AsyncClient
+
+from app.cache.entities import EntityCache, get_entity_cache, ENTRY_OVERHEAD
+from app.models.albums import Album, AlbumRead
+from app.models.artists import Artist
+
+from tests.test_album_endpoint import test_album
+
+
+def make_album(id: int) -> Album:
+    return Album(id=id, title=f"Album {id}", artist_id=1)
+
+
+def test_lru_eviction_by_byte_budget():
+    """Test the least recently used entries are evicted once over budget."""
+    entry_size = (
+        len(AlbumRead.model_validate(make_album(1)).model_dump_json()) + ENTRY_OVERHEAD
+    )
+    cache = EntityCache(AlbumRead, byte_budget=entry_size * 3)
+    for id in range(1, 4):
+        cache.put(make_album(id))
+    assert cache.get(1) is not None  # 1 is now the most recently used
+    cache.put(make_album(4))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.size <= cache.byte_budget
+
+
+def test_negative_cache_expires():
+    """Test missing ids are remembered only for the ttl."""
+    cache = EntityCache(AlbumRead, negative_ttl=60)
+    cache.put_missing(7)
+    assert cache.is_missing(7)
+    cache.put(make_album(7))
+    assert not cache.is_missing(7)
+
+    cache = EntityCache(AlbumRead, negative_ttl=-1)
+    cache.put_missing(7)
+    assert not cache.is_missing(7)
+
+
+def test_cached_objects_expire():
+    """Test cached objects are served only for the ttl, so other workers' writes are seen."""
+    cache = EntityCache(AlbumRead, positive_ttl=60)
+    cache.put(make_album(7))
+    assert cache.get(7) is not None
+
+    cache = EntityCache(AlbumRead, positive_ttl=-1)
+    cache.put(make_album(7))
+    assert cache.get(7) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_read_through_and_write_through(
+    async_client: AsyncClient,
+    test_artist_fixture: Artist,
+):
+    """Test reads fill the cache, repeated misses are served from it and writes update it."""
+    response = await async_client.post("/api/v1/albums/", json=test_album)
+    album_id = response.json()["response"]["id"]
+
+    await async_client.patch(f"/api/v1/albums/{album_id}", json={"title": "Patched"})
+    response = await async_client.get(f"/api/v1/albums/{album_id}")
+    assert response.json()["response"]["title"] == "Patched"
+
+    for _ in range(2):
+        response = await async_client.get("/api/v1/albums/999999")
+        assert response.status_code == 404
+
+    stats = get_entity_cache(Album).stats()
+    assert stats["hits"] == 1
+    assert stats["negative_hits"] == 1
+
+    response = await async_client.get("/api/v1/cache/stats")
+    assert response.json()["response"]["entities"]["albums"]["hits"] == 1
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.endpoints import streaming
+
+
+@pytest.fixture
+def export_engine(sales: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+    """Exports read with their own session, point it at the test database"""
+    monkeypatch.setattr(streaming, "engine", sales.bind)
+    # one row per chunk, so every export spans several chunks
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_SIZE", 1)
+
+
+@pytest.mark.asyncio
+async def test_export_streams_every_row_as_ndjson(
+    async_client: AsyncClient, export_engine
+):
+    """Test the NDJSON export has one object per row in id order, without buffering."""
+    response = await async_client.get("/api/v1/tracks/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-length" not in response.headers
+    assert response.headers["content-disposition"] == (
+        'attachment; filename="tracks.ndjson"'
+    )
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2]
+    assert rows[0]["name"] == "Track 1"
+    assert rows[0]["unit_price"] == "0.99"
+
+    response = await async_client.get("/api/v1/invoices/export")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["invoice_date"] == "2024-01-15T00:00:00"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_csv_with_a_header_row(
+    async_client: AsyncClient, export_engine
+):
+    """Test the CSV export has a header row, and an empty table still gets it."""
+    response = await async_client.get("/api/v1/genres/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert list(csv.reader(io.StringIO(response.text))) == [
+        ["name", "id"],
+        ["Rock", "1"],
+        ["Jazz", "2"],
+    ]
+
+    response = await async_client.get("/api/v1/playlists/export?format=csv")
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["name,id"]
@@ -0,0 +1,71 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.foreign_keys import IdSet, MAX_BITMAP_ID, get_foreign_keys
+from app.models.tracks import Track
+from app.models.albums import Album
+from app.models.artists import Artist
+from app.models.genres import Genre
+from app.models.media_types import MediaType
+from app.models.customers import Customer
+from app.models.employees import Employee
+from app.models.invoice_items import InvoiceItem
+from app.models.invoices import Invoice
+
+
+def test_id_set_membership():
+    """Test ids are found once added, including ids outside the bitmap."""
+    id_set = IdSet([1, 5, 200])
+    id_set.add(MAX_BITMAP_ID + 1)
+    id_set.add(5)
+
+    assert 1 in id_set
+    assert 5 in id_set
+    assert 200 in id_set
+    assert MAX_BITMAP_ID + 1 in id_set
+    assert 2 not in id_set
+    assert 100000 not in id_set
+    assert len(id_set) == 4
+
+
+def test_foreign_keys_derived_from_metadata():
+    """Test the foreign keys of the models are found from the column metadata."""
+    assert set(get_foreign_keys(Track)) == {
+        ("media_type_id", MediaType),
+        ("album_id", Album),
+        ("genre_id", Genre),
+    }
+    assert set(get_foreign_keys(InvoiceItem)) == {
+        ("invoice_id", Invoice),
+        ("track_id", Track),
+    }
+    assert get_foreign_keys(Customer) == (("support_rep_id", Employee),)
+    assert get_foreign_keys(Genre) == ()
+
+
+@pytest.mark.asyncio
+async def test_parent_created_elsewhere_is_found(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    """Test a parent the id set hasn't seen, e.g. created by another worker, is looked up."""
+    async_session.add(Artist(id=1, name="Known"))
+    await async_session.commit()
+    response = await async_client.post(
+        "/api/v1/albums/", json={"title": "First", "artist_id": 1}
+    )
+    assert response.status_code == 201
+
+    # inserted behind the back of the loaded id set
+    async_session.add(Artist(id=2, name="Created elsewhere"))
+    await async_session.commit()
+    response = await async_client.post(
+        "/api/v1/albums/", json={"title": "Second", "artist_id": 2}
+    )
+    assert response.status_code == 201
+
+    response = await async_client.post(
+        "/api/v1/albums/", json={"title": "Third", "artist_id": 3}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Artist not found"
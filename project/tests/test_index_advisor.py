@@ -0,0 +1,84 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.invoices import Invoice
+from app.schema.index_advisor import (
+    QueryShape,
+    advise,
+    proposed_columns,
+    record_query_shapes,
+    statement_shapes,
+)
+from app.schema.migrations import Migration, migrate
+
+
+def test_statement_shapes_and_proposed_columns():
+    """Test the filtered and ordered columns are found and the rowid order is implied."""
+    statement = (
+        select(Invoice)
+        .where(Invoice.customer_id == 1, Invoice.invoice_date >= "2024-01-01")
+        .order_by(Invoice.id.desc())
+    )
+    [shape] = statement_shapes(statement)
+    assert shape == ("invoices", ("CustomerId",), ("InvoiceDate",), ("InvoiceId",))
+    assert proposed_columns(QueryShape(*shape), "InvoiceId") == (
+        "CustomerId",
+        "InvoiceDate",
+    )
+    ordered = QueryShape("invoices", ("CustomerId",), (), ("InvoiceId",))
+    assert proposed_columns(ordered, "InvoiceId") == ("CustomerId",)
+
+
+@pytest.mark.asyncio
+async def test_advisor_proposes_missing_index_and_migration_applies_it(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test a scanned filter column is proposed, and the advice clears once it's migrated."""
+    record_query_shapes(sales.bind)
+    await sales.execute(text("DROP INDEX IFK_InvoiceCustomerId"))
+    await sales.commit()
+
+    response = await async_client.get("/api/v1/customers/1/invoices")
+    assert response.status_code == 200
+    advice = await advise(sales)
+    [proposal] = [
+        proposal for proposal in advice.proposals if proposal.table == "invoices"
+    ]
+    assert proposal.columns == ["CustomerId"]
+    assert proposal.count == 2
+
+    migrations = (Migration(1, "index invoices", (proposal.statement,)),)
+    assert await migrate(sales, migrations) == [1]
+    await sales.commit()
+    assert await migrate(sales, migrations) == []
+
+    advice = await advise(sales)
+    assert not [
+        proposal for proposal in advice.proposals if proposal.table == "invoices"
+    ]
+    response = await async_client.get("/api/v1/schema/migrations")
+    assert [item["version"] for item in response.json()["response"]] == [1]
+
+
+@pytest.mark.asyncio
+async def test_migrations_read_without_creating_their_table(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test a database never migrated lists no migrations and isn't written to."""
+    # the in-memory database outlives the tables of the models, not this one
+    await sales.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+    await sales.commit()
+    response = await async_client.get("/api/v1/schema/migrations")
+    assert response.status_code == 200
+    assert response.json()["response"] == []
+    exists = await sales.scalar(
+        text(
+            "SELECT COUNT(*) FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'schema_migrations'"
+        )
+    )
+    assert not exists
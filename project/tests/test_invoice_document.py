@@ -0,0 +1,154 @@
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.reports.invoice_documents import invoice_documents
+from tests.test_sales_rollups import assert_consistent, read_sales
+
+
+@pytest.mark.asyncio
+async def test_document_is_read_with_one_statement_and_cached(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the document takes at most two statements, and none once it's cached."""
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = sales.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = await async_client.get("/api/v1/invoices/1/document")
+        assert response.status_code == 200
+        assert len(statements) <= 2
+        document = response.json()["response"]
+        assert document["invoice"]["id"] == 1
+        assert document["customer"]["last_name"] == "Lee"
+        assert [
+            (line["track_name"], line["album_title"], line["artist_name"])
+            for line in document["lines"]
+        ] == [
+            ("Track 1", "Rock Album", "Rock Artist"),
+            ("Track 2", "Jazz Album", "Jazz Artist"),
+        ]
+        assert [line["quantity"] for line in document["lines"]] == [2, 1]
+
+        statements.clear()
+        cached = await async_client.get("/api/v1/invoices/1/document")
+        assert cached.json() == response.json()
+        assert statements == []
+
+        missing = await async_client.get("/api/v1/invoices/9/document")
+        assert missing.status_code == 404
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.asyncio
+async def test_document_follows_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test writes to the invoice, its lines and the names it holds show up in the document."""
+    await async_client.get("/api/v1/invoices/1/document")
+    response = await async_client.put(
+        "/api/v1/invoice_items/3",
+        json={
+            "invoice_id": 1,
+            "track_id": 2,
+            "unit_price": "1.99",
+            "quantity": 3,
+        },
+    )
+    assert response.status_code == 200
+    response = await async_client.put(
+        "/api/v1/artists/1", json={"name": "Renamed Artist"}
+    )
+    assert response.status_code == 200
+
+    document = (await async_client.get("/api/v1/invoices/1/document")).json()[
+        "response"
+    ]
+    assert [line["id"] for line in document["lines"]] == [1, 2, 3]
+    assert document["lines"][0]["artist_name"] == "Renamed Artist"
+    assert Decimal(str(document["lines"][2]["unit_price"])) == Decimal("1.99")
+    invoice_2 = (await async_client.get("/api/v1/invoices/2/document")).json()
+    assert invoice_2["response"]["lines"] == []
+
+
+@pytest.mark.asyncio
+async def test_invoice_created_with_items_in_one_transaction(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the invoice and its lines commit together with the total summed from the lines."""
+    await read_sales(async_client, "country")
+    commits = []
+
+    def count(conn):
+        commits.append(1)
+
+    engine = sales.bind.sync_engine
+    event.listen(engine, "commit", count)
+    try:
+        response = await async_client.post(
+            "/api/v1/invoices/with_items",
+            json={
+                "invoice_date": "2024-03-01T00:00:00",
+                "billing_country": "France",
+                "customer_id": 1,
+                "items": [
+                    {"track_id": 1, "unit_price": "0.99", "quantity": 3},
+                    {"track_id": 2, "unit_price": "1.99", "quantity": 1},
+                ],
+            },
+        )
+    finally:
+        event.remove(engine, "commit", count)
+    assert response.status_code == 201
+    assert len(commits) == 1
+    document = response.json()["response"]
+    assert document["invoice"]["id"] == 3
+    assert Decimal(str(document["invoice"]["total"])) == Decimal("4.96")
+    assert [line["track_name"] for line in document["lines"]] == ["Track 1", "Track 2"]
+    _, revenue, quantity = (await read_sales(async_client, "country"))["France"]
+    assert (Decimal(str(revenue)), quantity) == (Decimal("4.96"), 4)
+    await assert_consistent(async_client)
+
+    response = await async_client.post(
+        "/api/v1/invoices/with_items",
+        json={
+            "invoice_date": "2024-03-01T00:00:00",
+            "customer_id": 1,
+            "items": [{"track_id": 9, "unit_price": "0.99", "quantity": 1}],
+        },
+    )
+    assert response.status_code == 400
+    missing = await async_client.get("/api/v1/invoices/4/document")
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_document_expires_after_ttl(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a document is read again once expired, e.g. after another worker's write."""
+    monkeypatch.setattr(invoice_documents, "ttl", -1)
+    response = await async_client.get("/api/v1/invoices/1/document")
+    assert response.json()["response"]["lines"][0]["quantity"] == 2
+
+    # written behind the back of this process' write events
+    await sales.execute(
+        text("UPDATE invoice_items SET Quantity = 5 WHERE InvoiceLineId = 1")
+    )
+    await sales.commit()
+    response = await async_client.get("/api/v1/invoices/1/document")
+    assert response.json()["response"]["lines"][0]["quantity"] == 5
+    assert invoice_documents.stats()["expirations"] == 1
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import versions
+from app.cache.versions import bump_data_version
+from app.reports.leaderboards import Leaderboard, leaderboards
+from app.models.invoice_items import InvoiceItem
+from app.models.reports import TopMetric
+
+
+def test_leaderboard_ranking_follows_totals():
+    """Test ids move in the rankings as their totals change."""
+    board = Leaderboard()
+    board.add(1, 5, 500)
+    board.add(2, 3, 900)
+    board.add(3, 1, 100)
+    assert board.top(TopMetric.QUANTITY, 0, 2) == ([(1, [5, 500]), (2, [3, 900])], 3)
+    assert board.top(TopMetric.REVENUE, 0, 1) == ([(2, [3, 900])], 3)
+
+    board.add(3, 10, 1000)
+    board.add(1, -5, -500)
+    assert board.top(TopMetric.QUANTITY, 0, 10) == (
+        [(3, [11, 1100]), (2, [3, 900])],
+        2,
+    )
+
+
+async def read_top(client: AsyncClient, url: str) -> list:
+    response = await client.get(url)
+    assert response.status_code == 200
+    return [
+        (item["rank"], item["id"], item["name"], item["quantity"])
+        for item in response.json()["response"]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_leaderboards_follow_invoice_line_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the leaderboards are seeded and updated by invoice line writes."""
+    assert await read_top(async_client, "/api/v1/reports/top/tracks") == [
+        (1, 1, "Track 1", 3),
+        (2, 2, "Track 2", 1),
+    ]
+    assert await read_top(
+        async_client, "/api/v1/reports/top/artists?period=2024-02"
+    ) == [(1, 1, "Rock Artist", 1)]
+
+    response = await async_client.post(
+        "/api/v1/invoice_items/",
+        json={"invoice_id": 2, "track_id": 2, "unit_price": "1.99", "quantity": 5},
+    )
+    assert response.status_code == 201
+
+    assert await read_top(async_client, "/api/v1/reports/top/albums?period=2024") == [
+        (1, 2, "Jazz Album", 6),
+        (2, 1, "Rock Album", 3),
+    ]
+    assert await read_top(
+        async_client, "/api/v1/reports/top/tracks?period=2024-02&by=revenue&limit=1"
+    ) == [(1, 2, "Track 2", 5)]
+    response = await async_client.get("/api/v1/reports/top/tracks?period=last")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_leaderboards_reseeded_after_writes_of_other_workers(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a line written by another worker is seen, and this worker's own aren't reseeded for."""
+    monkeypatch.setattr(versions, "VERSION_CHECK_INTERVAL", 0)
+    loads = []
+    load = leaderboards.load
+
+    async def count(session):
+        loads.append(1)
+        await load(session)
+
+    monkeypatch.setattr(leaderboards, "load", count)
+    url = "/api/v1/reports/top/tracks"
+    assert await read_top(async_client, url) == [
+        (1, 1, "Track 1", 3),
+        (2, 2, "Track 2", 1),
+    ]
+    response = await async_client.post(
+        "/api/v1/invoice_items/",
+        json={"invoice_id": 2, "track_id": 2, "unit_price": "1.99", "quantity": 1},
+    )
+    assert response.status_code == 201
+    assert await read_top(async_client, url) == [
+        (1, 1, "Track 1", 3),
+        (2, 2, "Track 2", 2),
+    ]
+    assert len(loads) == 1
+
+    # another worker commits a line, this worker's listeners never see it
+    sales.add(
+        InvoiceItem(invoice_id=2, track_id=2, unit_price=Decimal("1.99"), quantity=5)
+    )
+    await bump_data_version(sales, InvoiceItem)
+    await sales.commit()
+    assert await read_top(async_client, url) == [
+        (1, 2, "Track 2", 7),
+        (2, 1, "Track 1", 3),
+    ]
+    assert len(loads) == 2
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.compression import ENCODERS, negotiate
+
+
+def test_negotiate_prefers_quality_then_order():
+    """Test the accepted encoding with the highest quality is chosen."""
+    assert negotiate("gzip, br", ["br", "gzip"]) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate("br;q=0, *", ["br", "gzip"]) == "gzip"
+    assert negotiate("identity", ["br", "gzip"]) is None
+    assert negotiate(None, ["gzip"]) is None
+
+
+@pytest.mark.asyncio
+async def test_openapi_served_precompressed_with_etag(
+    async_client: AsyncClient,
+):
+    """Test every variant holds the same document and a known ETag gets a 304."""
+    response = await async_client.get(
+        "/openapi.json", headers={"Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    document = response.json()
+    assert "/api/v1/albums/" in document["paths"]
+    etag = response.headers["etag"]
+
+    response = await async_client.get(
+        "/openapi.json", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "accept-encoding"
+    assert response.headers["etag"] != etag
+    assert json.loads(response.content) == document
+
+    if "br" in ENCODERS:
+        response = await async_client.get(
+            "/openapi.json", headers={"Accept-Encoding": "gzip, br"}
+        )
+        assert response.headers["content-encoding"] == "br"
+        assert json.loads(response.content) == document
+
+    response = await async_client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
@@ -0,0 +1,92 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.endpoints import pagination
+from app.endpoints.pagination import OversizedPages
+from app.models.albums import Album
+from app.models.artists import Artist
+
+
+@pytest.fixture
+def albums(async_session: AsyncSession, monkeypatch):
+    """Five albums of one artist, with a maximum page size of two"""
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 2)
+
+    async def add():
+        async_session.add(Artist(id=1, name="Test Artist"))
+        async_session.add_all(
+            Album(id=id, title=f"Album é{id}", artist_id=1) for id in range(1, 6)
+        )
+        await async_session.commit()
+
+    return add
+
+
+@pytest.mark.asyncio
+async def test_oversized_pages_streamed_in_the_envelope(
+    async_client: AsyncClient,
+    albums,
+):
+    """Test a page above the maximum size is streamed with the metadata a built page gets."""
+    await albums()
+    built = await async_client.get("/api/v1/albums/?offset=1&limit=2")
+    assert "content-length" in built.headers
+    streamed = await async_client.get("/api/v1/albums/?offset=1&limit=3")
+    assert streamed.status_code == 200
+    assert "content-length" not in streamed.headers
+    page = streamed.json()
+    assert list(page) == list(built.json())
+    assert [album["id"] for album in page["response"]] == [2, 3, 4]
+    assert page["response"][0] == {"id": 2, "title": "Album é2", "artist_id": 1}
+    assert page["meta_data"] == {
+        **built.json()["meta_data"],
+        "limit": 3,
+        "page": 1,
+        "page_count": 2,
+    }
+
+    response = await async_client.get("/api/v1/artists/1/albums?limit=5")
+    assert [album["id"] for album in response.json()["response"]] == [1, 2, 3, 4, 5]
+    assert response.json()["meta_data"]["total_count"] == 5
+
+    response = await async_client.get("/api/v1/albums/?limit=3&format=columnar")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_oversized_pages_rejected(
+    async_client: AsyncClient,
+    albums,
+    monkeypatch,
+):
+    """Test a page above the maximum size is rejected when so configured."""
+    monkeypatch.setattr(pagination, "OVERSIZED_PAGES", OversizedPages.REJECT)
+    await albums()
+    response = await async_client.get("/api/v1/albums/?limit=2")
+    assert response.status_code == 200
+    for url in ("/api/v1/albums/?limit=3", "/api/v1/artists/1/albums?limit=-1"):
+        response = await async_client.get(url)
+        assert response.status_code == 422
+        assert response.json()["detail"] == "limit must be between 1 and 2"
+
+    monkeypatch.setattr(pagination, "OVERSIZED_PAGES", OversizedPages.STREAM)
+    response = await async_client.get("/api/v1/albums/?limit=-1")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_zero_limit_rejected(
+    async_client: AsyncClient,
+    albums,
+):
+    """Test a limit of zero is a 422 rather than a division by zero in the metadata."""
+    await albums()
+    for url in (
+        "/api/v1/albums/?limit=0",
+        "/api/v1/albums/?limit=0&format=columnar",
+        "/api/v1/artists/1/albums?limit=0",
+    ):
+        response = await async_client.get(url)
+        assert response.status_code == 422
+        assert response.json()["detail"] == "limit must be between 1 and 2"
@@ -0,0 +1,129 @@
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.reports import sales as sales_reports
+from app.search.autocomplete import autocomplete
+
+
+async def read_prices(client: AsyncClient) -> dict:
+    response = await client.get("/api/v1/tracks/")
+    return {
+        track["id"]: Decimal(str(track["unit_price"]))
+        for track in response.json()["response"]
+    }
+
+
+@pytest.mark.asyncio
+async def test_tracks_repriced_by_filter_in_one_update(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the rows matching the filter are updated with one statement and read back."""
+    # cache track 1 so the update has to invalidate it
+    await async_client.get("/api/v1/tracks/1")
+    response = await async_client.patch(
+        "/api/v1/tracks/?genre_id=1&dry_run=true", json={"unit_price": "1.29"}
+    )
+    assert response.status_code == 200
+    assert response.json()["response"] == {"matched": 1, "updated": 0, "dry_run": True}
+    assert (await read_prices(async_client))[1] == Decimal("0.99")
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE tracks"):
+            statements.append(statement)
+
+    engine = sales.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = await async_client.patch(
+            "/api/v1/tracks/?genre_id=1&genre_id=2", json={"unit_price": "1.29"}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    assert response.json()["response"] == {"matched": 2, "updated": 2, "dry_run": False}
+    assert len(statements) == 1
+    assert await read_prices(async_client) == {1: Decimal("1.29"), 2: Decimal("1.29")}
+    track = (await async_client.get("/api/v1/tracks/1")).json()["response"]
+    assert Decimal(str(track["unit_price"])) == Decimal("1.29")
+
+
+@pytest.mark.asyncio
+async def test_patch_by_filter_is_validated_and_limited(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test invalid bodies, filters and foreign keys, no filter and too many rows are rejected."""
+    for url, body, status_code in [
+        ("/api/v1/tracks/?genre_id=1", {"unit_price": "12.00"}, 422),
+        ("/api/v1/tracks/?genre_id=x", {"unit_price": "1.29"}, 422),
+        ("/api/v1/tracks/?colour=red", {"unit_price": "1.29"}, 422),
+        ("/api/v1/tracks/?genre_id=1", {"colour": "red"}, 422),
+        ("/api/v1/tracks/?genre_id=1", {"genre_id": 9}, 400),
+        ("/api/v1/tracks/?genre_id=1", {}, 400),
+        (
+            "/api/v1/tracks/?genre_id=1&genre_id=2&max_rows=1",
+            {"unit_price": "1.29"},
+            400,
+        ),
+        ("/api/v1/tracks/", {"unit_price": "1.29"}, 400),
+        ("/api/v1/tracks/?dry_run=true", {"unit_price": "1.29"}, 400),
+    ]:
+        response = await async_client.patch(url, json=body)
+        assert response.status_code == status_code, url
+    assert set((await read_prices(async_client)).values()) == {Decimal("0.99")}
+    response = await async_client.patch("/api/v1/genres/", json={"name": "x"})
+    assert response.json()["detail"] == "At least one filter is required"
+
+    # a dry run reports how many rows match before the limit applies
+    response = await async_client.patch(
+        "/api/v1/tracks/?genre_id=1&genre_id=2&max_rows=1&dry_run=true",
+        json={"unit_price": "1.29"},
+    )
+    assert response.status_code == 200
+    assert response.json()["response"] == {"matched": 2, "updated": 0, "dry_run": True}
+
+
+@pytest.mark.asyncio
+async def test_patch_by_filter_only_rebuilds_what_reads_the_columns(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a bulk patch only resets the structures that read the columns it set."""
+    rebuilds = []
+    build = sales_reports.build_sales_rollups
+
+    async def count(session):
+        rebuilds.append(1)
+        await build(session)
+
+    monkeypatch.setattr(sales_reports, "build_sales_rollups", count)
+    await async_client.get("/api/v1/autocomplete?prefix=tra")
+    assert autocomplete.loaded
+
+    response = await async_client.patch(
+        "/api/v1/tracks/?genre_id=1", json={"composer": "Someone"}
+    )
+    assert response.status_code == 200
+    assert rebuilds == []
+    assert autocomplete.loaded
+
+    response = await async_client.patch(
+        "/api/v1/tracks/?genre_id=1", json={"name": "Renamed"}
+    )
+    assert response.status_code == 200
+    assert rebuilds == []
+    assert not autocomplete.loaded
+
+    response = await async_client.patch(
+        "/api/v1/tracks/?genre_id=1", json={"genre_id": 2}
+    )
+    assert response.status_code == 200
+    assert rebuilds == [1]
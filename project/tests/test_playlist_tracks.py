@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.endpoints import playlists
+from app.events import commit_write
+from app.models.playlists import Playlist
+
+
+async def read_playlist_track_ids(client: AsyncClient) -> list:
+    response = await client.get("/api/v1/playlists/1/tracks?limit=100")
+    assert response.status_code == 200
+    return sorted(track["id"] for track in response.json()["response"])
+
+
+@pytest.mark.asyncio
+async def test_playlist_tracks_added_and_removed_set_based(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test tracks are added and removed many at a time, with the rows that changed counted."""
+    sales.add(Playlist(id=1, name="Mix"))
+    await sales.commit()
+    events = []
+
+    async def record(session, *written):
+        events.extend(written)
+        await commit_write(session, *written)
+
+    monkeypatch.setattr(playlists, "commit_write", record)
+    response = await async_client.post(
+        "/api/v1/playlists/1/tracks", json={"track_ids": [1, 2, 1]}
+    )
+    assert response.status_code == 200
+    assert response.json()["response"] == {
+        "playlist_id": 1,
+        "requested": 2,
+        "changed": 2,
+    }
+    response = await async_client.post(
+        "/api/v1/playlists/1/tracks", json={"track_ids": [2]}
+    )
+    assert response.json()["response"]["changed"] == 0
+    assert await read_playlist_track_ids(async_client) == [1, 2]
+
+    response = await async_client.request(
+        "DELETE", "/api/v1/playlists/1/tracks", json={"track_ids": [2, 1, 2]}
+    )
+    assert response.status_code == 200
+    assert response.json()["response"]["changed"] == 2
+    assert await read_playlist_track_ids(async_client) == []
+    assert [len(event.rows) for event in events] == [2, 0, 0]
+    assert [len(event.deleted) for event in events] == [0, 0, 2]
+
+
+@pytest.mark.asyncio
+async def test_playlist_tracks_foreign_keys_checked(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test missing tracks fail the whole change and a missing playlist is a 404."""
+    sales.add(Playlist(id=1, name="Mix"))
+    await sales.commit()
+    response = await async_client.post(
+        "/api/v1/playlists/1/tracks", json={"track_ids": [1, 8, 9]}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Track not found: 8, 9"
+    assert await read_playlist_track_ids(async_client) == []
+
+    response = await async_client.post(
+        "/api/v1/playlists/7/tracks", json={"track_ids": [1]}
+    )
+    assert response.status_code == 404
+    response = await async_client.post(
+        "/api/v1/playlists/1/tracks", json={"track_ids": []}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+import app.database
+from app.database import (
+    QueryDeadline,
+    body_received,
+    track_body,
+    register_query_guard,
+    get_db,
+    get_request_timeout,
+    watch_disconnect,
+    DEFAULT_REQUEST_TIMEOUT,
+    MAX_REQUEST_TIMEOUT,
+)
+
+# Test database URL
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+# Create async engine for tests, guarded like the application engine
+engine = create_async_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+register_query_guard(engine)
+
+# A scan that takes far longer than any deadline used below
+LONG_SCAN = text(
+    "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter) "
+    "SELECT count(*) FROM (SELECT x FROM counter LIMIT 100000000)"
+)
+
+
+def make_request(headers: dict) -> Request:
+    """Create a bare request with the given headers"""
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_long_scan_aborted_by_deadline():
+    """Test a long running scan is interrupted once the deadline passes."""
+    deadline = QueryDeadline(timeout=0.2)
+    async with AsyncSession(engine, info={"deadline": deadline}) as session:
+        start = time.monotonic()
+        with pytest.raises(OperationalError, match="interrupted"):
+            await session.execute(LONG_SCAN)
+        assert time.monotonic() - start < 5
+        assert deadline.expired
+
+
+@pytest.mark.asyncio
+async def test_long_scan_aborted_by_cancel():
+    """Test a long running scan is interrupted when the request is cancelled."""
+    deadline = QueryDeadline(timeout=60)
+    async with AsyncSession(engine, info={"deadline": deadline}) as session:
+        asyncio.get_running_loop().call_later(0.2, deadline.cancel)
+        start = time.monotonic()
+        with pytest.raises(OperationalError, match="interrupted"):
+            await session.execute(LONG_SCAN)
+        assert time.monotonic() - start < 5
+
+
+@pytest.mark.asyncio
+async def test_session_usable_after_abort():
+    """Test the connection serves the next session once the aborted one is released."""
+    deadline = QueryDeadline(timeout=0.1)
+    async with AsyncSession(engine, info={"deadline": deadline}) as session:
+        with pytest.raises(OperationalError):
+            await session.execute(LONG_SCAN)
+
+    async with AsyncSession(engine, info={"deadline": QueryDeadline()}) as session:
+        assert await session.scalar(text("SELECT 1")) == 1
+
+
+def test_request_timeout_header():
+    """Test the request timeout header overrides the default within limits."""
+    assert get_request_timeout(make_request({})) == DEFAULT_REQUEST_TIMEOUT
+    assert get_request_timeout(make_request({"X-Request-Timeout": "2.5"})) == 2.5
+    assert (
+        get_request_timeout(make_request({"X-Request-Timeout": "abc"}))
+        == DEFAULT_REQUEST_TIMEOUT
+    )
+    assert (
+        get_request_timeout(make_request({"X-Request-Timeout": "-1"}))
+        == DEFAULT_REQUEST_TIMEOUT
+    )
+    assert (
+        get_request_timeout(make_request({"X-Request-Timeout": "99999"}))
+        == MAX_REQUEST_TIMEOUT
+    )
+
+
+@pytest.mark.asyncio
+async def test_query_over_deadline_returns_504(monkeypatch: pytest.MonkeyPatch):
+    """Test a request whose query runs past its deadline is answered with a 504."""
+    monkeypatch.setattr(app.database, "engine", engine)
+    scan_app = FastAPI()
+
+    @scan_app.get("/scan")
+    async def scan(session: AsyncSession = Depends(get_db)):
+        return {"count": await session.scalar(LONG_SCAN)}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=scan_app), base_url="http://test"
+    ) as client:
+        start = time.monotonic()
+        response = await client.get("/scan", headers={"X-Request-Timeout": "0.2"})
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Request deadline exceeded"
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.asyncio
+async def test_disconnect_watch_leaves_body_unread():
+    """Test the disconnect watch doesn't take body messages the route hasn't read."""
+    messages = [
+        {"type": "http.request", "body": b"a,b\n", "more_body": True},
+        {"type": "http.request", "body": b"1,2\n", "more_body": False},
+    ]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(60)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(b"transfer-encoding", b"chunked")],
+    }
+    request = Request(scope, track_body(scope, receive))
+    deadline = QueryDeadline(timeout=0.3)
+    watcher = asyncio.create_task(watch_disconnect(request, deadline))
+    await asyncio.sleep(0.2)
+    assert len(messages) == 2
+    assert not body_received(request)
+    assert b"".join([chunk async for chunk in request.stream()]) == b"a,b\n1,2\n"
+    assert body_received(request)
+    await watcher
+    assert not deadline.cancelled
+
+    # without the tracking only a request without a body counts as read
+    assert not body_received(Request({**scope, "state": {}}))
+    assert body_received(make_request({}))
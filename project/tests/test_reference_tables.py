@@ -0,0 +1,55 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.genres import Genre
+
+
+async def read_genre_names(client: AsyncClient) -> list:
+    response = await client.get("/api/v1/genres/")
+    assert response.status_code == 200
+    return [genre["name"] for genre in response.json()["response"]]
+
+
+@pytest.mark.asyncio
+async def test_reference_table_reloaded_after_writes(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    """Test reads are served from memory and every write route reloads the table."""
+    async_session.add_all([Genre(id=1, name="Rock"), Genre(id=2, name="Jazz")])
+    await async_session.commit()
+    assert await read_genre_names(async_client) == ["Rock", "Jazz"]
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = async_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert await read_genre_names(async_client) == ["Rock", "Jazz"]
+        response = await async_client.get("/api/v1/genres/2")
+        assert response.json()["response"]["name"] == "Jazz"
+        assert statements == []
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    response = await async_client.post("/api/v1/genres/", json={"name": "Blues"})
+    assert response.status_code == 201
+    assert await read_genre_names(async_client) == ["Rock", "Jazz", "Blues"]
+
+    response = await async_client.put("/api/v1/genres/1", json={"name": "Metal"})
+    assert response.status_code == 200
+    response = await async_client.patch("/api/v1/genres/2", json={"name": "Swing"})
+    assert response.status_code == 200
+    assert await read_genre_names(async_client) == ["Metal", "Swing", "Blues"]
+    response = await async_client.get("/api/v1/genres/2")
+    assert response.json()["response"]["name"] == "Swing"
+
+    response = await async_client.patch(
+        "/api/v1/genres/?name=Blues", json={"name": "Soul"}
+    )
+    assert response.status_code == 200
+    assert await read_genre_names(async_client) == ["Metal", "Swing", "Soul"]
@@ -0,0 +1,134 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.endpoints.pagination import MAX_PAGE_SIZE
+from app.reports.sales import reset_sales_rollups
+
+
+async def read_sales(client: AsyncClient, group_by: str) -> dict:
+    response = await client.get(f"/api/v1/reports/sales?group_by={group_by}")
+    assert response.status_code == 200
+    return {
+        item["key"]: (item["name"], item["revenue"], item["quantity"])
+        for item in response.json()["response"]
+    }
+
+
+async def assert_consistent(client: AsyncClient) -> None:
+    response = await client.get("/api/v1/reports/sales/check")
+    assert response.status_code == 200
+    assert response.json()["response"]["consistent"] is True
+
+
+@pytest.mark.asyncio
+async def test_sales_rollups_built_from_invoice_lines(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the rollups sum the invoice lines by every dimension."""
+    assert await read_sales(async_client, "genre") == {
+        "1": ("Rock", "2.97", 3),
+        "2": ("Jazz", "1.99", 1),
+    }
+    assert await read_sales(async_client, "artist") == {
+        "1": ("Rock Artist", "2.97", 3),
+        "2": ("Jazz Artist", "1.99", 1),
+    }
+    assert await read_sales(async_client, "country") == {
+        "USA": ("USA", "3.97", 3),
+        "Canada": ("Canada", "0.99", 1),
+    }
+    assert list(await read_sales(async_client, "month")) == ["2024-01", "2024-02"]
+    await assert_consistent(async_client)
+
+
+@pytest.mark.asyncio
+async def test_sales_rollups_follow_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test creating and changing lines and invoices updates the rollups."""
+    await read_sales(async_client, "genre")
+
+    response = await async_client.post(
+        "/api/v1/invoice_items/",
+        json={"invoice_id": 2, "track_id": 2, "unit_price": "1.99", "quantity": 3},
+    )
+    assert response.status_code == 201
+    line_id = response.json()["response"]["id"]
+    response = await async_client.patch(
+        f"/api/v1/invoice_items/{line_id}", json={"track_id": 1}
+    )
+    assert response.status_code == 200
+    response = await async_client.put(
+        "/api/v1/invoices/1",
+        json={
+            "invoice_date": "2024-03-01T00:00:00",
+            "billing_country": "Canada",
+            "total": "0",
+            "customer_id": 1,
+        },
+    )
+    assert response.status_code == 200
+
+    assert await read_sales(async_client, "genre") == {
+        "1": ("Rock", "8.94", 6),
+        "2": ("Jazz", "1.99", 1),
+    }
+    assert await read_sales(async_client, "country") == {
+        "Canada": ("Canada", "10.93", 7),
+    }
+    await assert_consistent(async_client)
+
+
+@pytest.mark.asyncio
+async def test_sales_check_is_read_only_and_repair_rebuilds(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the check only reports a drifted summary table, the repair rebuilds it."""
+    await read_sales(async_client, "genre")
+    await sales.execute(text("UPDATE sales_rollups SET Quantity = Quantity + 1"))
+    await sales.commit()
+
+    for _ in range(2):
+        response = await async_client.get("/api/v1/reports/sales/check?repair=true")
+        assert response.status_code == 200
+        check = response.json()["response"]
+        assert check["consistent"] is False
+        assert check["repaired"] is False
+
+    response = await async_client.post("/api/v1/reports/sales/repair")
+    assert response.status_code == 200
+    assert response.json()["response"]["repaired"] is True
+    await assert_consistent(async_client)
+
+
+@pytest.mark.asyncio
+async def test_sales_reads_only_read(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the report reads run no writes, and their page size is capped."""
+    # a fresh process, the summary table was built before it started
+    reset_sales_rollups()
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    engine = sales.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert (await read_sales(async_client, "country"))["USA"][2] == 3
+        await assert_consistent(async_client)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert set(statements) == {"SELECT"}
+
+    response = await async_client.get(
+        f"/api/v1/reports/sales?limit={MAX_PAGE_SIZE + 1}"
+    )
+    assert response.status_code == 422
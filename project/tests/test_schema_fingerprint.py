@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+import app.database
+import app.main
+import app.prepare
+from app.reports.leaderboards import leaderboards
+from app.schema.fingerprint import ensure_schema, schema_fingerprint
+from app.schema.migrations import MIGRATIONS
+from app.search.autocomplete import autocomplete
+
+
+@pytest.mark.asyncio
+async def test_schema_checked_only_when_models_change():
+    """Test create_all runs on a new database and again only for a changed schema."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    assert await ensure_schema(engine, SQLModel.metadata)
+    assert not await ensure_schema(engine, SQLModel.metadata)
+    async with engine.connect() as connection:
+        tables = await connection.run_sync(lambda sync: inspect(sync).get_table_names())
+    assert set(SQLModel.metadata.tables) <= set(tables)
+
+    changed = MetaData()
+    Table("extra", changed, Column("Id", Integer, primary_key=True))
+    assert schema_fingerprint(changed) != schema_fingerprint(SQLModel.metadata)
+    assert await ensure_schema(engine, changed)
+    assert not await ensure_schema(engine, changed)
+
+    # a table added to the same metadata changes its fingerprint
+    fingerprint = schema_fingerprint(changed)
+    Table("added", changed, Column("Id", Integer, primary_key=True))
+    assert schema_fingerprint(changed) != fingerprint
+    assert await ensure_schema(engine, changed)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_prepares_and_loads_an_unprepared_database(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a worker started without app.prepare migrates and warms up in its lifespan."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    for module in (app.database, app.prepare, app.main):
+        monkeypatch.setattr(module, "engine", engine)
+    monkeypatch.delattr(app.main.app.state, "openapi_document", raising=False)
+
+    async with app.main.app.router.lifespan_context(app.main.app):
+        assert leaderboards.loaded and autocomplete.loaded
+        assert app.main.app.state.openapi_document.etag
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(
+            "SELECT Version FROM schema_migrations"
+        )
+        assert list(result.scalars()) == [migration.version for migration in MIGRATIONS]
+    await engine.dispose()
@@ -0,0 +1,51 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.search.fulltext import build_match
+
+
+@pytest_asyncio.fixture(scope="function")
+async def search_index(sales: AsyncSession):
+    """The seeded database, with the search index dropped afterwards."""
+    yield sales
+    await sales.execute(text("DROP TABLE IF EXISTS search_index"))
+    await sales.commit()
+
+
+def test_build_match_quotes_words():
+    """Test the words of the query are quoted and the last one is a prefix."""
+    assert build_match("rock  alb") == '"rock" "alb"*'
+    assert build_match('AND "OR" -x') == '"AND" "OR" "x"*'
+    assert build_match(" - ") == ""
+
+
+async def search(client: AsyncClient, query: str) -> list:
+    response = await client.get(f"/api/v1/search?{query}")
+    assert response.status_code == 200
+    return [(item["type"], item["id"]) for item in response.json()["response"]]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_follows_writes(
+    async_client: AsyncClient, search_index: AsyncSession
+):
+    """Test matches of every type are found, filtered and kept in sync."""
+    assert await search(async_client, "q=rock") == [("album", 1), ("artist", 1)]
+    assert await search(async_client, "q=ro&types=artist") == [("artist", 1)]
+    assert await search(async_client, "q=track 2") == [("track", 2)]
+
+    response = await async_client.patch("/api/v1/albums/2", json={"title": "Rock On"})
+    assert response.status_code == 200
+    response = await async_client.post("/api/v1/artists/", json={"name": "Rockers"})
+    assert response.status_code == 201
+
+    assert await search(async_client, "q=rock&types=album") == [
+        ("album", 1),
+        ("album", 2),
+    ]
+    assert ("artist", 3) in await search(async_client, "q=rock&types=artist")
+    response = await async_client.get("/api/v1/search?q=rock&types=song")
+    assert response.status_code == 400
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import versions
+from app.cache.versions import bump_data_version
+from app.models.tracks import Track
+from app.reports.similar import Partitions
+
+
+def test_partitions_cover_every_row():
+    """Test every row is in the cluster it's labelled with and probing all clusters finds every row."""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(400, 3)).astype(np.float32)
+    partitions = Partitions(vectors)
+    assert len(partitions.members) == 20
+    for label, members in enumerate(partitions.members):
+        assert (partitions.labels[members] == label).all()
+    every = partitions.candidates(vectors[0], probes=len(partitions.members))
+    assert sorted(every.tolist()) == list(range(400))
+
+    partitions.put(400, vectors[0])
+    assert 400 in partitions.candidates(vectors[0], probes=1)
+
+
+async def similar(client: AsyncClient, url: str) -> list:
+    response = await client.get(url)
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()["response"]]
+
+
+@pytest.mark.asyncio
+async def test_similar_tracks_follow_track_writes(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+):
+    """Test the nearest tracks by features are returned and kept current."""
+    assert await similar(async_client, "/api/v1/tracks/1/similar") == [2]
+
+    track = {
+        "name": "Track 3",
+        "milliseconds": 1100,
+        "unit_price": "0.99",
+        "bytes": 110,
+        "media_type_id": 1,
+        "album_id": 1,
+        "genre_id": 1,
+    }
+    response = await async_client.post("/api/v1/tracks/", json=track)
+    assert response.status_code == 201
+    id = response.json()["response"]["id"]
+    # the same genre outweighs the small differences in length and size
+    assert await similar(async_client, "/api/v1/tracks/1/similar") == [id, 2]
+
+    response = await async_client.put(
+        f"/api/v1/tracks/{id}", json={**track, "genre_id": 2}
+    )
+    assert response.status_code == 200
+    assert await similar(async_client, "/api/v1/tracks/2/similar?k=1") == [id]
+
+    response = await async_client.get("/api/v1/tracks/99/similar")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_similar_tracks_rebuilt_after_writes_of_other_workers(
+    async_client: AsyncClient,
+    sales: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test a track inserted by another worker is found once its data version moved."""
+    monkeypatch.setattr(versions, "VERSION_CHECK_INTERVAL", 0)
+    assert await similar(async_client, "/api/v1/tracks/1/similar") == [2]
+
+    # another worker commits a track, this worker's listeners never see it
+    sales.add(
+        Track(
+            id=3,
+            name="Track 3",
+            milliseconds=1100,
+            unit_price=Decimal("0.99"),
+            bytes=110,
+            media_type_id=1,
+            album_id=1,
+            genre_id=1,
+        )
+    )
+    await bump_data_version(sales, Track)
+    await sales.commit()
+    assert sorted(await similar(async_client, "/api/v1/tracks/1/similar")) == [2, 3]
+    assert sorted(await similar(async_client, "/api/v1/tracks/3/similar")) == [1, 2]